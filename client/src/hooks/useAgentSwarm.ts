@@ -3,7 +3,9 @@ import { useAgentStore } from '@/stores/agentStore'
 import { useUIStore } from '@/stores/uiStore'
 import * as api from '@/lib/api'
 import { calcIndicators } from '@/lib/indicators'
-import type { StockData, Fundamentals } from '@/types/market'
+import type { AgentContext, Fundamentals, IndicatorSnapshot } from '@/types/market'
+
+type SwarmInput = Pick<AgentContext, 'info' | 'bars' | 'currentPrice' | 'change' | 'changePercent' | 'indicators' | 'fundamentals'>
 
 export function useAgentSwarm() {
   const { runSwarm, cancelSwarm, clearResults, results, consensus, isRunning } = useAgentStore()
@@ -17,24 +19,13 @@ export function useAgentSwarm() {
     }
 
     try {
-      // Fetch stock data + fundamentals + indicators in parallel
-      const [stockData, fundamentals] = await Promise.allSettled([
-        api.getStock(market, ticker, '6mo'),
-        api.getFundamentals(market, ticker),
-      ])
-
-      const stock = stockData.status === 'fulfilled' ? stockData.value : null
-      const funds = fundamentals.status === 'fulfilled' ? fundamentals.value : null
-
-      if (!stock) {
-        throw new Error(`Failed to fetch data for ${ticker}`)
-      }
+      // Stock data, fundamentals and server-computed indicators in one call
+      const context = await loadContext(market, ticker)
 
       // Build data strings for agents
-      const stockDataStr = formatStockData(stock)
-      const fundamentalsStr = funds ? formatFundamentals(funds) : undefined
-      const indicators = calcIndicators(stock.ohlcv)
-      const indicatorsStr = formatIndicators(indicators)
+      const stockDataStr = formatStockData(context)
+      const fundamentalsStr = context.fundamentals ? formatFundamentals(context.fundamentals) : undefined
+      const indicatorsStr = formatIndicators(context.indicators)
 
       await runSwarm(ticker, market, stockDataStr, fundamentalsStr, indicatorsStr)
     } catch (err: any) {
@@ -45,11 +36,59 @@ export function useAgentSwarm() {
   return { analyze, cancelSwarm, clearResults, results, consensus, isRunning }
 }
 
-function formatStockData(data: StockData): string {
-  const { info, ohlcv, currentPrice, change, changePercent } = data
+// Deployments without the context endpoint (e.g. the serverless API) get the same
+// input from separate stock and fundamentals requests plus browser-side indicators.
+async function loadContext(market: 'us' | 'kr', ticker: string): Promise<SwarmInput> {
+  try {
+    return await api.getAgentContext(market, ticker)
+  } catch (err) {
+    console.warn('Agent context unavailable, falling back to stock + fundamentals:', err)
+  }
+
+  const [stockData, fundamentals] = await Promise.allSettled([
+    api.getStock(market, ticker, '1y'),
+    api.getFundamentals(market, ticker),
+  ])
+  if (stockData.status !== 'fulfilled') {
+    throw new Error(`Failed to fetch data for ${ticker}`)
+  }
+
+  const { info, ohlcv, currentPrice, change, changePercent } = stockData.value
   const recent = ohlcv.slice(-20)
-  const ohlcvStr = recent
-    .map((d) => `${d.date}: O=${d.open} H=${d.high} L=${d.low} C=${d.close} V=${d.volume}`)
+  const ind = calcIndicators(ohlcv)
+  return {
+    info,
+    currentPrice,
+    change,
+    changePercent,
+    bars: {
+      date: recent.map((d) => d.date),
+      open: recent.map((d) => d.open),
+      high: recent.map((d) => d.high),
+      low: recent.map((d) => d.low),
+      close: recent.map((d) => d.close),
+      volume: recent.map((d) => d.volume),
+    },
+    indicators: {
+      rsi14: ind.rsi14,
+      macd_value: ind.macd.value,
+      macd_signal: ind.macd.signal,
+      macd_histogram: ind.macd.histogram,
+      bb_upper: ind.bollingerBands.upper,
+      bb_middle: ind.bollingerBands.middle,
+      bb_lower: ind.bollingerBands.lower,
+      sma20: ind.sma20,
+      sma50: ind.sma50,
+      sma200: ind.sma200,
+    },
+    fundamentals: fundamentals.status === 'fulfilled' ? fundamentals.value : null,
+  }
+}
+
+function formatStockData(data: SwarmInput): string {
+  const { info, bars, currentPrice, change, changePercent } = data
+  const ohlcvStr = bars.date
+    .map((date, i) => `${date}: O=${bars.open[i]} H=${bars.high[i]} L=${bars.low[i]} C=${bars.close[i]} V=${bars.volume[i]}`)
     .join('\n')
 
   return `종목: ${info.name} (${info.ticker})
@@ -78,14 +117,14 @@ function formatFundamentals(f: Fundamentals): string {
   return lines.join('\n') || '재무 데이터 없음'
 }
 
-function formatIndicators(ind: ReturnType<typeof calcIndicators>): string {
+function formatIndicators(ind: IndicatorSnapshot): string {
   const lines: string[] = []
   if (ind.rsi14 != null) lines.push(`RSI(14): ${ind.rsi14.toFixed(2)}`)
-  if (ind.macd) {
-    lines.push(`MACD: ${ind.macd.value.toFixed(4)} / Signal: ${ind.macd.signal.toFixed(4)} / Histogram: ${ind.macd.histogram.toFixed(4)}`)
+  if (ind.macd_value != null && ind.macd_signal != null && ind.macd_histogram != null) {
+    lines.push(`MACD: ${ind.macd_value.toFixed(4)} / Signal: ${ind.macd_signal.toFixed(4)} / Histogram: ${ind.macd_histogram.toFixed(4)}`)
   }
-  if (ind.bollingerBands) {
-    lines.push(`볼린저: Upper=${ind.bollingerBands.upper.toFixed(2)} Middle=${ind.bollingerBands.middle.toFixed(2)} Lower=${ind.bollingerBands.lower.toFixed(2)}`)
+  if (ind.bb_upper != null && ind.bb_middle != null && ind.bb_lower != null) {
+    lines.push(`볼린저: Upper=${ind.bb_upper.toFixed(2)} Middle=${ind.bb_middle.toFixed(2)} Lower=${ind.bb_lower.toFixed(2)}`)
   }
   if (ind.sma20 != null) lines.push(`SMA20: ${ind.sma20.toFixed(2)}`)
   if (ind.sma50 != null) lines.push(`SMA50: ${ind.sma50.toFixed(2)}`)
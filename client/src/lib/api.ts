@@ -1,4 +1,4 @@
-import type { StockData, ExchangeRate, Fundamentals, MarketOverview, Indicators } from '@/types/market'
+import type { StockData, ExchangeRate, Fundamentals, MarketOverview, Indicators, AgentContext } from '@/types/market'
 
 class ApiError extends Error {
   constructor(public status: number, message: string) {
@@ -61,3 +61,9 @@ export function getMarketOverview(): Promise<MarketOverview> {
 export function getIndicators(market: 'us' | 'kr', ticker: string): Promise<Indicators> {
   return fetchJson(`/api/market/indicators/${market}/${ticker}`)
 }
+
+// ─── Agent Context ───────────────────────────
+
+export function getAgentContext(market: 'us' | 'kr', ticker: string, bars = 20): Promise<AgentContext> {
+  return fetchJson(`/api/agents/context/${market}/${ticker}?bars=${bars}`)
+}
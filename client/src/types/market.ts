@@ -64,3 +64,35 @@ export interface Indicators {
   sma50?: number
   sma200?: number
 }
+
+// Server-computed indicator snapshot (/api/market/indicators, agent context)
+export interface IndicatorSnapshot {
+  rsi14?: number | null
+  macd_value?: number | null
+  macd_signal?: number | null
+  macd_histogram?: number | null
+  bb_upper?: number | null
+  bb_middle?: number | null
+  bb_lower?: number | null
+  sma20?: number | null
+  sma50?: number | null
+  sma200?: number | null
+}
+
+export interface AgentContext {
+  version: number
+  market: 'us' | 'kr'
+  ticker: string
+  asOf: string
+  generatedAt: string
+  info: StockInfo
+  currentPrice: number
+  change: number
+  changePercent: number
+  bars: { date: string[]; open: number[]; high: number[]; low: number[]; close: number[]; volume: number[] }
+  indicators: IndicatorSnapshot
+  fundamentals: Fundamentals | null
+  fx: ExchangeRate | null
+  stats: Record<string, number | null>
+  missing: string[]
+}
@@ -33,6 +33,10 @@ export default defineConfig({
         target: 'http://localhost:8000',
         changeOrigin: true,
       },
+      '/api/agents': {
+        target: 'http://localhost:8000',
+        changeOrigin: true,
+      },
     },
   },
 })
@@ -0,0 +1 @@
+"""Offline benchmarks: a fake upstream, load scenarios and micro-benchmarks."""
@@ -0,0 +1,104 @@
+"""Local stand-in for the Yahoo Finance and ECOS endpoints the server calls.
+
+Serves bench.fixtures data with injected latency, 5xx errors and 429s:
+
+    python -m bench.fake_upstream --port 8900 --latency-ms 40 --error-rate 0.01
+
+Point the API at it with YAHOO_BASE_URL / BOK_BASE_URL. ``GET /__stats``
+returns per-endpoint call counts (``DELETE`` resets them).
+"""
+import argparse
+import asyncio
+import random
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from bench import fixtures
+
+
+class Faults:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+
+
+def create_app(faults: Faults | None = None) -> FastAPI:
+    faults = faults or Faults()
+    calls: Counter = Counter()
+    app = FastAPI(title="fake upstream")
+
+    @app.middleware("http")
+    async def inject(request: Request, call_next):
+        if request.url.path.startswith("/__"):
+            return await call_next(request)
+        calls[request.url.path.split("/")[3] if request.url.path.startswith("/v") else "ecos"] += 1
+        delay = faults.latency_ms + random.uniform(-faults.jitter_ms, faults.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        roll = random.random()
+        if roll < faults.throttle_rate:
+            calls["429"] += 1
+            return JSONResponse({"error": "Too Many Requests"}, status_code=429, headers={"Retry-After": "1"})
+        if roll < faults.throttle_rate + faults.error_rate:
+            calls["5xx"] += 1
+            return JSONResponse({"error": "upstream failure"}, status_code=503)
+        return await call_next(request)
+
+    @app.get("/v8/finance/chart/{symbol}")
+    async def chart(symbol: str, period1: int | None = None, period2: int | None = None,
+                    range: str = "6mo"):
+        return fixtures.chart(symbol, period1, period2, range)
+
+    @app.get("/v7/finance/spark")
+    async def spark(symbols: str, range: str = "5d"):
+        return fixtures.spark(symbols.split(","), range)
+
+    @app.get("/v7/finance/quote")
+    async def quote(symbols: str):
+        return fixtures.quote(symbols.split(","))
+
+    @app.get("/v10/finance/quoteSummary/{symbol}")
+    async def quote_summary(symbol: str):
+        return fixtures.quote_summary(symbol)
+
+    @app.get("/api/StatisticSearch/{path:path}")
+    async def ecos(path: str):
+        return fixtures.ecos_usd_krw()
+
+    @app.get("/__stats")
+    async def stats():
+        return dict(calls)
+
+    @app.delete("/__stats")
+    async def reset_stats():
+        calls.clear()
+        return {}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--recorded", help="directory of recorded responses overriding the synthetic ones")
+    args = parser.parse_args()
+
+    fixtures.use_recorded(args.recorded)
+    faults = Faults(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate)
+    uvicorn.run(create_app(faults), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Deterministic stand-in data in the shapes Yahoo, ECOS and FinanceDataReader return.
+
+Prices are a seeded random walk per symbol anchored at a fixed epoch day, so
+any requested window of the same symbol is consistent with every other
+window. A directory of recorded responses can override the synthetic ones:
+``<dir>/chart/<SYMBOL>.json`` (a full v8 chart body) and
+``<dir>/quoteSummary/<SYMBOL>.json``.
+"""
+import functools
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+ORIGIN_DAY = 14610        # 2010-01-01
+KR_CODES = [f"{i:06d}" for i in range(5930, 5930 + 40 * 10, 10)]
+
+_recorded_dir: str | None = None
+
+
+def use_recorded(path: str | None) -> None:
+    global _recorded_dir
+    _recorded_dir = path
+
+
+def _recorded(kind: str, symbol: str) -> dict | None:
+    if not _recorded_dir:
+        return None
+    path = os.path.join(_recorded_dir, kind, f"{symbol}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def today() -> int:
+    return int(time.time() // 86400)
+
+
+@functools.lru_cache(maxsize=4096)
+def _walk(symbol: str, last_day: int, base: float) -> tuple[np.ndarray, np.ndarray]:
+    """(weekday epoch days, closes) from ORIGIN_DAY to ``last_day``."""
+    days = np.arange(ORIGIN_DAY, last_day + 1)
+    days = days[(days + 3) % 7 < 5]  # 1970-01-01 was a Thursday
+    rng = np.random.default_rng(sum(map(ord, symbol)) * 7919 + len(symbol))
+    closes = base * np.exp(np.cumsum(rng.normal(0.0003, 0.018, len(days))))
+    return days, closes
+
+
+def bars(symbol: str, start_day: int, end_day: int, base: float = 100.0) -> dict[str, np.ndarray]:
+    days, closes = _walk(symbol, today(), base)
+    keep = (days >= start_day) & (days < end_day)
+    days, close = days[keep], closes[keep]
+    spread = close * 0.01
+    return {
+        "day": days,
+        "open": close - spread / 2,
+        "high": close + spread,
+        "low": close - spread,
+        "close": close,
+        "volume": (1_000_000 + (days * 7919) % 500_000).astype(np.int64),
+    }
+
+
+RANGE_DAYS = {"1d": 1, "5d": 7, "1mo": 31, "3mo": 92, "6mo": 183, "1y": 366, "2y": 731, "5y": 1827}
+
+
+def chart(symbol: str, period1: int | None = None, period2: int | None = None,
+          range_: str = "6mo") -> dict:
+    """Yahoo v8 chart body for ``symbol`` (period1/period2 in epoch seconds)."""
+    recorded = _recorded("chart", symbol)
+    if recorded is not None:
+        return recorded
+    end = (period2 // 86400) if period2 else today() + 1
+    start = (period1 // 86400) if period1 else end - RANGE_DAYS.get(range_, 183)
+    base = 1300.0 if symbol == "KRW=X" else 3000.0 if symbol.startswith("^") else 100.0
+    b = bars(symbol, start, end, base)
+    quote = {k: np.round(b[k], 4).tolist() for k in ("open", "high", "low", "close")}
+    quote["volume"] = b["volume"].tolist()
+    return {"chart": {"result": [{
+        "meta": {"symbol": symbol, "shortName": f"{symbol} Corp", "currency": "USD"},
+        "timestamp": (b["day"] * 86400 + 14 * 3600 + 1800).tolist(),
+        "indicators": {"quote": [quote]},
+    }], "error": None}}
+
+
+def spark(symbols: list[str], range_: str = "5d") -> dict:
+    result = []
+    for symbol in symbols:
+        body = chart(symbol, range_=range_)["chart"]["result"][0]
+        result.append({"symbol": symbol, "response": [body]})
+    return {"spark": {"result": result, "error": None}}
+
+
+def quote_summary(symbol: str) -> dict:
+    recorded = _recorded("quoteSummary", symbol)
+    if recorded is not None:
+        return recorded
+    rng = np.random.default_rng(sum(map(ord, symbol)))
+    raw = lambda v: {"raw": round(float(v), 4)}  # noqa: E731
+    return {"quoteSummary": {"result": [{
+        "summaryDetail": {"trailingPE": raw(rng.uniform(8, 40)), "forwardPE": raw(rng.uniform(8, 35)),
+                          "dividendYield": raw(rng.uniform(0, 0.04)), "marketCap": raw(rng.uniform(1e9, 3e12))},
+        "defaultKeyStatistics": {"priceToBook": raw(rng.uniform(1, 15)), "trailingEps": raw(rng.uniform(1, 12))},
+        "financialData": {"returnOnEquity": raw(rng.uniform(0.05, 0.4)), "debtToEquity": raw(rng.uniform(10, 200)),
+                          "revenueGrowth": raw(rng.uniform(-0.1, 0.3))},
+        "assetProfile": {"sector": "Technology", "industry": "Software"},
+        "price": {"shortName": f"{symbol} Corp", "currency": "USD"},
+    }], "error": None}}
+
+
+def quote(symbols: list[str]) -> dict:
+    """Yahoo v7 quote body, consistent with ``quote_summary`` for each symbol."""
+    result = []
+    for symbol in symbols:
+        body = quote_summary(symbol)["quoteSummary"]["result"][0]
+        detail, stats = body["summaryDetail"], body["defaultKeyStatistics"]
+        result.append({
+            "symbol": symbol,
+            "trailingPE": detail["trailingPE"]["raw"],
+            "forwardPE": detail["forwardPE"]["raw"],
+            "priceToBook": stats["priceToBook"]["raw"],
+            "marketCap": detail["marketCap"]["raw"],
+            "trailingAnnualDividendYield": detail["dividendYield"]["raw"],
+        })
+    return {"quoteResponse": {"result": result, "error": None}}
+
+
+def ecos_usd_krw() -> dict:
+    _, closes = _walk("KRW=X", today(), 1300.0)
+    return {"StatisticSearch": {"list_total_count": 1, "row": [
+        {"TIME": time.strftime("%Y%m%d"), "DATA_VALUE": f"{closes[-1]:.2f}"},
+    ]}}
+
+
+def kr_daily(code: str, start=None) -> pd.DataFrame:
+    """FinanceDataReader.DataReader-shaped frame for a KRX code."""
+    start_day = int(pd.Timestamp(start).value // 86_400_000_000_000) if start is not None else ORIGIN_DAY
+    b = bars(code, start_day, today() + 1, base=50_000.0)
+    index = pd.DatetimeIndex(b["day"].astype("datetime64[D]"), name="Date")
+    frame = pd.DataFrame({c.title(): np.round(b[c]) for c in ("open", "high", "low", "close")}, index=index)
+    frame["Volume"] = b["volume"]
+    frame["Change"] = frame["Close"].pct_change().fillna(0.0)
+    return frame
+
+
+def kr_listing(kind: str = "KRX") -> pd.DataFrame:
+    """FinanceDataReader.StockListing-shaped frame ('KRX' or 'KRX-DESC')."""
+    codes = KR_CODES
+    frame = pd.DataFrame({
+        "Code": codes,
+        "Name": [f"종목{i:02d}" for i in range(len(codes))],
+        "Market": ["KOSPI" if i % 3 else "KOSDAQ" for i in range(len(codes))],
+    })
+    if kind == "KRX-DESC":
+        frame["Sector"] = ["반도체" if i % 2 else "자동차" for i in range(len(codes))]
+        return frame
+    frame["Close"] = [float(kr_daily(c)["Close"].iloc[-1]) for c in codes]
+    frame["Stocks"] = [10_000_000 * (i + 1) for i in range(len(codes))]
+    frame["Marcap"] = frame["Close"] * frame["Stocks"]
+    return frame
+
+
+def kr_marcap(market: str = "KRX") -> pd.DataFrame:
+    """FinanceDataReader.naver.snap.marcap-shaped frame (amounts in 억 원, shares in 천주)."""
+    listing = kr_listing("KRX")
+    if market != "KRX":
+        listing = listing[listing["Market"] == market]
+    rng = np.random.default_rng(len(listing))
+    n = len(listing)
+    sales = listing["Marcap"].to_numpy() / 1e8 / rng.uniform(0.5, 4, n)
+    assets = sales * rng.uniform(1, 3, n)
+    return pd.DataFrame({
+        "종목코드": listing["Code"].to_numpy(),
+        "종목명": listing["Name"].to_numpy(),
+        "현재가": listing["Close"].to_numpy(),
+        "상장주식수": listing["Stocks"].to_numpy() / 1000,
+        "시가총액": np.round(listing["Marcap"].to_numpy() / 1e8),
+        "자산총계": np.round(assets),
+        "부채총계": np.round(assets * rng.uniform(0.1, 0.7, n)),
+        "매출액": np.round(sales),
+        "매출액증가율": np.round(rng.uniform(-10, 30, n), 2),
+        "보통주배당금": np.round(listing["Close"].to_numpy() * rng.uniform(0, 0.04, n), -1),
+        "PER": np.round(rng.uniform(5, 40, n), 2),
+        "ROE": np.round(rng.uniform(-0.05, 0.25, n), 4),
+        "PBR": np.round(rng.uniform(0.3, 5, n), 2),
+    })
+
+
+def kr_marcap_page(sosok: int, page: int, page_size: int = 50) -> pd.DataFrame:
+    """One market-sum page (sosok 0 KOSPI, 1 KOSDAQ); empty past the last one."""
+    frame = kr_marcap("KOSPI" if sosok == 0 else "KOSDAQ")
+    return frame.iloc[(page - 1) * page_size:page * page_size].reset_index(drop=True)
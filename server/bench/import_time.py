@@ -0,0 +1,95 @@
+"""Startup import report and import-time budget.
+
+    cd server
+    python -m bench.import_time                    # report, exit 1 if over budget
+    python -m bench.import_time --top 40 --budget-ms 600 --json imports.json
+
+Imports ``main`` in fresh interpreters under ``-X importtime`` (best of
+``--runs``) and lists the costliest modules and top-level packages. The run
+fails if the total exceeds ``--budget-ms`` or if a deferred provider library
+(FinanceDataReader and what it pulls in) was imported at startup. Also times
+``preload()`` so the cost moved off the startup path stays visible.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BUDGET_MS = 1000.0
+FORBIDDEN = ("FinanceDataReader", "pandas", "plotly", "requests")
+
+
+def _importtime() -> dict[str, tuple[float, float]]:
+    """{module: (self_ms, cumulative_ms)} for one ``import main`` in a new interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=SERVER_DIR, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line.removeprefix("import time:").split("|")
+        if own.strip().isdigit():
+            modules[name.strip()] = (int(own) / 1000, int(cumulative) / 1000)
+    return modules
+
+
+def _preload_costs() -> dict[str, float]:
+    code = "import json, main; from utils.lazy_import import preload; print(json.dumps(preload()))"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=SERVER_DIR, capture_output=True, text=True, check=True)
+    return {name: round(seconds * 1000, 1) for name, seconds in json.loads(proc.stdout.splitlines()[-1]).items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report module import costs for `import main`")
+    parser.add_argument("--runs", type=int, default=3, help="take the fastest of this many imports")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    runs = [_importtime() for _ in range(max(args.runs, 1))]
+    modules = min(runs, key=lambda m: m.get("main", (0, 0))[1])
+    total = modules.get("main", (0.0, 0.0))[1]
+
+    packages = defaultdict(float)
+    for name, (own, _) in modules.items():
+        packages[name.split(".")[0]] += own
+    forbidden = sorted(name for name in modules if name.split(".")[0] in FORBIDDEN)
+    preload = _preload_costs()
+
+    print(f"{'module':<48} {'self ms':>9} {'cum ms':>9}")
+    for name, (own, cumulative) in sorted(modules.items(), key=lambda m: -m[1][1])[:args.top]:
+        print(f"{name:<48} {own:>9.1f} {cumulative:>9.1f}")
+    print(f"\n{'package':<48} {'self ms':>9}")
+    for name, own in sorted(packages.items(), key=lambda p: -p[1])[:args.top]:
+        print(f"{name:<48} {own:>9.1f}")
+    print(f"\npreload(): {', '.join(f'{k} {v:.1f} ms' for k, v in preload.items())}")
+    print(f"import main: {total:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "total_ms": total,
+                "modules": {k: {"self_ms": v[0], "cum_ms": v[1]} for k, v in modules.items()},
+                "packages": dict(packages),
+                "preload_ms": preload,
+            }, f, indent=2)
+
+    failed = False
+    if forbidden:
+        print(f"FAIL: imported at startup: {', '.join(forbidden[:10])}")
+        failed = True
+    if total > args.budget_ms:
+        print(f"FAIL: import main took {total:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Micro-benchmarks for indicator math and OHLCV conversion paths.
+
+    cd server && python -m bench.micro [--filter ohlcv] [--json out.json]
+
+Each case is timed with ``timeit`` (best of several repeats) on fixture data
+sized like a 5y daily history, and reported as microseconds per call.
+"""
+import argparse
+import json
+import timeit
+
+import numpy as np
+
+from bench import fixtures
+from services import indicators
+from services.ohlcv import OHLCVFrame, StockSeries
+from models.stock import StockInfo
+
+BARS = 1260          # ~5y of trading days
+BATCH_TICKERS = 100
+
+
+def _cases() -> dict:
+    chart = fixtures.chart("BENCH", range_="5y")["chart"]["result"][0]
+    df = fixtures.kr_daily("005930", start="2019-01-01")
+    frame = OHLCVFrame.from_chart(chart, digits=2)
+    closes = frame.close[-BARS:]
+    close_list = closes.tolist()
+    dates = frame.dates()[-BARS:]
+    matrix = np.vstack([closes * (1 + 0.01 * i) for i in range(BATCH_TICKERS)])
+    info = StockInfo(ticker="BENCH", name="Bench", market="us", currency="USD")
+    series = StockSeries.from_frame(info, frame, price_digits=2)
+    state = indicators.IndicatorState.from_history(dates, close_list)
+
+    return {
+        "indicators.indicator_series (1 ticker)": lambda: indicators.indicator_series(closes),
+        f"indicators.indicator_series ({BATCH_TICKERS} tickers)": lambda: indicators.indicator_series(matrix),
+        "indicators.compute_indicators": lambda: indicators.compute_indicators(close_list),
+        "indicators.IndicatorState.from_history": lambda: indicators.IndicatorState.from_history(dates, close_list),
+        "indicators.IndicatorState.update+snapshot": lambda: (
+            state.update(dates[-1], close_list[-1] * 1.001), state.snapshot(),
+        ),
+        "ohlcv.from_chart": lambda: OHLCVFrame.from_chart(chart, digits=2),
+        "ohlcv.from_dataframe": lambda: OHLCVFrame.from_dataframe(df, digits=0),
+        "ohlcv.to_items": frame.to_items,
+        "ohlcv.to_response+model_dump_json": lambda: series.to_response().model_dump_json(),
+        "ohlcv.to_columnar": series.to_columnar,
+        "ohlcv.to_packed": series.to_packed,
+    }
+
+
+def _time(fn, min_seconds: float = 0.2, repeat: int = 5) -> float:
+    """Best-of-``repeat`` microseconds per call."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_seconds / 0.2))
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indicator and OHLCV micro-benchmarks")
+    parser.add_argument("--filter", default="", help="only run cases containing this text")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, fn in _cases().items():
+        if args.filter in name:
+            results[name] = round(_time(fn), 2)
+            print(f"{name:<48} {results[name]:>12.2f} us", flush=True)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Load scenarios against the API backed by the local fake upstream.
+
+Each scenario gets a fresh API process (empty cache and bar store) talking to
+a shared fake upstream on localhost, so it runs with no network:
+
+    cd server
+    python -m bench.run                          # every scenario
+    python -m bench.run herd overview --latency-ms 80 --json results.json
+    python -m bench.run herd --workers 4 --cache-backend sqlite
+
+Reports p50/p99/max latency, requests per second, API process RSS (current
+and peak) and the upstream calls the scenario caused. Upstream rate limits
+are lifted unless ``--realistic-limits`` is given, so the numbers measure
+this service rather than the token buckets.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+
+import httpx
+import numpy as np
+
+from bench import fixtures
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+US_TICKERS = [f"T{i:03d}" for i in range(300)]
+KR_CODES = fixtures.KR_CODES
+
+
+@dataclass
+class Result:
+    scenario: str
+    requests: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    p50_ms: float = 0.0
+    p99_ms: float = 0.0
+    max_ms: float = 0.0
+    rps: float = 0.0
+    rss_mb: float = 0.0
+    peak_rss_mb: float = 0.0
+    upstream_calls: dict = field(default_factory=dict)
+
+    def record(self, latencies: list[float], errors: int, seconds: float) -> None:
+        lat = np.array(latencies) * 1000
+        self.requests, self.errors, self.seconds = len(lat), errors, round(seconds, 3)
+        if len(lat):
+            self.p50_ms = round(float(np.percentile(lat, 50)), 2)
+            self.p99_ms = round(float(np.percentile(lat, 99)), 2)
+            self.max_ms = round(float(lat.max()), 2)
+            self.rps = round(len(lat) / seconds, 1) if seconds else 0.0
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_mb(pid: int) -> tuple[float, float]:
+    """(VmRSS, VmHWM) of ``pid`` in MB, from /proc."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, kb = line.split()[:2]
+                    values[key] = int(kb) / 1024
+    except OSError:
+        pass
+    return round(values.get("VmRSS:", 0.0), 1), round(values.get("VmHWM:", 0.0), 1)
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{' '.join(proc.args)} exited with {proc.returncode}")
+        try:
+            httpx.get(url, timeout=0.5)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise TimeoutError(f"{url} did not come up")
+
+
+def _spawn(args: list[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", *args], cwd=SERVER_DIR, env=env)
+
+
+async def _load(client: httpx.AsyncClient, requests: list[tuple], concurrency: int) -> tuple[list, int, float]:
+    """Issue (method, path, body) requests with bounded concurrency; return latencies, errors, wall time."""
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(method, path, body):
+        nonlocal errors
+        async with sem:
+            start = time.perf_counter()
+            try:
+                resp = await client.request(method, path, json=body)
+                await resp.aread()
+                if resp.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(*r) for r in requests))
+    return latencies, errors, time.perf_counter() - start
+
+
+def _get(path: str) -> tuple:
+    return ("GET", path, None)
+
+
+# --- Scenarios: each returns (latencies, errors, seconds) for the measured phase ---
+
+async def cold(client, scale):
+    """Every ticker requested once against an empty cache and bar store."""
+    n = int(200 * scale)
+    reqs = [_get(f"/api/stocks/us/{t}?period=1y") for t in US_TICKERS[:n]]
+    reqs += [_get(f"/api/stocks/kr/{c}?period=1y") for c in KR_CODES]
+    return await _load(client, reqs, 32)
+
+
+async def hot(client, scale):
+    """Repeated reads of a small, already-cached watchlist."""
+    tickers = US_TICKERS[:20]
+    await _load(client, [_get(f"/api/stocks/us/{t}") for t in tickers], 20)
+    reqs = [_get(f"/api/stocks/us/{tickers[i % 20]}") for i in range(int(5000 * scale))]
+    return await _load(client, reqs, 64)
+
+
+async def herd(client, scale):
+    """Many concurrent requests for one cold ticker; upstream should see one fetch."""
+    reqs = [_get("/api/stocks/us/HERD?period=5y") for _ in range(int(500 * scale))]
+    return await _load(client, reqs, 500)
+
+
+async def watchlist(client, scale):
+    """Wide NDJSON batch: one cold pass, then warm repeats (latency is per batch)."""
+    items = [{"market": "us", "ticker": t, "period": "6mo"} for t in US_TICKERS[:int(250 * scale)]]
+    items += [{"market": "kr", "ticker": c, "period": "6mo"} for c in KR_CODES]
+    reqs = [("POST", "/api/stocks/batch", {"items": items})] * 10
+    return await _load(client, reqs, 1)
+
+
+async def overview(client, scale):
+    """Dashboard polling of the market overview."""
+    reqs = [_get("/api/market/overview") for _ in range(int(2000 * scale))]
+    return await _load(client, reqs, 50)
+
+
+async def fundamentals(client, scale):
+    """Watchlist fundamentals: batches of 100 US names, cold then cached."""
+    tickers = US_TICKERS[:int(300 * scale)]
+    reqs = [("POST", "/api/fundamentals/batch", {"items": [{"market": "us", "ticker": t}
+                                                           for t in tickers[i:i + 100]]})
+            for i in range(0, len(tickers), 100)] * 10
+    return await _load(client, reqs, 4)
+
+
+async def screener(client, scale):
+    """KR screener queries once the background matrix build has finished."""
+    await client.post("/api/screener", json={"market": "kr"})
+    for _ in range(600):
+        status = next(m for m in (await client.get("/api/screener")).json()["markets"] if m["market"] == "kr")
+        if status["universe"] and status["loaded"] == status["universe"] and not status["building"]:
+            break
+        await asyncio.sleep(0.5)
+    body = {"market": "kr", "filter": "rsi14 < 60 and close > sma50", "sort": "close / sma200", "limit": 20}
+    reqs = [("POST", "/api/screener", body)] * int(2000 * scale)
+    return await _load(client, reqs, 32)
+
+
+SCENARIOS = {f.__name__: f for f in (cold, hot, herd, watchlist, overview, fundamentals, screener)}
+
+
+def run_scenario(name: str, upstream_url: str, args) -> Result:
+    port = _free_port()
+    env = {
+        **os.environ,
+        "YAHOO_BASE_URL": upstream_url,
+        "BOK_BASE_URL": upstream_url,
+        "BOK_API_KEY": "bench",
+        "DATA_DIR": tempfile.mkdtemp(prefix="bench-"),
+        "CACHE_BACKEND": args.cache_backend,
+    }
+    if not args.realistic_limits:
+        env.update({"YAHOO_RATE_LIMIT": "1e6", "YAHOO_BURST": "1000000",
+                    "KRX_RATE_LIMIT": "1e6", "KRX_BURST": "1000000"})
+    proc = _spawn(["bench.serve_app", "--port", str(port), "--krx-latency-ms", str(args.krx_latency_ms),
+                   "--krx-error-rate", str(args.krx_error_rate), "--workers", str(args.workers)], env)
+    base = f"http://127.0.0.1:{port}"
+    result = Result(name)
+    try:
+        _wait_ready(f"{base}/api/health", proc)
+        httpx.delete(f"{upstream_url}/__stats")
+
+        async def go():
+            limits = httpx.Limits(max_connections=600, max_keepalive_connections=600)
+            async with httpx.AsyncClient(base_url=base, timeout=120, limits=limits) as client:
+                return await SCENARIOS[name](client, args.scale)
+
+        result.record(*asyncio.run(go()))
+        result.rss_mb, result.peak_rss_mb = _rss_mb(proc.pid)
+        result.upstream_calls = httpx.get(f"{upstream_url}/__stats").json()
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    return result
+
+
+def _print_table(results: list[Result]) -> None:
+    header = f"{'scenario':<10} {'reqs':>6} {'err':>5} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} " \
+             f"{'req/s':>9} {'rss MB':>7} {'peak MB':>8}  upstream"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        calls = ",".join(f"{k}={v}" for k, v in sorted(r.upstream_calls.items()))
+        print(f"{r.scenario:<10} {r.requests:>6} {r.errors:>5} {r.p50_ms:>9.2f} {r.p99_ms:>9.2f} "
+              f"{r.max_ms:>9.2f} {r.rps:>9.1f} {r.rss_mb:>7.1f} {r.peak_rss_mb:>8.1f}  {calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load scenarios against a fake upstream")
+    parser.add_argument("scenarios", nargs="*", help=f"subset to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="fake upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream 503s")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of upstream 429s")
+    parser.add_argument("--krx-latency-ms", type=float, default=30.0)
+    parser.add_argument("--krx-error-rate", type=float, default=0.0, help="fraction of failed KRX listing fetches")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply request counts")
+    parser.add_argument("--workers", type=int, default=1, help="API worker processes")
+    parser.add_argument("--cache-backend", default="memory", choices=("memory", "sqlite", "redis"))
+    parser.add_argument("--realistic-limits", action="store_true", help="keep production rate limits")
+    parser.add_argument("--recorded", help="directory of recorded upstream responses")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    upstream_port = _free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    upstream_args = [
+        "bench.fake_upstream", "--port", str(upstream_port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate), "--throttle-rate", str(args.throttle_rate),
+    ]
+    if args.recorded:
+        upstream_args += ["--recorded", os.path.abspath(args.recorded)]
+    upstream = _spawn(upstream_args, dict(os.environ))
+    results = []
+    try:
+        _wait_ready(f"{upstream_url}/__stats", upstream)
+        for name in args.scenarios or SCENARIOS:
+            print(f"running {name}...", flush=True)
+            results.append(run_scenario(name, upstream_url, args))
+    finally:
+        upstream.terminate()
+        upstream.wait(10)
+
+    print()
+    _print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([asdict(r) for r in results], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
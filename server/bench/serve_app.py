@@ -0,0 +1,81 @@
+"""Run the API with FinanceDataReader replaced by bench fixtures.
+
+FDR talks to KRX/Naver with its own HTTP code, so it cannot be pointed at
+the fake upstream; its entry points (daily bars, listings and the Naver
+market-sum table) are swapped for fixture-backed functions with the same
+latency/error injection instead. Yahoo and ECOS
+go over HTTP to whatever YAHOO_BASE_URL / BOK_BASE_URL name.
+
+    YAHOO_BASE_URL=http://127.0.0.1:8900 python -m bench.serve_app --port 8901
+
+With ``--workers N`` each worker process installs the fixtures itself
+(settings travel through BENCH_KRX_* environment variables).
+"""
+import argparse
+import os
+import random
+import time
+
+import FinanceDataReader as fdr
+from FinanceDataReader.naver import snap
+
+from bench import fixtures
+
+
+def install_fake_fdr(latency_ms: float = 0.0, error_rate: float = 0.0) -> None:
+    def delay():
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        if random.random() < error_rate:
+            raise ConnectionError("fake KRX failure")
+
+    def data_reader(symbol, start=None, end=None, *args, **kwargs):
+        delay()
+        return fixtures.kr_daily(symbol, start)
+
+    def stock_listing(market):
+        delay()
+        return fixtures.kr_listing(market)
+
+    def marcap_page(sosok, page):
+        delay()
+        return fixtures.kr_marcap_page(sosok, page)
+
+    fdr.DataReader = data_reader
+    fdr.StockListing = stock_listing
+    snap._marcap_market_page = marcap_page
+
+
+def create_app():
+    """uvicorn factory for multi-worker runs."""
+    install_fake_fdr(float(os.getenv("BENCH_KRX_LATENCY_MS", "0")), float(os.getenv("BENCH_KRX_ERROR_RATE", "0")))
+    from main import app
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve main:app against bench fixtures")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--krx-latency-ms", type=float, default=0.0)
+    parser.add_argument("--krx-error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        os.environ["BENCH_KRX_LATENCY_MS"] = str(args.krx_latency_ms)
+        os.environ["BENCH_KRX_ERROR_RATE"] = str(args.krx_error_rate)
+        uvicorn.run("bench.serve_app:create_app", factory=True, host=args.host, port=args.port,
+                    workers=args.workers, log_level="warning")
+        return
+
+    install_fake_fdr(args.krx_latency_ms, args.krx_error_rate)
+    from main import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
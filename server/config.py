@@ -4,3 +4,43 @@ from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 
 BOK_API_KEY = os.getenv('BOK_API_KEY', '')
+
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '4096'))
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_MB', '256')) * 1024 * 1024
+
+DATA_DIR = os.getenv('DATA_DIR', os.path.join(os.path.dirname(__file__), 'data'))
+BAR_STORE_PATH = os.getenv('BAR_STORE_PATH', os.path.join(DATA_DIR, 'bars.sqlite3'))
+
+# Cache backend: 'memory' (per process), 'sqlite' or 'redis' (shared by every worker on the node)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory').lower()
+CACHE_PATH = os.getenv('CACHE_PATH', os.path.join(DATA_DIR, 'cache.sqlite3'))
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+CACHE_LOCAL_BYTES = int(os.getenv('CACHE_LOCAL_MB', '64')) * 1024 * 1024  # per-worker memo for shared backends
+
+# Import heavy provider libraries at startup instead of on first use (long-lived workers)
+PRELOAD = os.getenv('PRELOAD', '').lower() in ('1', 'true', 'yes')
+
+# Record per-stage timings into stage_duration_seconds (also switchable at runtime)
+PROFILE_STAGES = os.getenv('PROFILE_STAGES', '').lower() in ('1', 'true', 'yes')
+
+# Upstream endpoints (overridable to point at a local stand-in, e.g. bench/fake_upstream.py)
+YAHOO_BASE_URL = os.getenv('YAHOO_BASE_URL', 'https://query1.finance.yahoo.com').rstrip('/')
+BOK_BASE_URL = os.getenv('BOK_BASE_URL', 'https://ecos.bok.or.kr').rstrip('/')
+
+# Upstream request budgets (requests per second, burst)
+YAHOO_RATE_LIMIT = float(os.getenv('YAHOO_RATE_LIMIT', '8'))
+YAHOO_BURST = int(os.getenv('YAHOO_BURST', '20'))
+KRX_RATE_LIMIT = float(os.getenv('KRX_RATE_LIMIT', '4'))
+KRX_BURST = int(os.getenv('KRX_BURST', '8'))
+
+# Background cache warming (services/prefetch.py)
+PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', '1').lower() in ('1', 'true', 'yes')
+PREFETCH_INTERVAL = float(os.getenv('PREFETCH_INTERVAL', '15'))    # seconds between scheduler ticks
+PREFETCH_LEAD = float(os.getenv('PREFETCH_LEAD', '60'))            # refresh this long before expiry
+PREFETCH_BUDGET = int(os.getenv('PREFETCH_BUDGET', '20'))          # max refreshes per tick
+HOT_SET_PATH = os.getenv('HOT_SET_PATH', os.path.join(DATA_DIR, 'hot_set.json'))
+
+# Screener universes (services/screener.py)
+# US: a file with one symbol per line (e.g. the S&P 500); the hot set's US tickers when it is missing
+SCREENER_US_UNIVERSE = os.getenv('SCREENER_US_UNIVERSE', os.path.join(DATA_DIR, 'us_universe.txt'))
+SCREENER_KR_MAX = int(os.getenv('SCREENER_KR_MAX', '0'))   # largest N of the KRX listing by market cap; 0 = all
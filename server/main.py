@@ -1,9 +1,32 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import stocks, exchange, fundamentals, market_data
+from config import PRELOAD
+from routers import stocks, exchange, fundamentals, market_data, cache, analytics, metrics, hotset, stream, agents, portfolio, screener
+from services.http_client import close_client
+from services.prefetch import prefetcher
+from services.quote_hub import quote_hub
+from services.screener import screener as screener_service
 from utils.error_handlers import register_error_handlers
+from utils.lazy_import import preload
+from utils.metrics import MetricsMiddleware
 
-app = FastAPI(title="Investment Agent Swarm API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PRELOAD:
+        await asyncio.to_thread(preload)
+    prefetcher.start()
+    yield
+    await quote_hub.stop()
+    await screener_service.stop()
+    await prefetcher.stop()
+    await close_client()
+
+
+app = FastAPI(title="Investment Agent Swarm API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,14 +36,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 register_error_handlers(app)
 
 app.include_router(stocks.router)
 app.include_router(exchange.router)
 app.include_router(fundamentals.router)
 app.include_router(market_data.router)
+app.include_router(cache.router)
+app.include_router(analytics.router)
+app.include_router(metrics.router)
+app.include_router(hotset.router)
+app.include_router(stream.router)
+app.include_router(agents.router)
+app.include_router(portfolio.router)
+app.include_router(screener.router)
 
 
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--preload", action="store_true",
+                        help="import heavy provider libraries before serving instead of on first use")
+    args = parser.parse_args()
+
+    if args.preload:
+        preload()
+        os.environ["PRELOAD"] = "1"  # worker processes import the app afresh
+    uvicorn.run("main:app" if args.workers > 1 else app, host=args.host, port=args.port, workers=args.workers)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
 
@@ -58,6 +58,8 @@ class MarketOverviewResponse(BaseModel):
     vix: float
     usdKrw: float
     updatedAt: str
+    stale: list[str] = []   # legs served from the last good value
+    failed: list[str] = []  # legs with no value at all (reported as 0)
 
 
 class IndicatorValue(BaseModel):
@@ -71,3 +73,231 @@ class IndicatorValue(BaseModel):
     sma20: Optional[float] = None
     sma50: Optional[float] = None
     sma200: Optional[float] = None
+
+
+class IndicatorSeries(BaseModel):
+    ticker: str
+    market: str
+    dates: list[str]
+    close: list[float]
+    series: dict[str, list[Optional[float]]]
+
+
+class IndicatorSeriesRequest(BaseModel):
+    market: str  # 'us' | 'kr'
+    tickers: list[str] = Field(max_length=100)
+    period: str = "1y"
+
+
+class CacheStatsResponse(BaseModel):
+    entries: int
+    bytes: int
+    maxEntries: int
+    maxBytes: int
+    hits: int
+    stale: int
+    misses: int
+    evictions: int
+    expirations: int
+    namespaces: dict[str, dict[str, int]]
+
+
+class BatchStockItem(BaseModel):
+    market: str  # 'us' | 'kr'
+    ticker: str
+    period: str = "6mo"
+
+
+class BatchStockRequest(BaseModel):
+    items: list[BatchStockItem] = Field(max_length=500)
+    format: str = "json"  # 'json' | 'columnar'
+
+
+class KrSymbol(BaseModel):
+    code: str
+    name: str
+    market: Optional[str] = None  # 'KOSPI' | 'KOSDAQ' | 'KONEX'
+    sector: Optional[str] = None
+    marketCap: Optional[float] = None
+    shares: Optional[float] = None
+
+
+class AssetRef(BaseModel):
+    market: str  # 'us' | 'kr'
+    ticker: str
+
+
+class FundamentalsBatchRequest(BaseModel):
+    items: list[AssetRef] = Field(max_length=500)
+    detail: bool = False      # US: also load the per-ticker quoteSummary fields
+
+
+class FundamentalsBatchResponse(BaseModel):
+    fundamentals: list[FundamentalsResponse]
+    errors: dict[str, str] = {}   # 'market:ticker' -> error
+
+
+class CorrelationRequest(BaseModel):
+    assets: list[AssetRef]
+    period: str = "1y"
+    window: int = 60          # trading days per rolling window
+    step: int = 5             # days between rolling snapshots
+    currency: str = "local"   # 'local' | 'usd' (KR closes converted with USD/KRW history)
+    rolling: bool = False     # include the full stack of rolling matrices
+
+
+class CorrelationResponse(BaseModel):
+    assets: list[str]         # 'market:ticker', in request order
+    window: int
+    currency: str
+    asOf: str
+    observations: int         # aligned daily returns used
+    correlation: list[list[Optional[float]]]
+    beta: list[list[Optional[float]]]   # beta[i][j]: sensitivity of asset i to asset j
+    dates: list[str] = []     # end date of each rolling window (rolling=True)
+    rollingCorrelation: list[list[list[Optional[float]]]] = []
+    rollingBeta: list[list[list[Optional[float]]]] = []
+
+
+class HotSetRequest(BaseModel):
+    items: list[BatchStockItem]
+
+
+class PrefetchJob(BaseModel):
+    name: str
+    expiresIn: Optional[float] = None   # seconds until the cached entry goes stale
+    lastRefresh: Optional[str] = None
+    failures: int = 0
+    lastError: Optional[str] = None
+
+
+class HotSetResponse(BaseModel):
+    items: list[BatchStockItem]
+    enabled: bool
+    running: bool
+    marketsOpen: dict[str, bool]
+    jobs: list[PrefetchJob]
+
+
+class AgentContext(BaseModel):
+    version: int              # bumped when the bundle layout changes
+    market: str
+    ticker: str
+    asOf: str                 # date of the latest bar
+    generatedAt: str
+    info: StockInfo
+    currentPrice: float
+    change: float
+    changePercent: float
+    bars: dict[str, list]     # recent bars, columnar: date, open, high, low, close, volume
+    indicators: IndicatorValue
+    fundamentals: Optional[FundamentalsResponse] = None
+    fx: Optional[ExchangeRateResponse] = None
+    stats: dict[str, Optional[float]]
+    missing: list[str] = []   # legs that failed and were left out
+
+
+class AgentContextRequest(BaseModel):
+    items: list[AssetRef] = Field(max_length=100)
+    bars: int = 20
+
+
+class AgentContextBatchResponse(BaseModel):
+    contexts: list[AgentContext]
+    errors: dict[str, str] = {}   # 'market:ticker' -> error
+
+
+class PortfolioPosition(BaseModel):
+    market: str               # 'us' | 'kr'
+    ticker: str
+    shares: float
+    avgPrice: float = 0.0     # per share, in the listing's currency
+    id: Optional[str] = None
+
+
+class ValuationRequest(BaseModel):
+    positions: list[PortfolioPosition]
+    cashUsd: float = 0.0
+    cashKrw: float = 0.0
+
+
+class PositionValuation(BaseModel):
+    index: int                # position's index in the request
+    id: Optional[str] = None
+    market: str
+    ticker: str
+    name: str
+    currency: str
+    shares: float
+    avgPrice: float
+    price: float
+    asOf: str
+    value: dict[str, float]           # 'local' | 'usd' | 'krw'
+    pnl: dict[str, float]
+    pnlPercent: Optional[float] = None
+    dayChange: dict[str, float]
+    dayChangePercent: float
+    weight: Optional[float] = None    # % of total position value
+
+
+class ValuationTotals(BaseModel):
+    valueUsd: float
+    valueKrw: float
+    costUsd: float
+    costKrw: float
+    pnlUsd: float
+    pnlKrw: float
+    pnlPercent: Optional[float] = None
+    dayChangeUsd: float
+    dayChangeKrw: float
+    dayChangePercent: Optional[float] = None
+    cashUsd: float
+    cashKrw: float
+    equityUsd: float
+    equityKrw: float
+
+
+class ValuationResponse(BaseModel):
+    usdKrw: float
+    fxSource: str
+    positions: list[PositionValuation]
+    totals: ValuationTotals
+    errors: dict[int, str] = {}       # position index -> error
+
+
+class ScreenerRequest(BaseModel):
+    market: str                       # 'us' | 'kr'
+    filter: Optional[str] = None      # condition, e.g. "rsi14 < 30 and close > sma200"
+    sort: Optional[str] = None        # field or expression, e.g. "marketCap" or "close / sma200"
+    descending: bool = True
+    limit: int = 50
+    fields: list[str] = []            # extra columns to return
+
+
+class ScreenerRow(BaseModel):
+    ticker: str
+    name: Optional[str] = None
+    asOf: str                         # date of the ticker's latest bar
+    score: Optional[float] = None     # value of ``sort``
+    values: dict[str, Optional[float]]
+
+
+class ScreenerStatus(BaseModel):
+    market: str
+    universe: int
+    loaded: int                       # tickers with bars in the matrix
+    building: bool                    # initial load or a reload pass still running
+    asOf: Optional[str] = None
+    updatedAt: Optional[str] = None
+    lastError: Optional[str] = None
+
+
+class ScreenerResponse(ScreenerStatus):
+    matched: int
+    results: list[ScreenerRow]
+
+
+class ScreenerFieldsResponse(BaseModel):
+    fields: dict[str, int]            # name -> bars of history, addressable as name[0] .. name[n - 1]
+    functions: list[str]
+    markets: list[ScreenerStatus]
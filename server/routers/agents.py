@@ -0,0 +1,39 @@
+import asyncio
+from fastapi import APIRouter, Query, Request
+from services.agent_context import MAX_CONTEXT_BARS, context_key, get_context
+from services.payload import Payload, cached_payload, respond
+from models.stock import AgentContext, AgentContextBatchResponse, AgentContextRequest
+
+router = APIRouter(prefix="/api/agents", tags=["agents"])
+
+BATCH_CONCURRENCY = 8
+
+
+@router.get("/context/{market}/{ticker}", response_model=AgentContext)
+async def agent_context(request: Request, market: str, ticker: str,
+                        bars: int = Query(20, ge=1, le=MAX_CONTEXT_BARS)):
+    """Everything an analysis run needs for one ticker: recent bars, indicators, fundamentals, FX, stats."""
+    context = await get_context(market, ticker, bars)
+    key = context_key(market, ticker, bars)
+    payload = cached_payload(key, context, lambda: Payload.json(context, context.model_dump(mode="json")))
+    return await respond(request, payload, key)
+
+
+@router.post("/context", response_model=AgentContextBatchResponse)
+async def agent_context_batch(req: AgentContextRequest):
+    """Context bundles for many tickers in one round trip; failures are reported per ticker."""
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def one(market: str, ticker: str):
+        async with sem:
+            return await get_context(market, ticker, req.bars)
+
+    results = await asyncio.gather(*(one(a.market, a.ticker) for a in req.items), return_exceptions=True)
+    contexts, errors = [], {}
+    for asset, result in zip(req.items, results):
+        if isinstance(result, BaseException):
+            errors[f"{asset.market}:{asset.ticker}"] = str(result) if isinstance(result, ValueError) \
+                else type(result).__name__
+        else:
+            contexts.append(result)
+    return AgentContextBatchResponse(contexts=contexts, errors=errors)
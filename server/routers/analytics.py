@@ -0,0 +1,40 @@
+import numpy as np
+from fastapi import APIRouter
+from services.analytics import get_correlation
+from models.stock import CorrelationRequest, CorrelationResponse
+
+router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+
+
+def _matrices(stack: np.ndarray) -> list:
+    """Round to 4 places; NaN (no variance in the window) becomes null."""
+    rounded = np.round(stack, 4).astype(object)
+    rounded[np.isnan(stack)] = None
+    return rounded.tolist()
+
+
+@router.post("/correlation", response_model=CorrelationResponse)
+async def correlation(req: CorrelationRequest):
+    """Rolling correlation and beta across US and KR tickers.
+
+    Calendars are aligned on days every requested market traded. With
+    ``currency: usd`` KR closes are converted with USD/KRW history first.
+    """
+    result = await get_correlation(
+        [(a.market, a.ticker) for a in req.assets], req.period, req.window, req.step, req.currency, req.rolling,
+    )
+    dates = np.datetime_as_string(result["days"].astype("datetime64[D]")).tolist()
+    response = CorrelationResponse(
+        assets=result["labels"],
+        window=req.window,
+        currency=req.currency,
+        asOf=dates[-1],
+        observations=result["observations"],
+        correlation=_matrices(result["corr"][-1]),
+        beta=_matrices(result["beta"][-1]),
+    )
+    if req.rolling:
+        response.dates = dates
+        response.rollingCorrelation = _matrices(result["corr"])
+        response.rollingBeta = _matrices(result["beta"])
+    return response
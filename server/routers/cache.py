@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from services.cache import cache
+from models.stock import CacheStatsResponse
+
+router = APIRouter(prefix="/api/cache", tags=["cache"])
+
+
+@router.get("/stats", response_model=CacheStatsResponse)
+async def cache_stats():
+    return await cache.offload(cache.stats)
@@ -1,10 +1,13 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from services.bok_exchange import get_usd_krw
+from services.payload import Payload, cached_payload, respond
 from models.stock import ExchangeRateResponse
 
 router = APIRouter(prefix="/api/exchange", tags=["exchange"])
 
 
 @router.get("/usd-krw", response_model=ExchangeRateResponse)
-def usd_krw():
-    return get_usd_krw()
+async def usd_krw(request: Request):
+    rate = await get_usd_krw()
+    payload = cached_payload("exchange:usd_krw", rate, lambda: Payload.json(rate, rate.model_dump(mode="json")))
+    return await respond(request, payload, "exchange:usd_krw")
@@ -1,16 +1,33 @@
+import asyncio
 from fastapi import APIRouter
-from services.us_stocks import get_us_fundamentals
+from services.us_fundamentals import get_us_fundamentals
 from services.kr_stocks import get_kr_fundamentals
-from models.stock import FundamentalsResponse
+from services.stocks import get_fundamentals
+from models.stock import FundamentalsBatchRequest, FundamentalsBatchResponse, FundamentalsResponse
 
 router = APIRouter(prefix="/api/fundamentals", tags=["fundamentals"])
 
 
 @router.get("/us/{ticker}", response_model=FundamentalsResponse)
-def us_fundamentals(ticker: str):
-    return get_us_fundamentals(ticker.upper())
+async def us_fundamentals(ticker: str, detail: bool = True):
+    return await get_us_fundamentals(ticker.upper(), detail)
 
 
 @router.get("/kr/{ticker}", response_model=FundamentalsResponse)
-def kr_fundamentals(ticker: str):
-    return get_kr_fundamentals(ticker)
+async def kr_fundamentals(ticker: str):
+    return await get_kr_fundamentals(ticker)
+
+
+@router.post("/batch", response_model=FundamentalsBatchResponse)
+async def fundamentals_batch(req: FundamentalsBatchRequest):
+    """Fundamentals for many tickers; US quote fields for the whole list share a few batched upstream calls."""
+    results = await asyncio.gather(*(get_fundamentals(a.market, a.ticker, req.detail) for a in req.items),
+                                   return_exceptions=True)
+    fundamentals, errors = [], {}
+    for asset, result in zip(req.items, results):
+        if isinstance(result, BaseException):
+            errors[f"{asset.market}:{asset.ticker}"] = str(result) if isinstance(result, ValueError) \
+                else type(result).__name__
+        else:
+            fundamentals.append(result)
+    return FundamentalsBatchResponse(fundamentals=fundamentals, errors=errors)
@@ -0,0 +1,39 @@
+import asyncio
+from fastapi import APIRouter, Query
+from services.cache import cache
+from services.prefetch import prefetcher
+from models.stock import BatchStockItem, HotSetRequest, HotSetResponse
+
+router = APIRouter(prefix="/api/hotset", tags=["hotset"])
+
+_warming: set[asyncio.Task] = set()
+
+
+async def _response() -> HotSetResponse:
+    items = [BatchStockItem(market=m, ticker=t, period=p) for m, t, p in prefetcher.hot_set()]
+    return HotSetResponse(items=items, **await cache.offload(prefetcher.status))
+
+
+@router.get("", response_model=HotSetResponse)
+async def hot_set():
+    """Tickers kept warm in the background, plus the scheduler's view of every job."""
+    return await _response()
+
+
+@router.post("", response_model=HotSetResponse)
+async def add_to_hot_set(req: HotSetRequest):
+    """Register tickers for background refresh; new ones are warmed right away."""
+    prefetcher.add_many([(item.market, item.ticker, item.period) for item in req.items])
+    await asyncio.to_thread(prefetcher.save)
+    task = asyncio.create_task(prefetcher.tick())
+    _warming.add(task)
+    task.add_done_callback(_warming.discard)
+    return await _response()
+
+
+@router.delete("/{market}/{ticker}", response_model=HotSetResponse)
+async def remove_from_hot_set(market: str, ticker: str, period: str = Query("6mo")):
+    if not prefetcher.remove(market, ticker, period):
+        raise ValueError(f"{market}:{ticker}:{period} is not in the hot set")
+    await asyncio.to_thread(prefetcher.save)
+    return await _response()
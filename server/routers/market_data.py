@@ -1,77 +1,255 @@
-from fastapi import APIRouter
+import asyncio
+import numpy as np
+from fastapi import APIRouter, Query, Request
 from datetime import datetime
 from services.cache import cache
-from services.us_stocks import _session, _fetch_chart
-from services.indicators import compute_indicators
-from services.us_stocks import get_us_stock
-from services.kr_stocks import get_kr_stock
+from services.singleflight import cached_fetch
+from services.us_stocks import _fetch_chart, _fetch_spark
+from services.indicators import IndicatorState, indicator_series, series_to_list
+from services.stocks import get_series
+from services.ohlcv import StockSeries
 from services.bok_exchange import get_usd_krw
-from models.stock import MarketOverviewResponse, IndicatorValue
+from services.payload import Payload, cached_payload, respond
+from services.prefetch import Job, prefetcher
+from utils.rate_limiter import yahoo_limiter
+from utils.metrics import stage
+from models.stock import (
+    MarketOverviewResponse, IndicatorValue, IndicatorSeries, IndicatorSeriesRequest,
+)
 
 router = APIRouter(prefix="/api/market", tags=["market"])
 
+INDEX_LEGS = {
+    "sp500": "^GSPC",
+    "nasdaq": "^IXIC",
+    "kospi": "^KS11",
+    "kosdaq": "^KQ11",
+    "vix": "^VIX",
+}
 
-def _index(ticker: str) -> dict:
+OVERVIEW_TTL = 300          # 5 min
+PARTIAL_OVERVIEW_TTL = 30   # retry soon when a leg was stale or failed
+LAST_GOOD_TTL = 86400       # 24h
+LEG_DEADLINE = 2.5          # seconds per upstream leg
+INDICATOR_TTL = 300         # 5 min
+INDICATOR_STATE_TTL = 86400  # 24h
+BATCH_CONCURRENCY = 8       # upstream fetches in flight per series batch
+
+
+def _index_from_chart(chart: dict) -> dict:
+    closes = chart.get("indicators", {}).get("quote", [{}])[0].get("close", [])
+    # Filter None values
+    valid = [c for c in closes if c is not None]
+    if not valid:
+        raise ValueError("No index closes")
+    last = round(valid[-1], 2)
+    prev = round(valid[-2], 2) if len(valid) >= 2 else last
+    return {"value": last, "change": round(last - prev, 2)}
+
+
+async def _timed(name: str, leg):
+    with stage("market_overview", name):
+        return await leg
+
+
+async def _index(ticker: str) -> dict:
     """Fetch index value via direct Yahoo Finance API."""
+    return _index_from_chart(await _fetch_chart(ticker, "5d"))
+
+
+async def _indices(symbols: list[str]) -> dict[str, dict]:
+    """Index values for all symbols: one spark call, per-symbol charts for any it misses.
+
+    Both steps share one LEG_DEADLINE budget.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + LEG_DEADLINE
+    values = {}
     try:
-        chart = _fetch_chart(ticker, "5d")
-        closes = chart.get("indicators", {}).get("quote", [{}])[0].get("close", [])
-        # Filter None values
-        valid = [c for c in closes if c is not None]
-        if not valid:
-            return {"value": 0, "change": 0}
-        last = round(valid[-1], 2)
-        prev = round(valid[-2], 2) if len(valid) >= 2 else last
-        return {"value": last, "change": round(last - prev, 2)}
+        charts = await asyncio.wait_for(_fetch_spark(symbols), LEG_DEADLINE)
+        for symbol, chart in charts.items():
+            try:
+                values[symbol] = _index_from_chart(chart)
+            except ValueError:
+                pass
     except Exception:
-        return {"value": 0, "change": 0}
+        pass
 
+    missing = [s for s in symbols if s not in values]
+    remaining = deadline - loop.time()
+    if not missing or remaining <= 0:
+        return values
+    results = await asyncio.gather(
+        *(asyncio.wait_for(_index(s), remaining) for s in missing), return_exceptions=True,
+    )
+    for symbol, result in zip(missing, results):
+        if not isinstance(result, BaseException):
+            values[symbol] = result
+    return values
 
-@router.get("/overview", response_model=MarketOverviewResponse)
-def market_overview():
-    cache_key = "market_overview"
-    cached = cache.get(cache_key)
-    if cached:
-        return cached
-
-    sp500 = _index("^GSPC")
-    nasdaq = _index("^IXIC")
-    kospi = _index("^KS11")
-    kosdaq = _index("^KQ11")
-    vix_data = _index("^VIX")
 
+async def _usd_krw_leg() -> tuple[float | None, bool]:
+    """USD/KRW within the leg deadline, falling back to the stale cached rate."""
     try:
-        fx = get_usd_krw()
-        usd_krw = fx.usdKrw
+        fx = await asyncio.wait_for(get_usd_krw(), LEG_DEADLINE)
+        return fx.usdKrw, False
     except Exception:
+        hit = await cache.aget_stale("exchange:usd_krw")
+        return (hit[0].usdKrw, True) if hit else (None, False)
+
+
+async def get_overview(refresh: bool = False) -> MarketOverviewResponse:
+    return await cached_fetch(
+        "market_overview",
+        lambda r: PARTIAL_OVERVIEW_TTL if (r.stale or r.failed) else OVERVIEW_TTL,
+        _load_overview,
+        stale_ttl=OVERVIEW_TTL,
+        refresh=refresh,
+    )
+
+
+prefetcher.add_job(Job(
+    "market_overview", "market_overview", lambda: get_overview(refresh=True), ("us", "kr"), yahoo_limiter,
+))
+
+
+@router.get("/overview", response_model=MarketOverviewResponse)
+async def market_overview(request: Request):
+    overview = await get_overview()
+    payload = cached_payload(
+        "market_overview", overview, lambda: Payload.json(overview, overview.model_dump(mode="json")),
+    )
+    return await respond(request, payload, "market_overview")
+
+
+async def _load_overview() -> MarketOverviewResponse:
+    """Fetch all legs concurrently; late or failed legs fall back to their last good value."""
+    (values, (usd_krw, fx_stale)) = await asyncio.gather(
+        _timed("indices", _indices(list(INDEX_LEGS.values()))), _timed("usd_krw", _usd_krw_leg()),
+    )
+
+    legs, stale, failed = {}, [], []
+    for leg, symbol in INDEX_LEGS.items():
+        last_key = f"index_last:{symbol}"
+        if symbol in values:
+            legs[leg] = values[symbol]
+            await cache.aset(last_key, values[symbol], LAST_GOOD_TTL)
+            continue
+        last_good = await cache.aget(last_key)
+        if last_good:
+            legs[leg] = last_good
+            stale.append(leg)
+        else:
+            legs[leg] = {"value": 0, "change": 0}
+            failed.append(leg)
+
+    if usd_krw is None:
         usd_krw = 0
+        failed.append("usdKrw")
+    elif fx_stale:
+        stale.append("usdKrw")
 
-    result = MarketOverviewResponse(
-        sp500=sp500,
-        nasdaq=nasdaq,
-        kospi=kospi,
-        kosdaq=kosdaq,
-        vix=vix_data["value"],
+    return MarketOverviewResponse(
+        sp500=legs["sp500"],
+        nasdaq=legs["nasdaq"],
+        kospi=legs["kospi"],
+        kosdaq=legs["kosdaq"],
+        vix=legs["vix"]["value"],
         usdKrw=usd_krw,
         updatedAt=datetime.now().isoformat(),
+        stale=stale,
+        failed=failed,
     )
-    cache.set(cache_key, result, 300)  # 5 min
-    return result
+
+
+def _series_response(market: str, data: StockSeries, dates: list[str], closes, series: dict) -> IndicatorSeries:
+    return IndicatorSeries(
+        ticker=data.info.ticker,
+        market=market,
+        dates=dates,
+        close=closes.tolist(),
+        series={name: series_to_list(values) for name, values in series.items()},
+    )
+
+
+async def _indicator_state(market: str, ticker: str) -> IndicatorState:
+    """Per-ticker running indicators, seeded once from 1y and then fed recent bars."""
+    state_key = f"indicator_state:{market}:{ticker}"
+    state = await cache.aget(state_key)
+    if state:
+        with stage("compute_indicators", "bars"):
+            recent = (await get_series(market, ticker, "5d")).frame
+        with stage("compute_indicators", "update"):
+            if state.apply(recent.dates(), recent.close.tolist()):
+                return state
+
+    with stage("compute_indicators", "bars"):
+        bars = (await get_series(market, ticker, "1y")).frame
+    with stage("compute_indicators", "seed"):
+        state = IndicatorState.from_history(bars.dates(), bars.close.tolist())
+    await cache.aset(state_key, state, INDICATOR_STATE_TTL)
+    return state
 
 
 @router.get("/indicators/{market}/{ticker}", response_model=IndicatorValue)
-def indicators(market: str, ticker: str):
+async def indicators(market: str, ticker: str):
     cache_key = f"indicators:{market}:{ticker}"
-    cached = cache.get(cache_key)
+    cached = await cache.aget(cache_key)
     if cached:
         return cached
 
-    if market == "us":
-        data = get_us_stock(ticker.upper(), "1y")
-    else:
-        data = get_kr_stock(ticker, "1y")
+    state = await _indicator_state(market, ticker)
+    with stage("compute_indicators", "snapshot"):
+        result = state.snapshot()
+    await cache.aset(cache_key, result, INDICATOR_TTL)
+    return result
 
-    closes = [item.close for item in data.ohlcv]
-    result = compute_indicators(closes)
-    cache.set(cache_key, result, 300)
+
+@router.get("/indicators/{market}/{ticker}/series", response_model=IndicatorSeries)
+async def indicator_series_single(market: str, ticker: str, period: str = Query("1y")):
+    """Full indicator time series for chart overlays."""
+    cache_key = f"indicators:series:{market}:{ticker}:{period}"
+    cached = await cache.aget(cache_key)
+    if cached:
+        return cached
+
+    with stage("compute_indicators", "bars"):
+        data = await get_series(market, ticker, period)
+    closes = data.frame.close
+    with stage("compute_indicators", "series"):
+        series = indicator_series(closes)
+    with stage("compute_indicators", "model"):
+        result = _series_response(market, data, data.frame.dates(), closes, series)
+    await cache.aset(cache_key, result, INDICATOR_TTL)
     return result
+
+
+@router.post("/indicators/series", response_model=list[IndicatorSeries])
+async def indicator_series_batch(req: IndicatorSeriesRequest):
+    """Indicator series for many tickers of one market, computed as a single 2-D batch.
+
+    Bars are aligned on the dates shared by every ticker so rows line up.
+    """
+    if not req.tickers:
+        return []
+
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def load(ticker):
+        async with sem:
+            return await get_series(req.market, ticker, req.period)
+
+    stocks = await asyncio.gather(*(load(t) for t in req.tickers))
+    common = stocks[0].frame.day
+    for d in stocks[1:]:
+        common = np.intersect1d(common, d.frame.day)
+    if not len(common):
+        raise ValueError("Tickers share no trading days in the requested period")
+
+    matrix = np.array([d.frame.close[np.isin(d.frame.day, common)] for d in stocks])
+    dates = np.datetime_as_string(common.astype("datetime64[D]")).tolist()
+    batch = indicator_series(matrix)
+    return [
+        _series_response(req.market, d, dates, matrix[i], {k: v[i] for k, v in batch.items()})
+        for i, d in enumerate(stocks)
+    ]
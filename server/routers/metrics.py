@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import Response
+from services.cache import cache
+from utils.metrics import CONTENT_TYPE, registry, set_profiling, profiling_enabled
+from utils.rate_limiter import LIMITERS
+
+router = APIRouter(prefix="/api/metrics", tags=["metrics"])
+
+CACHE_COUNTERS = ("hits", "stale", "misses", "evictions", "expirations")
+
+
+@registry.collector
+def _cache_metrics():
+    namespaces = cache.stats()["namespaces"]
+    for field in CACHE_COUNTERS:
+        name = f"cache_{field}_total"
+        yield f"# HELP {name} Cache {field} by namespace."
+        yield f"# TYPE {name} counter"
+        for ns, s in namespaces.items():
+            yield f'{name}{{namespace="{ns}"}} {s[field]}'
+    for field in ("entries", "bytes"):
+        yield f"# HELP cache_{field} Cached {field} by namespace."
+        yield f"# TYPE cache_{field} gauge"
+        for ns, s in namespaces.items():
+            yield f'cache_{field}{{namespace="{ns}"}} {s[field]}'
+
+
+@registry.collector
+def _limiter_metrics():
+    stats = {name: limiter.stats() for name, limiter in LIMITERS.items()}
+    for field, kind in (("rate", "gauge"), ("throttled", "counter"), ("rejected", "counter"),
+                        ("penalties", "counter")):
+        name = f"rate_limiter_{field}" + ("_total" if kind == "counter" else "")
+        yield f"# HELP {name} Upstream token bucket {field} by provider."
+        yield f"# TYPE {name} {kind}"
+        for provider, s in stats.items():
+            yield f'{name}{{provider="{provider}"}} {s[field]}'
+
+
+@router.get("")
+async def metrics():
+    """Prometheus text exposition."""
+    # The cache collector reads backend stats
+    return Response(await cache.offload(registry.render), media_type=CONTENT_TYPE)
+
+
+@router.post("/profiling")
+async def profiling(enabled: bool = Query(...)):
+    """Switch per-stage timings (stage_duration_seconds) on or off at runtime."""
+    set_profiling(enabled)
+    return {"enabled": profiling_enabled()}
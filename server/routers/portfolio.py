@@ -0,0 +1,28 @@
+import orjson
+from fastapi import APIRouter, Query
+from fastapi.responses import Response, StreamingResponse
+from services.portfolio import check_size, usd_krw_rate, valuate, valuate_stream
+from models.stock import ValuationRequest, ValuationResponse
+
+router = APIRouter(prefix="/api/portfolio", tags=["portfolio"])
+
+
+@router.post("/valuate", response_model=ValuationResponse)
+async def valuate_portfolio(req: ValuationRequest, stream: bool = Query(False)):
+    """Value positions across US and KR in USD and KRW from cached quotes.
+
+    With ``stream=true`` the result is NDJSON: ``positions`` lines as quotes
+    resolve (cached ones first), then one ``summary`` line with totals,
+    weights and errors.
+    """
+    check_size(req.positions)
+    fx = await usd_krw_rate()
+    if not stream:
+        result = await valuate(req.positions, fx, req.cashUsd, req.cashKrw)
+        return Response(orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS), media_type="application/json")
+
+    async def lines():
+        async for event in valuate_stream(req.positions, fx, req.cashUsd, req.cashKrw):
+            yield orjson.dumps(event, option=orjson.OPT_NON_STR_KEYS) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
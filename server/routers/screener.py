@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from services.screen_expr import FUNCTIONS
+from services.screener import FIELDS, screener
+from models.stock import ScreenerFieldsResponse, ScreenerRequest, ScreenerResponse
+
+router = APIRouter(prefix="/api/screener", tags=["screener"])
+
+
+@router.post("", response_model=ScreenerResponse)
+async def screen(req: ScreenerRequest):
+    """Tickers of one market matching ``filter``, ordered by ``sort``.
+
+    The first query for a market starts loading its universe in the
+    background; until it finishes, results cover the tickers loaded so far.
+    """
+    return screener.query(req.market, req.filter, req.sort, req.descending, req.limit, req.fields)
+
+
+@router.get("", response_model=ScreenerFieldsResponse)
+async def screener_fields():
+    """Fields and functions usable in expressions, and each market's matrix status."""
+    return ScreenerFieldsResponse(fields=FIELDS, functions=list(FUNCTIONS), markets=screener.status())
@@ -1,16 +1,112 @@
-from fastapi import APIRouter, Query
-from services.us_stocks import get_us_stock
-from services.kr_stocks import get_kr_stock
-from models.stock import StockDataResponse
+import asyncio
+import orjson
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from services.us_stocks import get_us_series
+from services.kr_stocks import get_kr_series
+from services.kr_listing import get_kr_listing
+from services.ohlcv import StockSeries, PACKED_MEDIA_TYPE
+from services.stocks import get_series, is_cached, stock_cache_key
+from services.payload import Payload, cached_payload, respond
+from models.stock import StockDataResponse, BatchStockItem, BatchStockRequest, KrSymbol
+from utils.metrics import stage
 
 router = APIRouter(prefix="/api/stocks", tags=["stocks"])
 
+BATCH_CONCURRENCY = 8   # upstream fetches in flight per batch
+FORMATS = ("json", "columnar", "packed")
+
+
+def _render(series: StockSeries, fmt: str) -> Payload:
+    """Encode cached bars as row JSON (default), columnar JSON or packed binary."""
+    if fmt == "columnar":
+        return Payload.json(series, series.to_columnar())
+    if fmt == "packed":
+        return Payload(series, series.to_packed(), PACKED_MEDIA_TYPE)
+    return Payload.json(series, series.to_dict())
+
+
+async def _serve(request: Request, market: str, ticker: str, period: str, fmt: str, series: StockSeries) -> Response:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt} (expected one of {', '.join(FORMATS)})")
+    key = stock_cache_key(market, ticker, period)
+    with stage(f"{market}_stock", fmt):
+        payload = cached_payload(key, series, lambda: _render(series, fmt), fmt)
+    return await respond(request, payload, key)
+
+
+def _batch_line(index: int, item: BatchStockItem, fmt: str, data: StockSeries | None = None,
+                error: Exception | None = None) -> str:
+    line = {"index": index, "market": item.market, "ticker": item.ticker, "period": item.period}
+    if error is not None:
+        line["error"] = str(error) if isinstance(error, ValueError) else type(error).__name__
+    elif fmt == "columnar":
+        line["data"] = data.to_columnar()
+    else:
+        line["data"] = data.to_dict()
+    return orjson.dumps(line).decode() + "\n"
+
+
+async def _fetch_item(index: int, item: BatchStockItem, fmt: str, sem: asyncio.Semaphore) -> str:
+    try:
+        async with sem:
+            data = await get_series(item.market, item.ticker, item.period)
+    except Exception as e:
+        return _batch_line(index, item, fmt, error=e)
+    return _batch_line(index, item, fmt, data)
+
+
+async def _stream_batch(items: list[BatchStockItem], fmt: str):
+    """Yield cache hits right away, then misses in completion order."""
+    misses = []
+    for index, item in enumerate(items):
+        try:
+            cached = await is_cached(item.market, item.ticker, item.period)
+        except Exception:
+            cached = False
+        if not cached:
+            misses.append((index, item))
+            continue
+        try:
+            yield _batch_line(index, item, fmt, await get_series(item.market, item.ticker, item.period))
+        except Exception as e:
+            yield _batch_line(index, item, fmt, error=e)
+
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+    tasks = [asyncio.create_task(_fetch_item(i, item, fmt, sem)) for i, item in misses]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
 
 @router.get("/us/{ticker}", response_model=StockDataResponse)
-def us_stock(ticker: str, period: str = Query("6mo")):
-    return get_us_stock(ticker.upper(), period)
+async def us_stock(request: Request, ticker: str, period: str = Query("6mo"), format: str = Query("json")):
+    ticker = ticker.upper()
+    return await _serve(request, "us", ticker, period, format, await get_us_series(ticker, period))
+
+
+@router.get("/kr/search", response_model=list[KrSymbol])
+async def kr_search(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=100)):
+    """Symbol autocomplete over KRX codes and names."""
+    return (await get_kr_listing()).search(q, limit)
 
 
 @router.get("/kr/{ticker}", response_model=StockDataResponse)
-def kr_stock(ticker: str, period: str = Query("6mo")):
-    return get_kr_stock(ticker, period)
+async def kr_stock(request: Request, ticker: str, period: str = Query("6mo"), format: str = Query("json")):
+    return await _serve(request, "kr", ticker, period, format, await get_kr_series(ticker, period))
+
+
+@router.post("/batch")
+async def stock_batch(req: BatchStockRequest):
+    """Stream OHLCV for many (market, ticker, period) items as NDJSON.
+
+    Each line carries the item's ``index`` plus either ``data`` (a
+    StockDataResponse, or columnar bars with ``format: columnar``) or
+    ``error``; one bad ticker never fails the batch.
+    """
+    if req.format not in ("json", "columnar"):
+        raise ValueError("Batch format must be 'json' or 'columnar'")
+    return StreamingResponse(_stream_batch(req.items, req.format), media_type="application/x-ndjson")
@@ -0,0 +1,77 @@
+import asyncio
+import orjson
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from services.quote_hub import MAX_SYMBOLS_PER_CLIENT, Subscriber, parse_symbol, quote_hub
+
+router = APIRouter(prefix="/api/stream", tags=["stream"])
+
+SSE_HEARTBEAT = 15.0
+BAD_MESSAGE = 'Expected {"action": "subscribe"|"unsubscribe", "symbols": ["us:AAPL", ...]}'
+
+
+@router.websocket("/quotes")
+async def quotes_ws(websocket: WebSocket):
+    """Send ``{"action": "subscribe"|"unsubscribe", "symbols": ["us:AAPL", "kr:005930"]}``;
+    receives a snapshot per new symbol, then only changed fields."""
+    await websocket.accept()
+    sub = Subscriber()
+
+    async def writer():
+        while True:
+            for message in await sub.next():
+                await websocket.send_text(orjson.dumps(message).decode())
+
+    writing = asyncio.create_task(writer())
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+            try:
+                msg = orjson.loads(frame.get("text") or frame.get("bytes") or b"")
+            except orjson.JSONDecodeError:
+                msg = None
+            symbols = msg.get("symbols") or [] if isinstance(msg, dict) else None
+            if not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+                await websocket.send_json({"error": BAD_MESSAGE})
+                continue
+            try:
+                if msg.get("action") == "unsubscribe":
+                    quote_hub.unsubscribe(sub, symbols)
+                else:
+                    await quote_hub.subscribe(sub, symbols)
+            except ValueError as e:
+                await websocket.send_json({"error": str(e)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        writing.cancel()
+        quote_hub.unsubscribe(sub)
+
+
+@router.get("/quotes")
+async def quotes_sse(symbols: str = Query(..., description="Comma-separated, e.g. us:AAPL,kr:005930")):
+    """Server-Sent Events: one ``quote`` event per snapshot or delta, with a heartbeat comment."""
+    requested = [parse_symbol(s) for s in symbols.split(",") if s.strip()]
+    if len(set(requested)) > MAX_SYMBOLS_PER_CLIENT:
+        raise ValueError(f"At most {MAX_SYMBOLS_PER_CLIENT} symbols per stream")
+    sub = Subscriber()
+
+    async def events():
+        # Subscribe inside the generator so a client gone before the first event is still unsubscribed
+        try:
+            await quote_hub.subscribe(sub, requested)
+            while True:
+                try:
+                    messages = await asyncio.wait_for(sub.next(), SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                for message in messages:
+                    yield b"event: quote\ndata: " + orjson.dumps(message) + b"\n\n"
+        finally:
+            quote_hub.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,129 @@
+"""Context bundles for the agent swarm: one call instead of stock + fundamentals + browser-side indicators.
+
+A bundle is built from 1y of bars (enough for SMA200), fundamentals and
+USD/KRW, fetched concurrently. It carries the latest ``bars`` rows,
+server-computed indicators and derived stats, and is cached per ticker. A
+failed fundamentals or FX leg is listed in ``missing`` instead of failing
+the bundle, and such partial bundles expire sooner.
+"""
+import asyncio
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+
+from services.bok_exchange import get_usd_krw
+from services.indicators import compute_indicators
+from services.ohlcv import StockSeries
+from services.singleflight import cached_fetch
+from services.stocks import MARKETS, get_fundamentals, get_series, normalize_ticker
+from utils.metrics import stage
+from models.stock import AgentContext
+
+CONTEXT_VERSION = 1
+CONTEXT_TTL = 300            # 5 min, as the bars it is built from
+PARTIAL_CONTEXT_TTL = 60     # retry missing legs sooner
+HISTORY_PERIOD = "1y"
+MAX_CONTEXT_BARS = 120
+TRADING_DAYS = 252
+RETURN_WINDOWS = {"return1w": 5, "return1m": 21, "return3m": 63, "return6m": 126, "return1y": 252}
+
+
+def context_key(market: str, ticker: str, bars: int) -> str:
+    return f"agent_context:{market}:{normalize_ticker(market, ticker)}:{bars}"
+
+
+def _round(value: float, digits: int = 2) -> float | None:
+    value = float(value)
+    return round(value, digits) if math.isfinite(value) else None
+
+
+def derived_stats(series: StockSeries, usd_krw: float | None) -> dict[str, float | None]:
+    """Trailing returns, 52-week range, volatility, drawdown and volume, in percent where relative."""
+    close, volume = series.frame.close, series.frame.volume
+    last = close[-1]
+    stats: dict[str, float | None] = {
+        name: _round((last / close[-days - 1] - 1) * 100) if len(close) > days else None
+        for name, days in RETURN_WINDOWS.items()
+    }
+    year = close[-TRADING_DAYS:]
+    high, low = year.max(), year.min()
+    stats["high52w"] = _round(high, 4)
+    stats["low52w"] = _round(low, 4)
+    stats["fromHigh52w"] = _round((last / high - 1) * 100)
+    stats["fromLow52w"] = _round((last / low - 1) * 100)
+
+    returns = np.diff(np.log(year))
+    annualize = math.sqrt(TRADING_DAYS) * 100
+    stats["volatility20d"] = _round(returns[-20:].std(ddof=1) * annualize) if len(returns) > 20 else None
+    stats["volatility1y"] = _round(returns.std(ddof=1) * annualize) if len(returns) > 1 else None
+    stats["maxDrawdown1y"] = _round((year / np.maximum.accumulate(year) - 1).min() * 100)
+    stats["avgVolume20d"] = _round(volume[-20:].mean(), 0)
+
+    if usd_krw:
+        if series.info.currency == "KRW":
+            stats["priceUsd"] = _round(last / usd_krw, 2)
+        else:
+            stats["priceKrw"] = _round(last * usd_krw, 0)
+    return stats
+
+
+def _recent_bars(series: StockSeries, bars: int) -> dict[str, list]:
+    recent = series.frame.slice(-bars)
+    columns = recent.to_columns()
+    del columns["day"]
+    return {"date": recent.dates(), **columns}
+
+
+async def _load_context(market: str, ticker: str, bars: int) -> AgentContext:
+    series, fundamentals, fx = await asyncio.gather(
+        get_series(market, ticker, HISTORY_PERIOD),
+        get_fundamentals(market, ticker),
+        get_usd_krw(),
+        return_exceptions=True,
+    )
+    if isinstance(series, BaseException):
+        raise series
+    missing = []
+    if isinstance(fundamentals, BaseException):
+        fundamentals = None
+        missing.append("fundamentals")
+    if isinstance(fx, BaseException):
+        fx = None
+        missing.append("fx")
+
+    with stage("agent_context", "derive"):
+        indicators = compute_indicators(series.frame.close.tolist())
+        stats = derived_stats(series, fx.usdKrw if fx else None)
+        recent = _recent_bars(series, bars)
+    return AgentContext(
+        version=CONTEXT_VERSION,
+        market=market,
+        ticker=series.info.ticker,
+        asOf=recent["date"][-1],
+        generatedAt=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        info=series.info,
+        currentPrice=series.currentPrice,
+        change=series.change,
+        changePercent=series.changePercent,
+        bars=recent,
+        indicators=indicators,
+        fundamentals=fundamentals,
+        fx=fx,
+        stats=stats,
+        missing=missing,
+    )
+
+
+async def get_context(market: str, ticker: str, bars: int = 20) -> AgentContext:
+    if market not in MARKETS:
+        raise ValueError(f"Unknown market: {market}")
+    if not 1 <= bars <= MAX_CONTEXT_BARS:
+        raise ValueError(f"bars must be between 1 and {MAX_CONTEXT_BARS}")
+    ticker = normalize_ticker(market, ticker)
+    return await cached_fetch(
+        context_key(market, ticker, bars),
+        lambda c: PARTIAL_CONTEXT_TTL if c.missing else CONTEXT_TTL,
+        lambda: _load_context(market, ticker, bars),
+        stale_ttl=CONTEXT_TTL,
+    )
@@ -0,0 +1,132 @@
+"""Cross-asset analytics (rolling correlation / beta) over cached daily bars.
+
+Bars for every asset are aligned on one calendar, turned into a T x N matrix
+of log returns, and all rolling covariance matrices are computed in a single
+batched matmul.
+"""
+import asyncio
+import hashlib
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from services.ohlcv import OHLCVFrame
+from services.singleflight import cached_fetch
+from services.stocks import MARKETS, get_series, normalize_ticker
+from services.us_stocks import get_us_series
+
+ANALYTICS_TTL = 300     # 5 min, same as the bars underneath
+FX_TICKER = "KRW=X"     # Yahoo USD/KRW (KRW per USD)
+MAX_ASSETS = 300
+MIN_WINDOW = 5
+CURRENCIES = ("local", "usd")
+
+
+def _asof(days: np.ndarray, values: np.ndarray, calendar: np.ndarray) -> np.ndarray:
+    """Last value on or before each calendar day (the first value for earlier days)."""
+    idx = np.searchsorted(days, calendar, side="right") - 1
+    return values[np.maximum(idx, 0)]
+
+
+def align_closes(frames: list[OHLCVFrame], markets: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Closes as a (days, T x N matrix) on the days every market traded.
+
+    A ticker missing a day its market traded (halt, late listing) carries its
+    last close forward; the calendar starts once every ticker has a bar.
+    """
+    calendar = None
+    for market in set(markets):
+        days = np.unique(np.concatenate([f.day for f, m in zip(frames, markets) if m == market]))
+        calendar = days if calendar is None else np.intersect1d(calendar, days, assume_unique=True)
+    calendar = calendar[calendar >= max(int(f.day[0]) for f in frames)]
+    closes = np.column_stack([_asof(f.day, f.close, calendar) for f in frames])
+    return calendar, closes
+
+
+def rolling_corr_beta(returns: np.ndarray, window: int, step: int = 1):
+    """Correlation and beta matrices for windows ending every ``step`` rows, latest last.
+
+    ``returns`` is T x N. Returns (end row indices, corr K x N x N, beta K x N x N)
+    where ``beta[k, i, j]`` is the regression slope of asset i on asset j.
+    Assets with no variance in a window get NaN.
+    """
+    ends = np.arange(len(returns) - 1, window - 2, -step)[::-1]
+    windows = sliding_window_view(returns, window, axis=0)[ends - window + 1]  # K x N x window
+    x = windows - windows.mean(axis=2, keepdims=True)
+    cov = np.matmul(x, x.transpose(0, 2, 1)) / (window - 1)
+    var = np.diagonal(cov, axis1=1, axis2=2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sd = np.sqrt(var)
+        corr = cov / (sd[:, :, None] * sd[:, None, :])
+        beta = cov / var[:, None, :]
+    corr[~np.isfinite(corr)] = np.nan
+    beta[~np.isfinite(beta)] = np.nan
+    return ends, np.clip(corr, -1.0, 1.0), beta
+
+
+async def _compute(assets: list[tuple[str, str]], period: str, window: int, step: int,
+                   currency: str, rolling: bool) -> dict:
+    results = await asyncio.gather(*(get_series(m, t, period) for m, t in assets), return_exceptions=True)
+    failed = [f"{m}:{t}" for (m, t), r in zip(assets, results) if isinstance(r, BaseException)]
+    if failed:
+        raise ValueError(f"Could not load bars for: {', '.join(failed)}")
+
+    markets = [m for m, _ in assets]
+    days, closes = align_closes([r.frame for r in results], markets)
+    if currency == "usd" and "kr" in markets:
+        fx = (await get_us_series(FX_TICKER, period)).frame
+        kr = np.array([m == "kr" for m in markets])
+        closes[:, kr] /= _asof(fx.day, fx.close, days)[:, None]
+
+    returns = np.diff(np.log(closes), axis=0)
+    if len(returns) < window:
+        raise ValueError(
+            f"Only {len(returns)} aligned returns in {period}; need at least window={window}"
+        )
+    if rolling:
+        ends, corr, beta = rolling_corr_beta(returns, window, step)
+    else:
+        # Just the latest window: one N x N pair instead of the K-deep stacks
+        ends, corr, beta = rolling_corr_beta(returns[-window:], window)
+        ends = ends + len(returns) - window
+    return {"days": days[ends + 1], "observations": len(returns), "corr": corr, "beta": beta}
+
+
+async def get_correlation(assets: list[tuple[str, str]], period: str = "1y", window: int = 60,
+                          step: int = 5, currency: str = "local", rolling: bool = False) -> dict:
+    """Correlation/beta for ``assets`` ((market, ticker) pairs), in the given order.
+
+    Only the latest window is computed unless ``rolling`` asks for every
+    window ending ``step`` rows apart. Results are cached per asset set, so
+    any ordering of the same tickers shares one computation.
+    """
+    if not 2 <= len(assets) <= MAX_ASSETS:
+        raise ValueError(f"Correlation needs between 2 and {MAX_ASSETS} assets")
+    if window < MIN_WINDOW or step < 1:
+        raise ValueError(f"window must be >= {MIN_WINDOW} and step >= 1")
+    if currency not in CURRENCIES:
+        raise ValueError(f"Unknown currency: {currency} (expected one of {', '.join(CURRENCIES)})")
+    for market, _ in assets:
+        if market not in MARKETS:
+            raise ValueError(f"Unknown market: {market}")
+
+    labels = [f"{m}:{normalize_ticker(m, t)}" for m, t in assets]
+    canonical = sorted(set(labels))
+    shape = f"rolling{step}" if rolling else "latest"
+    spec = "|".join([*canonical, period, str(window), shape, currency])
+    key = f"analytics:corr:{hashlib.sha1(spec.encode()).hexdigest()}"
+    result = await cached_fetch(
+        key, ANALYTICS_TTL,
+        lambda: _compute([tuple(c.split(":", 1)) for c in canonical], period, window, step, currency, rolling),
+        stale_ttl=ANALYTICS_TTL,
+    )
+
+    order = np.array([canonical.index(label) for label in labels])
+    pick = np.ix_(np.arange(len(result["days"])), order, order)
+    return {
+        "labels": labels,
+        "days": result["days"],
+        "observations": result["observations"],
+        "corr": result["corr"][pick],
+        "beta": result["beta"][pick],
+    }
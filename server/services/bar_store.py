@@ -0,0 +1,231 @@
+"""Persistent daily-bar store (SQLite) for incremental OHLCV refreshes.
+
+Each (market, ticker) keeps its bars plus a coverage record: the earliest day
+the stored history is known to be complete from, the last stored day, and
+when upstream was last asked. Refreshes then only request bars from the last
+stored day onwards, and any period is served by slicing locally.
+
+A refresh re-requests one settled bar it already has. If upstream's close for
+that bar no longer matches (a split or dividend adjustment rewrote history),
+the stored series is dropped and the whole window fetched again, so old and
+new bars are never mixed.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable
+
+import numpy as np
+from config import BAR_STORE_PATH
+from services.ohlcv import OHLCVFrame
+from utils.metrics import bar_refreshes
+
+# Closes are stored rounded (2 places for US); anything beyond this is a restatement
+RESTATE_RTOL = 1e-3
+RESTATE_ATOL = 0.01
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    market TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    volume INTEGER NOT NULL,
+    PRIMARY KEY (market, ticker, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS coverage (
+    market TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    name TEXT,
+    currency TEXT,
+    covered_from INTEGER NOT NULL,
+    last_day INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (market, ticker)
+);
+"""
+
+
+def today() -> int:
+    """Current UTC epoch day."""
+    return int(time.time() // 86400)
+
+
+class Coverage:
+    __slots__ = ("name", "currency", "covered_from", "last_day", "fetched_at")
+
+    def __init__(self, name: str | None, currency: str | None, covered_from: int, last_day: int,
+                 fetched_at: float):
+        self.name = name
+        self.currency = currency
+        self.covered_from = covered_from
+        self.last_day = last_day
+        self.fetched_at = fetched_at
+
+    def covers(self, start_day: int) -> bool:
+        return self.covered_from <= start_day
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class BarStore:
+    """Thread-safe SQLite store; call from async code via ``asyncio.to_thread``."""
+
+    def __init__(self, path: str = BAR_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def coverage(self, market: str, ticker: str) -> Coverage | None:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT name, currency, covered_from, last_day, fetched_at FROM coverage "
+                "WHERE market = ? AND ticker = ?",
+                (market, ticker),
+            ).fetchone()
+        return Coverage(*row) if row else None
+
+    def load(self, market: str, ticker: str, since_day: int | None = None) -> OHLCVFrame:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT day, open, high, low, close, volume FROM bars "
+                "WHERE market = ? AND ticker = ? AND day >= ? ORDER BY day",
+                (market, ticker, since_day if since_day is not None else -2**31),
+            ).fetchall()
+        return _frame(rows)
+
+    def tail(self, market: str, ticker: str, count: int) -> OHLCVFrame:
+        """The last ``count`` stored bars."""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT day, open, high, low, close, volume FROM bars "
+                "WHERE market = ? AND ticker = ? ORDER BY day DESC LIMIT ?",
+                (market, ticker, count),
+            ).fetchall()
+        return _frame(rows[::-1])
+
+    def delete(self, market: str, ticker: str) -> None:
+        """Drop a ticker's bars and coverage."""
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("DELETE FROM bars WHERE market = ? AND ticker = ?", (market, ticker))
+                db.execute("DELETE FROM coverage WHERE market = ? AND ticker = ?", (market, ticker))
+
+    def save(self, market: str, ticker: str, frame: OHLCVFrame, covered_from: int,
+             name: str | None = None, currency: str | None = None) -> Coverage:
+        """Upsert bars (later values win) and widen the coverage record."""
+        rows = zip(
+            [market] * len(frame), [ticker] * len(frame), frame.day.tolist(),
+            frame.open.tolist(), frame.high.tolist(), frame.low.tolist(),
+            frame.close.tolist(), frame.volume.tolist(),
+        )
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            with db:
+                db.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                prev = db.execute(
+                    "SELECT name, currency, covered_from, last_day FROM coverage "
+                    "WHERE market = ? AND ticker = ?",
+                    (market, ticker),
+                ).fetchone()
+                last_day = int(frame.day[-1]) if len(frame) else covered_from
+                if prev:
+                    name = name or prev[0]
+                    currency = currency or prev[1]
+                    covered_from = min(covered_from, prev[2])
+                    last_day = max(last_day, prev[3])
+                db.execute(
+                    "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (market, ticker, name, currency, covered_from, last_day, now),
+                )
+        return Coverage(name, currency, covered_from, last_day, now)
+
+
+def _frame(rows: list[tuple]) -> OHLCVFrame:
+    if not rows:
+        return OHLCVFrame([], [], [], [], [], [])
+    cols = np.array(rows, dtype=np.float64).T
+    return OHLCVFrame(cols[0], cols[1], cols[2], cols[3], cols[4], cols[5])
+
+
+def _restated(stored: OHLCVFrame, fetched: OHLCVFrame) -> bool:
+    """Whether ``fetched`` disagrees with the stored close on ``stored``'s first day."""
+    if not len(stored):
+        return False
+    day, close = int(stored.day[0]), float(stored.close[0])
+    at = np.flatnonzero(fetched.day == day)
+    return bool(len(at)) and not np.isclose(fetched.close[at[0]], close, rtol=RESTATE_RTOL, atol=RESTATE_ATOL)
+
+
+# Singleton
+bar_store = BarStore()
+
+
+async def _refetch(market: str, ticker: str, start_day: int, fetch_since, cov: Coverage) -> Coverage:
+    """Replace a restated series with a fresh full window; keeps the old one if that fails."""
+    try:
+        frame, name, currency = await fetch_since(start_day)
+    except Exception:
+        bar_refreshes.inc(market, "failed")
+        return cov
+    await asyncio.to_thread(bar_store.delete, market, ticker)
+    return await asyncio.to_thread(bar_store.save, market, ticker, frame, start_day, name, currency)
+
+
+async def refresh_bars(
+    market: str,
+    ticker: str,
+    start_day: int,
+    max_age: float,
+    fetch_since: Callable[[int], Awaitable[tuple[OHLCVFrame, str | None, str | None]]],
+) -> tuple[Coverage, OHLCVFrame]:
+    """Bars for ``ticker`` from ``start_day``, asking upstream only for what's missing.
+
+    ``fetch_since(day)`` returns (frame, name, currency) for bars on or after
+    ``day``. When the store already covers ``start_day`` only bars from the
+    last stored day are requested, and not at all if the store was refreshed
+    within ``max_age`` seconds. If that delta request fails the stored bars
+    are served as they are (counted in ``bar_store_refreshes_total``).
+    """
+    cov = await asyncio.to_thread(bar_store.coverage, market, ticker)
+    if cov is not None and cov.covers(start_day):
+        if cov.age() >= max_age:
+            # The last stored bar may be a session in progress; check the settled one before it
+            stored = await asyncio.to_thread(bar_store.tail, market, ticker, 2)
+            anchor = stored.slice(0, 1)
+            try:
+                frame, name, currency = await fetch_since(int(anchor.day[0]) if len(anchor) else cov.last_day)
+            except Exception:
+                bar_refreshes.inc(market, "failed")
+            else:
+                if _restated(anchor, frame):
+                    bar_refreshes.inc(market, "restated")
+                    cov = await _refetch(market, ticker, start_day, fetch_since, cov)
+                else:
+                    bar_refreshes.inc(market, "delta")
+                    cov = await asyncio.to_thread(
+                        bar_store.save, market, ticker, frame, cov.covered_from, name, currency,
+                    )
+    else:
+        frame, name, currency = await fetch_since(start_day)
+        cov = await asyncio.to_thread(bar_store.save, market, ticker, frame, start_day, name, currency)
+    return cov, await asyncio.to_thread(bar_store.load, market, ticker, start_day)
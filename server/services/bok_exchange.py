@@ -1,44 +1,40 @@
 """Exchange rate service: BOK API primary, Yahoo Finance fallback."""
-import httpx
 from datetime import datetime, timezone
-from services.cache import cache
-from config import BOK_API_KEY
+from services.http_client import get_json
+from services.singleflight import cached_fetch
+from config import BOK_API_KEY, BOK_BASE_URL, YAHOO_BASE_URL
 from models.stock import ExchangeRateResponse
+from utils.rate_limiter import bok_limiter, yahoo_limiter
 
 EXCHANGE_TTL = 600  # 10 min
 
 
-def get_usd_krw() -> ExchangeRateResponse:
-    cache_key = "exchange:usd_krw"
-    cached = cache.get(cache_key)
-    if cached:
-        return cached
+async def get_usd_krw(refresh: bool = False) -> ExchangeRateResponse:
+    return await cached_fetch(
+        "exchange:usd_krw", EXCHANGE_TTL, _load_usd_krw, stale_ttl=EXCHANGE_TTL, refresh=refresh,
+    )
+
 
+async def _load_usd_krw() -> ExchangeRateResponse:
     # Try BOK API first
     if BOK_API_KEY:
         try:
-            result = _fetch_from_bok()
-            cache.set(cache_key, result, EXCHANGE_TTL)
-            return result
+            return await _fetch_from_bok()
         except Exception:
             pass
 
     # Fallback: Yahoo Finance direct API
-    result = _fetch_from_yahoo()
-    cache.set(cache_key, result, EXCHANGE_TTL)
-    return result
+    return await _fetch_from_yahoo()
 
 
-def _fetch_from_bok() -> ExchangeRateResponse:
+async def _fetch_from_bok() -> ExchangeRateResponse:
     """Fetch USD/KRW from Bank of Korea API."""
     today = datetime.now().strftime("%Y%m%d")
     url = (
-        f"https://ecos.bok.or.kr/api/StatisticSearch/{BOK_API_KEY}/json/kr/1/1/"
+        f"{BOK_BASE_URL}/api/StatisticSearch/{BOK_API_KEY}/json/kr/1/1/"
         f"731Y001/D/{today}/{today}/0000001"
     )
-    resp = httpx.get(url, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
+    data = await get_json(url, timeout=10, limiter=bok_limiter, provider="bok")
 
     rows = data.get("StatisticSearch", {}).get("row", [])
     if not rows:
@@ -52,14 +48,11 @@ def _fetch_from_bok() -> ExchangeRateResponse:
     )
 
 
-def _fetch_from_yahoo() -> ExchangeRateResponse:
+async def _fetch_from_yahoo() -> ExchangeRateResponse:
     """Fallback: fetch USD/KRW from Yahoo Finance direct API."""
-    from services.us_stocks import _session
-    url = "https://query1.finance.yahoo.com/v8/finance/chart/KRW=X"
+    url = f"{YAHOO_BASE_URL}/v8/finance/chart/KRW=X"
     params = {"range": "5d", "interval": "1d"}
-    resp = _session.get(url, params=params, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
+    data = await get_json(url, params=params, timeout=10, limiter=yahoo_limiter, provider="yahoo_fx")
     result = data.get("chart", {}).get("result")
     if not result:
         raise ValueError("Cannot fetch exchange rate")
@@ -1,40 +1,298 @@
+import sys
+import threading
 import time
-from typing import Any
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Any, Callable
 
+from config import CACHE_BACKEND, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES
 
-class TTLCache:
-    """Simple in-memory TTL cache."""
+# Max entries per key namespace (the part of the key before the first ':')
+NAMESPACE_LIMITS = {
+    "us_stock": 512,
+    "kr_stock": 512,
+    "indicators": 1024,
+    "indicator_state": 512,
+    "kr_listing": 1,
+    "kr_fundamentals_table": 1,
+    "analytics": 256,
+    "payload": 1024,
+    "agent_context": 512,
+}
+DEFAULT_NAMESPACE_LIMIT = 1024
+JANITOR_INTERVAL = 60  # seconds between background expiry sweeps
+
+
+def _namespace(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+def _sizeof(value: Any, _depth: int = 0) -> int:
+    """Rough deep size of a cached value in bytes."""
+    if hasattr(value, "memory_usage") and hasattr(value, "columns"):  # pandas DataFrame
+        return int(value.memory_usage(deep=True).sum())
+    if hasattr(value, "nbytes"):  # numpy array
+        return int(value.nbytes)
+    size = sys.getsizeof(value)
+    if _depth > 4:
+        return size
+    if isinstance(value, dict):
+        size += sum(_sizeof(k, _depth + 1) + _sizeof(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(_sizeof(v, _depth + 1) for v in value)
+    elif hasattr(value, "__dict__"):
+        size += _sizeof(vars(value), _depth + 1)
+    elif hasattr(value, "__slots__"):
+        size += sum(_sizeof(getattr(value, s, None), _depth + 1) for s in value.__slots__)
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "stale_until", "size")
+
+    def __init__(self, value: Any, expires_at: float, stale_until: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.size = size
+
+
+class _Stats:
+    __slots__ = ("hits", "stale", "misses", "evictions", "expirations", "entries", "bytes")
 
     def __init__(self):
-        self._store: dict[str, tuple[Any, float]] = {}
+        self.hits = self.stale = self.misses = self.evictions = self.expirations = 0
+        self.entries = self.bytes = 0
+
+
+class TTLCache:
+    """Thread-safe in-memory TTL cache with LRU eviction.
+
+    Bounded by total entry count, estimated total bytes and per-namespace entry
+    limits. Expired entries are swept by a background thread started on first
+    write. Entries set with ``stale_ttl`` stay readable through ``get_stale``
+    for that long after they expire, for stale-while-revalidate.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        namespace_limits: dict[str, int] | None = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.namespace_limits = dict(NAMESPACE_LIMITS if namespace_limits is None else namespace_limits)
+        self._store: OrderedDict[str, _Entry] = OrderedDict()
+        self._namespaces: dict[str, OrderedDict[str, None]] = {}
+        self._stats: dict[str, _Stats] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._janitor: threading.Thread | None = None
+
+    def _ns_stats(self, namespace: str) -> _Stats:
+        stats = self._stats.get(namespace)
+        if stats is None:
+            stats = self._stats[namespace] = _Stats()
+        return stats
+
+    def _remove(self, key: str) -> _Entry:
+        entry = self._store.pop(key)
+        namespace = _namespace(key)
+        self._namespaces[namespace].pop(key, None)
+        stats = self._ns_stats(namespace)
+        stats.entries -= 1
+        stats.bytes -= entry.size
+        self._bytes -= entry.size
+        return entry
+
+    def _evict(self, key: str) -> None:
+        self._remove(key)
+        self._ns_stats(_namespace(key)).evictions += 1
+
+    def _lookup(self, key: str, allow_stale: bool) -> tuple[Any, bool] | None:
+        namespace = _namespace(key)
+        now = time.monotonic()
+        with self._lock:
+            stats = self._ns_stats(namespace)
+            entry = self._store.get(key)
+            if entry is None:
+                stats.misses += 1
+                return None
+            fresh = now <= entry.expires_at
+            if now > entry.stale_until:
+                self._remove(key)
+                stats.expirations += 1
+                stats.misses += 1
+                return None
+            if not fresh and not allow_stale:
+                stats.misses += 1
+                return None
+            self._store.move_to_end(key)
+            self._namespaces[namespace].move_to_end(key)
+            if fresh:
+                stats.hits += 1
+            else:
+                stats.stale += 1
+            return entry.value, fresh
 
     def get(self, key: str) -> Any | None:
-        entry = self._store.get(key)
-        if entry is None:
-            return None
-        value, expires_at = entry
-        if time.time() > expires_at:
-            del self._store[key]
-            return None
-        return value
-
-    def set(self, key: str, value: Any, ttl_seconds: int) -> None:
-        self._store[key] = (value, time.time() + ttl_seconds)
+        hit = self._lookup(key, allow_stale=False)
+        return hit[0] if hit else None
+
+    def get_stale(self, key: str) -> tuple[Any, bool] | None:
+        """Return (value, is_fresh), including entries inside their stale window."""
+        return self._lookup(key, allow_stale=True)
+
+    def expires_in(self, key: str) -> float | None:
+        """Seconds until ``key`` goes stale (negative inside its stale window), or None if absent.
+
+        A peek: it does not count as a hit or refresh the LRU position.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None or now > entry.stale_until:
+                return None
+            return entry.expires_at - now
+
+    def extend(self, key: str, ttl_seconds: int) -> bool:
+        """Keep an entry fresh for another ``ttl_seconds`` without refetching it."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None or now > entry.stale_until:
+                return False
+            stale_window = entry.stale_until - entry.expires_at
+            entry.expires_at = now + ttl_seconds
+            entry.stale_until = entry.expires_at + stale_window
+            return True
+
+    def set(self, key: str, value: Any, ttl_seconds: int, stale_ttl: int = 0) -> None:
+        namespace = _namespace(key)
+        size = _sizeof(value)
+        expires_at = time.monotonic() + ttl_seconds
+        with self._lock:
+            if key in self._store:
+                self._remove(key)
+            self._store[key] = _Entry(value, expires_at, expires_at + stale_ttl, size)
+            self._namespaces.setdefault(namespace, OrderedDict())[key] = None
+            stats = self._ns_stats(namespace)
+            stats.entries += 1
+            stats.bytes += size
+            self._bytes += size
+
+            ns_keys = self._namespaces[namespace]
+            ns_limit = self.namespace_limits.get(namespace, DEFAULT_NAMESPACE_LIMIT)
+            while len(ns_keys) > ns_limit:
+                self._evict(next(iter(ns_keys)))
+            while len(self._store) > 1 and (
+                len(self._store) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                self._evict(next(iter(self._store)))
+
+            if self._janitor is None:
+                self._start_janitor()
 
     def delete(self, key: str) -> None:
-        self._store.pop(key, None)
+        with self._lock:
+            if key in self._store:
+                self._remove(key)
 
     def clear(self) -> None:
-        self._store.clear()
+        with self._lock:
+            self._store.clear()
+            self._namespaces.clear()
+            for stats in self._stats.values():
+                stats.entries = stats.bytes = 0
+            self._bytes = 0
 
     def cleanup(self) -> int:
         """Remove expired entries. Returns count removed."""
-        now = time.time()
-        expired = [k for k, (_, exp) in self._store.items() if now > exp]
-        for k in expired:
-            del self._store[k]
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, e in self._store.items() if now > e.stale_until]
+            for k in expired:
+                self._remove(k)
+                self._ns_stats(_namespace(k)).expirations += 1
         return len(expired)
 
+    # Async variants for parity with SharedCache, whose backend calls block
+    async def aget(self, key: str) -> Any | None:
+        return self.get(key)
+
+    async def aget_stale(self, key: str) -> tuple[Any, bool] | None:
+        return self.get_stale(key)
+
+    async def aset(self, key: str, value: Any, ttl_seconds: int, stale_ttl: int = 0) -> None:
+        self.set(key, value, ttl_seconds, stale_ttl)
+
+    async def aexpires_in(self, key: str) -> float | None:
+        return self.expires_in(key)
+
+    async def aextend(self, key: str, ttl_seconds: int) -> bool:
+        return self.extend(key, ttl_seconds)
+
+    async def adelete(self, key: str) -> None:
+        self.delete(key)
+
+    async def offload(self, fn: Callable[..., Any], *args) -> Any:
+        """Run ``fn`` (which uses the cache synchronously); inline, since nothing here blocks."""
+        return fn(*args)
+
+    def lock(self, key: str):
+        """No-op: a process-local cache needs no lock beyond single-flight (see SharedCache.lock)."""
+        return nullcontext(False)
+
+    def _start_janitor(self) -> None:
+        def sweep():
+            while True:
+                time.sleep(JANITOR_INTERVAL)
+                self.cleanup()
+
+        self._janitor = threading.Thread(target=sweep, name="cache-janitor", daemon=True)
+        self._janitor.start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            namespaces = {
+                ns: {
+                    "entries": s.entries,
+                    "bytes": s.bytes,
+                    "limit": self.namespace_limits.get(ns, DEFAULT_NAMESPACE_LIMIT),
+                    "hits": s.hits,
+                    "stale": s.stale,
+                    "misses": s.misses,
+                    "evictions": s.evictions,
+                    "expirations": s.expirations,
+                }
+                for ns, s in sorted(self._stats.items())
+            }
+        totals = {
+            field: sum(ns[field] for ns in namespaces.values())
+            for field in ("hits", "stale", "misses", "evictions", "expirations")
+        }
+        return {
+            "entries": sum(ns["entries"] for ns in namespaces.values()),
+            "bytes": sum(ns["bytes"] for ns in namespaces.values()),
+            "maxEntries": self.max_entries,
+            "maxBytes": self.max_bytes,
+            **totals,
+            "namespaces": namespaces,
+        }
+
+
+def create_cache(backend: str = CACHE_BACKEND):
+    """The cache for ``backend``: 'memory', or 'sqlite'/'redis' shared across workers."""
+    if backend == "memory":
+        return TTLCache()
+    from services.shared_cache import RedisBackend, SQLiteBackend, SharedCache
+    if backend == "sqlite":
+        return SharedCache(SQLiteBackend())
+    if backend == "redis":
+        return SharedCache(RedisBackend())
+    raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+
 
 # Singleton
-cache = TTLCache()
+cache = create_cache()
@@ -0,0 +1,132 @@
+"""Shared async HTTP client for upstream providers (Yahoo Finance, BOK).
+
+One pooled ``httpx.AsyncClient`` (HTTP/2 when ``h2`` is installed) is reused
+for every upstream call. Concurrency is bounded per host, request rate per
+provider (see ``utils.rate_limiter``), and transient failures are retried
+with jittered exponential backoff.
+"""
+import asyncio
+import random
+import time
+from urllib.parse import urlsplit
+
+import httpx
+from utils.metrics import upstream_errors, upstream_requests
+from utils.rate_limiter import TokenBucket
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+)
+
+TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=50)
+
+# Max in-flight requests per upstream host
+HOST_CONCURRENCY = {
+    "query1.finance.yahoo.com": 32,
+    "query2.finance.yahoo.com": 32,
+    "ecos.bok.or.kr": 4,
+}
+DEFAULT_HOST_CONCURRENCY = 16
+
+MAX_RETRIES = 2
+RETRY_BASE_DELAY = 0.25  # seconds, doubled per attempt before jitter
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_WAIT = 30.0   # max seconds a request queues for a rate-limit token
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+_host_limits: dict[str, asyncio.Semaphore] = {}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the pooled client for the running event loop."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=_http2_available(),
+            timeout=TIMEOUT,
+            limits=LIMITS,
+            headers={"User-Agent": USER_AGENT},
+        )
+        _client_loop = loop
+        _host_limits.clear()
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _host_semaphore(host: str) -> asyncio.Semaphore:
+    sem = _host_limits.get(host)
+    if sem is None:
+        sem = _host_limits[host] = asyncio.Semaphore(
+            HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY)
+        )
+    return sem
+
+
+def _retry_delay(attempt: int) -> float:
+    return RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    try:
+        return float(resp.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+async def get_json(url: str, params: dict | None = None, timeout: float | None = None,
+                   limiter: TokenBucket | None = None, provider: str | None = None) -> dict:
+    """GET ``url`` and decode JSON, retrying transport errors and retryable statuses.
+
+    With a ``limiter`` every attempt first takes a token (raising
+    RateLimitExceeded after RATE_LIMIT_WAIT), and 429s slow the limiter down.
+    Each attempt is recorded in the upstream metrics under ``provider``
+    (the host by default).
+    """
+    client = get_client()
+    host = urlsplit(url).hostname or ""
+    provider = provider or host
+    sem = _host_semaphore(host)
+    for attempt in range(MAX_RETRIES + 1):
+        last_try = attempt == MAX_RETRIES
+        if limiter is not None:
+            await limiter.acquire_async(RATE_LIMIT_WAIT)
+        start = time.perf_counter()
+        try:
+            async with sem:
+                resp = await client.get(url, params=params, timeout=timeout or TIMEOUT)
+        except httpx.TransportError as e:
+            upstream_requests.observe(time.perf_counter() - start, provider)
+            upstream_errors.inc(provider, type(e).__name__)
+            if last_try:
+                raise
+        else:
+            upstream_requests.observe(time.perf_counter() - start, provider)
+            if resp.status_code >= 400:
+                upstream_errors.inc(provider, f"http_{resp.status_code}")
+            if limiter is not None:
+                if resp.status_code == 429:
+                    limiter.penalize(_retry_after(resp))
+                else:
+                    limiter.reward()
+            if resp.status_code not in RETRY_STATUSES or last_try:
+                resp.raise_for_status()
+                return resp.json()
+        await asyncio.sleep(_retry_delay(attempt))
@@ -1,5 +1,153 @@
+import math
+import threading
+
 import numpy as np
 from models.stock import IndicatorValue
+from utils.metrics import stage
+
+# Largest exponent swing allowed inside one EWM block before rescaling (~1e100)
+_EWM_BLOCK_LOG = 100 * math.log(10)
+
+
+def _as_array(values) -> np.ndarray:
+    """Coerce closes to a float array; 2-D input is (tickers, bars)."""
+    arr = np.asarray(values, dtype=np.float64)
+    if arr.ndim not in (1, 2):
+        raise ValueError("Indicator input must be 1-D or 2-D (tickers x bars)")
+    return arr
+
+
+def _ewm(values: np.ndarray, alpha: float, seed: np.ndarray) -> np.ndarray:
+    """Evaluate y[t] = (1 - alpha) * y[t-1] + alpha * x[t] along the last axis.
+
+    ``seed`` is y[-1]. The recursion is solved in closed form with cumulative
+    sums, in blocks short enough that the decay powers never overflow.
+    """
+    n = values.shape[-1]
+    out = np.empty_like(values)
+    if n == 0:
+        return out
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        out[...] = values
+        return out
+
+    block = max(1, int(_EWM_BLOCK_LOG / -math.log(decay)))
+    carry = np.asarray(seed, dtype=np.float64)
+    for start in range(0, n, block):
+        chunk = values[..., start:start + block]
+        j = np.arange(chunk.shape[-1])
+        grow = decay ** -j
+        decayed = decay ** j
+        acc = np.cumsum(chunk * grow, axis=-1) * decayed * alpha
+        acc += np.multiply.outer(carry, decayed * decay)
+        out[..., start:start + block] = acc
+        carry = acc[..., -1]
+    return out
+
+
+def sma_series(closes, period: int) -> np.ndarray:
+    """Simple moving average; NaN until ``period`` bars are available."""
+    arr = _as_array(closes)
+    out = np.full_like(arr, np.nan)
+    n = arr.shape[-1]
+    if n < period:
+        return out
+    csum = np.cumsum(arr, axis=-1)
+    window = csum[..., period - 1:].copy()
+    window[..., 1:] -= csum[..., :n - period]
+    out[..., period - 1:] = window / period
+    return out
+
+
+def ema_series(closes, period: int) -> np.ndarray:
+    """Exponential moving average seeded with the first close."""
+    arr = _as_array(closes)
+    out = np.empty_like(arr)
+    if arr.shape[-1] == 0:
+        return out
+    k = 2 / (period + 1)
+    out[..., 0] = arr[..., 0]
+    out[..., 1:] = _ewm(arr[..., 1:], k, arr[..., 0])
+    return out
+
+
+def rsi_series(closes, period: int = 14) -> np.ndarray:
+    """Wilder RSI; NaN until ``period + 1`` closes are available."""
+    arr = _as_array(closes)
+    out = np.full_like(arr, np.nan)
+    if arr.shape[-1] < period + 1:
+        return out
+
+    diff = np.diff(arr, axis=-1)
+    gains = np.clip(diff, 0, None)
+    losses = np.clip(-diff, 0, None)
+
+    alpha = 1 / period
+    seed_gain = gains[..., :period].mean(axis=-1)
+    seed_loss = losses[..., :period].mean(axis=-1)
+    avg_gain = np.concatenate(
+        [seed_gain[..., None], _ewm(gains[..., period:], alpha, seed_gain)], axis=-1,
+    )
+    avg_loss = np.concatenate(
+        [seed_loss[..., None], _ewm(losses[..., period:], alpha, seed_loss)], axis=-1,
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    out[..., period:] = np.where(avg_loss == 0, 100.0, rsi)
+    return out
+
+
+def macd_series(closes, fast: int = 12, slow: int = 26, signal: int = 9) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD line, signal line and histogram; NaN for the first ``slow + signal - 1`` bars."""
+    arr = _as_array(closes)
+    macd_line = ema_series(arr, fast) - ema_series(arr, slow)
+    signal_line = ema_series(macd_line, signal)
+    hist = macd_line - signal_line
+
+    warmup = min(slow + signal - 1, arr.shape[-1])
+    for series in (macd_line, signal_line, hist):
+        series[..., :warmup] = np.nan
+    return macd_line, signal_line, hist
+
+
+def bollinger_series(closes, period: int = 20, mult: float = 2.0) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Upper, middle and lower Bollinger bands (population std)."""
+    arr = _as_array(closes)
+    middle = sma_series(arr, period)
+    std = np.full_like(arr, np.nan)
+    if arr.shape[-1] >= period:
+        windows = np.lib.stride_tricks.sliding_window_view(arr, period, axis=-1)
+        std[..., period - 1:] = windows.std(axis=-1)
+    return middle + mult * std, middle, middle - mult * std
+
+
+def indicator_series(closes) -> dict[str, np.ndarray]:
+    """All overlay series for 1-D closes or a 2-D (tickers x bars) batch."""
+    arr = _as_array(closes)
+    macd, macd_signal, macd_hist = macd_series(arr)
+    bb_upper, bb_middle, bb_lower = bollinger_series(arr)
+    return {
+        "sma20": sma_series(arr, 20),
+        "sma50": sma_series(arr, 50),
+        "sma200": sma_series(arr, 200),
+        "ema12": ema_series(arr, 12),
+        "ema26": ema_series(arr, 26),
+        "rsi14": rsi_series(arr, 14),
+        "macd_value": macd,
+        "macd_signal": macd_signal,
+        "macd_histogram": macd_hist,
+        "bb_upper": bb_upper,
+        "bb_middle": bb_middle,
+        "bb_lower": bb_lower,
+    }
+
+
+def series_to_list(values: np.ndarray, digits: int = 4) -> list[float | None]:
+    """Round a 1-D series for JSON, mapping NaN to None."""
+    rounded = np.round(values, digits)
+    return np.where(np.isnan(rounded), None, rounded).tolist()
 
 
 def calc_sma(closes: list[float], period: int) -> float | None:
@@ -9,50 +157,21 @@ def calc_sma(closes: list[float], period: int) -> float | None:
 
 
 def calc_ema(closes: list[float], period: int) -> list[float]:
-    if not closes:
-        return []
-    k = 2 / (period + 1)
-    result = [closes[0]]
-    for i in range(1, len(closes)):
-        result.append(closes[i] * k + result[-1] * (1 - k))
-    return result
+    return ema_series(closes, period).tolist()
 
 
 def calc_rsi(closes: list[float], period: int = 14) -> float | None:
     if len(closes) < period + 1:
         return None
-
-    gains = []
-    losses = []
-    for i in range(1, len(closes)):
-        diff = closes[i] - closes[i - 1]
-        gains.append(max(diff, 0))
-        losses.append(max(-diff, 0))
-
-    avg_gain = np.mean(gains[:period])
-    avg_loss = np.mean(losses[:period])
-
-    for i in range(period, len(gains)):
-        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
-        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
-
-    if avg_loss == 0:
-        return 100.0
-    rs = avg_gain / avg_loss
-    return round(100 - (100 / (1 + rs)), 2)
+    return round(float(rsi_series(closes, period)[-1]), 2)
 
 
 def calc_macd(closes: list[float]) -> tuple[float, float, float] | None:
     if len(closes) < 35:  # need enough data for EMA26 + signal9
         return None
-    ema12 = calc_ema(closes, 12)
-    ema26 = calc_ema(closes, 26)
-    macd_line = [a - b for a, b in zip(ema12, ema26)]
-    signal_line = calc_ema(macd_line, 9)
-    if not signal_line:
-        return None
-    val = round(macd_line[-1], 4)
-    sig = round(signal_line[-1], 4)
+    macd_line, signal_line, _ = macd_series(closes)
+    val = round(float(macd_line[-1]), 4)
+    sig = round(float(signal_line[-1]), 4)
     hist = round(val - sig, 4)
     return val, sig, hist
 
@@ -70,7 +189,173 @@ def calc_bollinger(closes: list[float], period: int = 20, mult: float = 2.0) ->
     )
 
 
+class IndicatorState:
+    """Running indicator values for one ticker, advanced one bar at a time.
+
+    Holds the EMA12/EMA26/signal values, Wilder gain/loss averages and rolling
+    sums (plus sum of squares for Bollinger) over a ring of the last 200 closes,
+    so each new bar costs O(1). A bar with the same date as the last one is
+    treated as a revised quote and replaces it instead of appending.
+    """
+
+    RSI_PERIOD = 14
+    SMA_PERIODS = (20, 50, 200)
+    BB_PERIOD = 20
+    BB_MULT = 2.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._size = max(self.SMA_PERIODS)
+        self._ring = [0.0] * self._size
+        self.count = 0
+        self.last_date: str | None = None
+        self.last_close: float | None = None
+        self._prev_close: float | None = None
+        self._ema12 = self._ema26 = self._signal = 0.0
+        self._gain = self._loss = 0.0  # warm-up sums, then Wilder averages
+        self._sums = {p: 0.0 for p in self.SMA_PERIODS}
+        self._sumsq = 0.0
+        self._undo: tuple | None = None
+
+    @classmethod
+    def from_history(cls, dates: list[str], closes: list[float]) -> "IndicatorState":
+        state = cls()
+        for date, close in zip(dates, closes):
+            state.update(date, close)
+        return state
+
+    def apply(self, dates: list[str], closes: list[float]) -> bool:
+        """Advance with recent bars; returns False if they leave a gap after the last bar."""
+        with self._lock:
+            if self.last_date is not None and dates and dates[0] > self.last_date:
+                return False
+            for date, close in zip(dates, closes):
+                if self.last_date is None or date >= self.last_date:
+                    self._update(date, close)
+        return True
+
+    def update(self, date: str, close: float) -> None:
+        with self._lock:
+            self._update(date, close)
+
+    def _update(self, date: str, close: float) -> None:
+        if date == self.last_date:
+            self._revise(close)
+        else:
+            self._append(date, close)
+
+    def _window(self, period: int) -> list[float]:
+        start = max(self.count - period, 0)
+        return [self._ring[i % self._size] for i in range(start, self.count)]
+
+    def _append(self, date: str, close: float) -> None:
+        self._undo = (self._ema12, self._ema26, self._signal, self._gain, self._loss)
+        n = self.count
+        for period in self.SMA_PERIODS:
+            self._sums[period] += close
+            if n >= period:
+                self._sums[period] -= self._ring[(n - period) % self._size]
+        self._sumsq += close * close
+        if n >= self.BB_PERIOD:
+            self._sumsq -= self._ring[(n - self.BB_PERIOD) % self._size] ** 2
+
+        self._ring[n % self._size] = close
+        self.count = n + 1
+        if self.count % self._size == 0:
+            # Re-sum exactly once per lap so running sums never drift
+            for period in self.SMA_PERIODS:
+                self._sums[period] = sum(self._window(period))
+            self._sumsq = sum(c * c for c in self._window(self.BB_PERIOD))
+
+        self._prev_close, self.last_close = self.last_close, close
+        self.last_date = date
+        self._advance(close)
+
+    def _revise(self, close: float) -> None:
+        old = self.last_close
+        self._ring[(self.count - 1) % self._size] = close
+        for period in self.SMA_PERIODS:
+            self._sums[period] += close - old
+        self._sumsq += close * close - old * old
+
+        self._ema12, self._ema26, self._signal, self._gain, self._loss = self._undo
+        self.last_close = close
+        self._advance(close)
+
+    def _advance(self, close: float) -> None:
+        """Fold ``close`` into the EMA and Wilder state (count already includes it)."""
+        if self.count == 1:
+            self._ema12 = self._ema26 = close
+            self._signal = 0.0
+            return
+
+        k12, k26, k9 = 2 / 13, 2 / 27, 2 / 10
+        self._ema12 = close * k12 + self._ema12 * (1 - k12)
+        self._ema26 = close * k26 + self._ema26 * (1 - k26)
+        macd = self._ema12 - self._ema26
+        self._signal = macd * k9 + self._signal * (1 - k9)
+
+        diff = close - self._prev_close
+        gain, loss = max(diff, 0.0), max(-diff, 0.0)
+        period = self.RSI_PERIOD
+        diffs = self.count - 1
+        if diffs < period:
+            self._gain += gain
+            self._loss += loss
+        elif diffs == period:
+            self._gain = (self._gain + gain) / period
+            self._loss = (self._loss + loss) / period
+        else:
+            self._gain = (self._gain * (period - 1) + gain) / period
+            self._loss = (self._loss * (period - 1) + loss) / period
+
+    def snapshot(self) -> IndicatorValue:
+        """Current values with the same rounding and warm-up rules as compute_indicators."""
+        with self._lock:
+            n = self.count
+            rsi = None
+            if n >= self.RSI_PERIOD + 1:
+                rsi = 100.0 if self._loss == 0 else round(100 - 100 / (1 + self._gain / self._loss), 2)
+
+            macd = sig = hist = None
+            if n >= 35:
+                macd = round(self._ema12 - self._ema26, 4)
+                sig = round(self._signal, 4)
+                hist = round(macd - sig, 4)
+
+            bb = None
+            if n >= self.BB_PERIOD:
+                mean = self._sums[self.BB_PERIOD] / self.BB_PERIOD
+                var = max(self._sumsq / self.BB_PERIOD - mean * mean, 0.0)
+                std = math.sqrt(var)
+                bb = (
+                    round(mean + self.BB_MULT * std, 4),
+                    round(mean, 4),
+                    round(mean - self.BB_MULT * std, 4),
+                )
+
+            sma = {p: round(self._sums[p] / p, 4) if n >= p else None for p in self.SMA_PERIODS}
+
+        return IndicatorValue(
+            rsi14=rsi,
+            macd_value=macd,
+            macd_signal=sig,
+            macd_histogram=hist,
+            bb_upper=bb[0] if bb else None,
+            bb_middle=bb[1] if bb else None,
+            bb_lower=bb[2] if bb else None,
+            sma20=sma[20],
+            sma50=sma[50],
+            sma200=sma[200],
+        )
+
+
 def compute_indicators(closes: list[float]) -> IndicatorValue:
+    with stage("compute_indicators", "math"):
+        return _compute_indicators(closes)
+
+
+def _compute_indicators(closes: list[float]) -> IndicatorValue:
     rsi_val = calc_rsi(closes)
     macd_result = calc_macd(closes)
     bb = calc_bollinger(closes)
@@ -0,0 +1,217 @@
+"""Columnar fundamentals for every KRX ticker, loaded in bulk once a day.
+
+Market cap and share counts come from the KRX listing (see kr_listing).
+Valuation and balance-sheet fields come from Naver's market-sum table, which
+FinanceDataReader scrapes page by page for the whole market: PER, PBR, ROE,
+sales, sales growth, debt, assets and dividend per share, from which PS,
+dividend yield and debt-to-equity are derived. If that table cannot be
+loaded the table carries listing fields only and is retried sooner.
+
+The scrape is about sixty pages of five requests each, so it never blocks a
+request: a cold start with no snapshot serves the listing-only table at once
+and enriches it in the background, and later refreshes run behind the stale
+table. Like the listing, the table is snapshotted to disk so a restart
+serves it immediately. Lookups are a dict hit plus one read per column.
+"""
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+from config import DATA_DIR
+from services.cache import cache
+from services.kr_listing import KrListingIndex, get_kr_listing
+from services.singleflight import cached_fetch, flights
+from models.stock import FundamentalsResponse
+from utils.lazy_import import load
+from utils.metrics import track_upstream
+from utils.rate_limiter import krx_limiter
+
+TABLE_KEY = "kr_fundamentals_table"
+ENRICH_KEY = "kr_fundamentals_naver"
+TABLE_TTL = 86400               # 24h
+PARTIAL_TABLE_TTL = 3600        # listing-only table: retry the ratios hourly
+TABLE_STALE_TTL = 7 * 86400
+SNAPSHOT_PATH = os.path.join(DATA_DIR, "kr_fundamentals.json")
+
+FIELDS = ("marketCap", "shares", "pe", "pb", "ps", "roe", "revenueGrowth", "dividendYield", "debtToEquity")
+NAVER_PAGES = {0: 32, 1: 29}     # sosok (0 KOSPI, 1 KOSDAQ) -> market-sum pages
+NAVER_REQUESTS_PER_PAGE = 5      # one per column set
+EOK = 1e8  # Naver reports amounts in 억 원
+
+
+class KrFundamentalsTable:
+    """Code -> row index over one float64 array per field (NaN where unknown)."""
+
+    def __init__(self, codes: list[str], columns: dict[str, np.ndarray], sources: list[str],
+                 loaded_at: float | None = None):
+        self.loaded_at = loaded_at or time.time()
+        self.codes = codes
+        self.columns = columns
+        self.sources = sources
+        self._rows = {code: i for i, code in enumerate(codes)}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def complete(self) -> bool:
+        return "naver" in self.sources
+
+    def column(self, field: str) -> np.ndarray:
+        return self.columns[field]
+
+    def get(self, code: str) -> FundamentalsResponse | None:
+        i = self._rows.get(code)
+        if i is None:
+            return None
+        values = {f: float(self.columns[f][i]) for f in FIELDS if f != "shares"}
+        return FundamentalsResponse(ticker=code, **{f: v for f, v in values.items() if not np.isnan(v)})
+
+    @classmethod
+    def build(cls, listing: KrListingIndex, naver=None) -> "KrFundamentalsTable":
+        """Listing rows (plus any codes only Naver knows), joined with the Naver table when given."""
+        symbols = list(listing)
+        codes = [s.code for s in symbols]
+        columns = {f: np.full(len(codes), np.nan) for f in FIELDS}
+        columns["marketCap"][:] = [s.marketCap if s.marketCap is not None else np.nan for s in symbols]
+        columns["shares"][:] = [s.shares if s.shares is not None else np.nan for s in symbols]
+        if naver is None:
+            return cls(codes, columns, ["listing"])
+
+        naver_codes = [str(c) for c in naver["종목코드"].tolist()]
+        rows = {code: i for i, code in enumerate(codes)}
+        extra = [c for c in dict.fromkeys(naver_codes) if c not in rows]
+        for code in extra:
+            rows[code] = len(codes)
+            codes.append(code)
+        columns = {f: np.concatenate([col, np.full(len(extra), np.nan)]) for f, col in columns.items()}
+        at = np.array([rows[c] for c in naver_codes], dtype=np.intp)
+
+        def num(name: str) -> np.ndarray:
+            return np.asarray(naver[name], dtype=np.float64)
+
+        price, dividend = num("현재가"), num("보통주배당금")
+        marcap, sales = num("시가총액") * EOK, num("매출액") * EOK
+        debt, assets = num("부채총계"), num("자산총계")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            derived = {
+                "pe": num("PER"),
+                "pb": num("PBR"),
+                "roe": num("ROE"),                      # already a fraction
+                "revenueGrowth": num("매출액증가율") / 100,
+                "ps": np.where(sales > 0, marcap / sales, np.nan),
+                "dividendYield": np.where(price > 0, dividend / price, np.nan),
+                "debtToEquity": np.where(assets > debt, debt / (assets - debt) * 100, np.nan),
+            }
+        for field, values in derived.items():
+            columns[field][at] = np.round(values, 4)
+        # Fill listing gaps (e.g. Naver-only codes) from Naver's own cap and share count
+        for field, values in (("marketCap", marcap), ("shares", num("상장주식수") * 1000)):
+            missing = np.isnan(columns[field][at])
+            columns[field][at[missing]] = values[missing]
+        return cls(codes, columns, ["listing", "naver"])
+
+    def to_snapshot(self) -> dict:
+        return {
+            "loadedAt": self.loaded_at,
+            "sources": self.sources,
+            "codes": self.codes,
+            "columns": {f: [None if np.isnan(v) else v for v in col.tolist()] for f, col in self.columns.items()},
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: dict) -> "KrFundamentalsTable":
+        columns = {f: np.array([np.nan if v is None else v for v in data["columns"][f]], dtype=np.float64)
+                   for f in FIELDS}
+        return cls(data["codes"], columns, data["sources"], loaded_at=data["loadedAt"])
+
+
+def _read_snapshot() -> KrFundamentalsTable | None:
+    try:
+        with open(SNAPSHOT_PATH, encoding="utf-8") as f:
+            return KrFundamentalsTable.from_snapshot(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_snapshot(table: KrFundamentalsTable) -> None:
+    os.makedirs(os.path.dirname(SNAPSHOT_PATH), exist_ok=True)
+    tmp = SNAPSHOT_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(table.to_snapshot(), f, separators=(",", ":"))
+    os.replace(tmp, SNAPSHOT_PATH)
+
+
+def _download_naver():
+    """Naver market-sum table for KOSPI + KOSDAQ, or None if it cannot be scraped.
+
+    Walks the pages directly rather than through ``snap.marcap`` so every
+    request is rate limited and no progress bar is printed.
+    """
+    try:
+        pd = load("pandas")
+        snap = load("FinanceDataReader.naver.snap")
+        frames = []
+        for sosok, pages in NAVER_PAGES.items():
+            for page in range(1, pages + 1):
+                for _ in range(NAVER_REQUESTS_PER_PAGE):
+                    krx_limiter.acquire()
+                with track_upstream("naver_marcap"):
+                    frame = snap._marcap_market_page(sosok, page)
+                if frame.empty:
+                    break
+                frames.append(frame)
+        frame = pd.concat(frames, ignore_index=True)
+        return frame[frame["종목코드"].notna()]
+    except Exception:
+        return None
+
+
+def _build_table(listing: KrListingIndex) -> KrFundamentalsTable | None:
+    """The full table, or None if Naver could not be scraped."""
+    naver = _download_naver()
+    if naver is None:
+        return None
+    table = KrFundamentalsTable.build(listing, naver)
+    _write_snapshot(table)
+    return table
+
+
+async def _enrich(listing: KrListingIndex) -> None:
+    table = await asyncio.to_thread(_build_table, listing)
+    if table is not None:
+        await cache.aset(TABLE_KEY, table, TABLE_TTL, TABLE_STALE_TTL)
+
+
+async def _load_table() -> KrFundamentalsTable:
+    listing = await get_kr_listing()
+    previous = await cache.aget_stale(TABLE_KEY)
+    if previous is None:
+        # Cold start: answer from the listing now, add Naver's fields when scraped
+        flights.do_background(ENRICH_KEY, lambda: _enrich(listing))
+        return KrFundamentalsTable.build(listing)
+    # A refresh behind a stale table; nobody is waiting on the scrape
+    table = await asyncio.to_thread(_build_table, listing)
+    if table is not None:
+        return table
+    if previous[0].complete:
+        # Keep yesterday's ratios rather than dropping to listing fields; retried on the next stale read
+        raise RuntimeError("Naver market-sum table unavailable")
+    return KrFundamentalsTable.build(listing)
+
+
+async def get_kr_fundamentals_table() -> KrFundamentalsTable:
+    """The bulk table, served from the disk snapshot on cold start and refreshed daily."""
+    if await cache.aget_stale(TABLE_KEY) is None:
+        snapshot = await asyncio.to_thread(_read_snapshot)
+        if snapshot is not None:
+            ttl = TABLE_TTL if snapshot.complete else PARTIAL_TABLE_TTL
+            fresh_for = max(int(ttl - (time.time() - snapshot.loaded_at)), 0)
+            await cache.aset(TABLE_KEY, snapshot, fresh_for, TABLE_STALE_TTL)
+    return await cached_fetch(
+        TABLE_KEY, lambda t: TABLE_TTL if t.complete else PARTIAL_TABLE_TTL, _load_table,
+        stale_ttl=TABLE_STALE_TTL,
+    )
@@ -0,0 +1,185 @@
+"""Indexed KRX listing: code -> symbol metadata, plus prefix/fuzzy search.
+
+The index is built once per listing download, snapshotted to disk so a cold
+start can serve it immediately, and refreshed in the background once a day.
+"""
+import asyncio
+import bisect
+import difflib
+import json
+import math
+import os
+import time
+
+from config import DATA_DIR
+from services.cache import cache
+from services.singleflight import cached_fetch
+from models.stock import KrSymbol
+from utils.lazy_import import load
+from utils.metrics import track_upstream
+from utils.rate_limiter import krx_limiter
+
+LISTING_KEY = "kr_listing"
+LISTING_TTL = 86400             # 24h
+LISTING_STALE_TTL = 7 * 86400   # keep serving an old listing for a week if KRX is down
+SNAPSHOT_PATH = os.path.join(DATA_DIR, "kr_listing.json")
+
+_FIELDS = ("code", "name", "market", "sector", "marketCap", "shares")
+
+
+def _normalize(text: str) -> str:
+    return "".join(text.split()).casefold()
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+class KrListingIndex:
+    """Code -> KrSymbol map with sorted keys for prefix search."""
+
+    def __init__(self, symbols: list[KrSymbol], loaded_at: float | None = None):
+        self.loaded_at = loaded_at or time.time()
+        self._by_code = {s.code: s for s in symbols}
+        self._codes = sorted(self._by_code)
+        self._names = sorted((_normalize(s.name), s.code) for s in symbols)
+
+    def __len__(self) -> int:
+        return len(self._by_code)
+
+    def __iter__(self):
+        return iter(self._by_code.values())
+
+    def get(self, code: str) -> KrSymbol | None:
+        return self._by_code.get(code)
+
+    @classmethod
+    def from_frames(cls, listing, desc=None) -> "KrListingIndex":
+        """Build from fdr.StockListing('KRX'), optionally enriched with 'KRX-DESC' sectors."""
+        sectors = {}
+        if desc is not None and "Sector" in desc:
+            sectors = dict(zip(desc["Code"].tolist(), desc["Sector"].tolist()))
+        codes = listing["Code"].tolist()
+        columns = {
+            "name": listing["Name"].tolist(),
+            "market": listing["Market"].tolist() if "Market" in listing else [None] * len(codes),
+            "marketCap": listing["Marcap"].tolist() if "Marcap" in listing else [None] * len(codes),
+            "shares": listing["Stocks"].tolist() if "Stocks" in listing else [None] * len(codes),
+        }
+        symbols = [
+            KrSymbol(
+                code=code,
+                name=columns["name"][i],
+                market=_clean(columns["market"][i]),
+                sector=_clean(sectors.get(code)),
+                marketCap=_clean(columns["marketCap"][i]),
+                shares=_clean(columns["shares"][i]),
+            )
+            for i, code in enumerate(codes)
+        ]
+        return cls(symbols)
+
+    def _code_prefix(self, prefix: str) -> list[str]:
+        start = bisect.bisect_left(self._codes, prefix)
+        matches = []
+        for code in self._codes[start:]:
+            if not code.startswith(prefix):
+                break
+            matches.append(code)
+        return matches
+
+    def _name_prefix(self, prefix: str) -> list[str]:
+        start = bisect.bisect_left(self._names, (prefix, ""))
+        matches = []
+        for name, code in self._names[start:]:
+            if not name.startswith(prefix):
+                break
+            matches.append(code)
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> list[KrSymbol]:
+        """Rank exact code, code prefix, name prefix, name substring, then fuzzy name matches.
+
+        Ties within a rank go to the larger market cap.
+        """
+        q = _normalize(query)
+        if not q:
+            return []
+
+        ranked: dict[str, int] = {}
+
+        def add(codes, rank):
+            for code in codes:
+                ranked.setdefault(code, rank)
+
+        add([q] if q in self._by_code else [], 0)
+        add(self._code_prefix(q), 1)
+        add(self._name_prefix(q), 2)
+        if len(ranked) < limit:
+            add((code for name, code in self._names if q in name), 3)
+        if len(ranked) < limit:
+            names = {name: code for name, code in self._names}
+            add((names[n] for n in difflib.get_close_matches(q, names, n=limit, cutoff=0.6)), 4)
+
+        order = sorted(ranked, key=lambda c: (ranked[c], -(self._by_code[c].marketCap or 0)))
+        return [self._by_code[c] for c in order[:limit]]
+
+    def to_snapshot(self) -> dict:
+        return {
+            "loadedAt": self.loaded_at,
+            "fields": list(_FIELDS),
+            "rows": [[getattr(s, f) for f in _FIELDS] for s in self._by_code.values()],
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: dict) -> "KrListingIndex":
+        fields = data["fields"]
+        symbols = [KrSymbol(**dict(zip(fields, row))) for row in data["rows"]]
+        return cls(symbols, loaded_at=data["loadedAt"])
+
+
+def _read_snapshot() -> KrListingIndex | None:
+    try:
+        with open(SNAPSHOT_PATH, encoding="utf-8") as f:
+            return KrListingIndex.from_snapshot(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_snapshot(index: KrListingIndex) -> None:
+    os.makedirs(os.path.dirname(SNAPSHOT_PATH), exist_ok=True)
+    tmp = SNAPSHOT_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index.to_snapshot(), f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, SNAPSHOT_PATH)
+
+
+def _download_index() -> KrListingIndex:
+    fdr = load("FinanceDataReader")
+    krx_limiter.acquire()
+    with track_upstream("fdr_listing"):
+        listing = fdr.StockListing("KRX")
+    try:
+        krx_limiter.acquire()
+        with track_upstream("fdr_listing"):
+            desc = fdr.StockListing("KRX-DESC")
+    except Exception:
+        desc = None
+    index = KrListingIndex.from_frames(listing, desc)
+    _write_snapshot(index)
+    return index
+
+
+async def get_kr_listing() -> KrListingIndex:
+    """Listing index, served from the disk snapshot on cold start and refreshed daily."""
+    if await cache.aget_stale(LISTING_KEY) is None:
+        snapshot = await asyncio.to_thread(_read_snapshot)
+        if snapshot is not None:
+            # An old snapshot lands already expired, so it is served while a refresh runs
+            fresh_for = max(int(LISTING_TTL - (time.time() - snapshot.loaded_at)), 0)
+            await cache.aset(LISTING_KEY, snapshot, fresh_for, LISTING_STALE_TTL)
+    return await cached_fetch(
+        LISTING_KEY, LISTING_TTL, lambda: asyncio.to_thread(_download_index), stale_ttl=LISTING_STALE_TTL,
+    )
@@ -1,12 +1,19 @@
-import FinanceDataReader as fdr
-from datetime import datetime, timedelta
-from services.cache import cache
-from models.stock import OHLCVItem, StockInfo, StockDataResponse, FundamentalsResponse
+import asyncio
+from services.bar_store import refresh_bars, today
+from services.http_client import RATE_LIMIT_WAIT
+from services.kr_fundamentals import get_kr_fundamentals_table
+from services.kr_listing import get_kr_listing
+from services.ohlcv import OHLCVFrame, StockSeries, day_to_date
+from services.singleflight import cached_fetch
+from models.stock import StockInfo, StockDataResponse, FundamentalsResponse
+from utils.lazy_import import load
+from utils.metrics import stage, track_upstream
+from utils.rate_limiter import krx_limiter
 
 OHLCV_TTL = 300         # 5 min
-INFO_TTL = 3600          # 1 hour
 
 PERIOD_MAP = {
+    "5d": 7,
     "1mo": 30,
     "3mo": 90,
     "6mo": 180,
@@ -16,82 +23,58 @@ PERIOD_MAP = {
 }
 
 
-def _get_kr_listing():
-    """Get KRX stock listing with caching."""
-    cache_key = "kr_listing"
-    cached = cache.get(cache_key)
-    if cached:
-        return cached
-    listing = fdr.StockListing("KRX")
-    cache.set(cache_key, listing, 86400)  # 24h
-    return listing
-
-
-def get_kr_stock(ticker: str, period: str = "6mo") -> StockDataResponse:
-    cache_key = f"kr_stock:{ticker}:{period}"
-    cached = cache.get(cache_key)
-    if cached:
-        return cached
+async def get_kr_series(ticker: str, period: str = "6mo", refresh: bool = False) -> StockSeries:
+    return await cached_fetch(
+        f"kr_stock:{ticker}:{period}", OHLCV_TTL,
+        lambda: _load_kr_series(ticker, period, 0 if refresh else OHLCV_TTL), stale_ttl=OHLCV_TTL,
+        refresh=refresh,
+    )
 
-    days = PERIOD_MAP.get(period, 180)
-    start = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-    df = fdr.DataReader(ticker, start)
 
-    if df.empty:
+async def get_kr_stock(ticker: str, period: str = "6mo") -> StockDataResponse:
+    series = await get_kr_series(ticker, period)
+    with stage("kr_stock", "model"):
+        return series.to_response()
+
+
+async def _load_kr_series(ticker: str, period: str, max_age: float) -> StockSeries:
+    """Bars via the bar store; upstream is asked for new bars if the store is older than ``max_age``."""
+    async def fetch_since(day: int):
+        await krx_limiter.acquire_async(RATE_LIMIT_WAIT)
+        with stage("kr_stock", "upstream"), track_upstream("fdr_daily"):
+            df = await asyncio.to_thread(lambda: load("FinanceDataReader").DataReader(ticker, day_to_date(day)))
+        with stage("kr_stock", "parse"):
+            frame = OHLCVFrame.from_dataframe(df, digits=0)
+        if not len(frame):
+            raise ValueError(f"No data found for KR ticker: {ticker}")
+        return frame, None, "KRW"
+
+    start_day = today() - PERIOD_MAP.get(period, 180)
+    with stage("kr_stock", "bars"):
+        _, frame = await refresh_bars("kr", ticker, start_day, max_age, fetch_since)
+    if not len(frame):
         raise ValueError(f"No data found for KR ticker: {ticker}")
 
-    ohlcv = []
-    for date, row in df.iterrows():
-        ohlcv.append(OHLCVItem(
-            date=date.strftime("%Y-%m-%d"),
-            open=round(float(row["Open"]), 0),
-            high=round(float(row["High"]), 0),
-            low=round(float(row["Low"]), 0),
-            close=round(float(row["Close"]), 0),
-            volume=int(row["Volume"]),
-        ))
-
     # Try to find name from listing
-    name = ticker
+    symbol = None
     try:
-        listing = _get_kr_listing()
-        match = listing[listing["Code"] == ticker]
-        if not match.empty:
-            name = match.iloc[0]["Name"]
+        symbol = (await get_kr_listing()).get(ticker)
     except Exception:
         pass
 
-    last = ohlcv[-1] if ohlcv else None
-    prev = ohlcv[-2] if len(ohlcv) >= 2 else None
-    current_price = last.close if last else 0
-    change = round(current_price - (prev.close if prev else current_price), 0)
-    change_pct = round((change / prev.close * 100) if prev and prev.close else 0, 2)
-
-    result = StockDataResponse(
-        info=StockInfo(
-            ticker=ticker,
-            name=name,
-            market="kr",
-            currency="KRW",
-        ),
-        ohlcv=ohlcv,
-        currentPrice=current_price,
-        change=change,
-        changePercent=change_pct,
+    info = StockInfo(
+        ticker=ticker,
+        name=symbol.name if symbol else ticker,
+        market="kr",
+        sector=symbol.sector if symbol else None,
+        marketCap=symbol.marketCap if symbol else None,
+        currency="KRW",
     )
+    with stage("kr_stock", "build"):
+        return StockSeries.from_frame(info, frame, price_digits=0)
 
-    cache.set(cache_key, result, OHLCV_TTL)
-    return result
-
-
-def get_kr_fundamentals(ticker: str) -> FundamentalsResponse:
-    cache_key = f"kr_fundamentals:{ticker}"
-    cached = cache.get(cache_key)
-    if cached:
-        return cached
 
-    # FinanceDataReader doesn't provide fundamentals easily
-    # Return minimal data; can be enriched later
-    result = FundamentalsResponse(ticker=ticker)
-    cache.set(cache_key, result, INFO_TTL)
-    return result
+async def get_kr_fundamentals(ticker: str) -> FundamentalsResponse:
+    """Row from the daily bulk table; a ticker it does not list gets an empty response."""
+    table = await get_kr_fundamentals_table()
+    return table.get(ticker) or FundamentalsResponse(ticker=ticker)
@@ -0,0 +1,187 @@
+"""Columnar OHLCV storage and wire formats.
+
+Bars are kept as parallel NumPy columns with dates as epoch days (days since
+1970-01-01, UTC), which is what the stock services cache. Pydantic row
+models are only built when a client asks for the default row-wise JSON.
+"""
+import json
+import struct
+
+import numpy as np
+from models.stock import OHLCVItem, StockInfo, StockDataResponse
+
+PRICE_COLUMNS = ("open", "high", "low", "close")
+
+# Packed binary layout (little-endian):
+#   magic b"OHLC", version u8, 3 pad bytes, bar count u32, meta length u32,
+#   meta JSON (utf-8), then int32 day[n], float64 open/high/low/close[n], int64 volume[n]
+PACKED_MAGIC = b"OHLC"
+PACKED_VERSION = 1
+PACKED_HEADER = struct.Struct("<4sB3xII")
+PACKED_MEDIA_TYPE = "application/vnd.ohlcv.packed"
+
+
+class OHLCVFrame:
+    """Daily bars as parallel columns, oldest first."""
+
+    __slots__ = ("day", "open", "high", "low", "close", "volume")
+
+    def __init__(self, day, open, high, low, close, volume):
+        self.day = np.asarray(day, dtype=np.int32)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    @classmethod
+    def from_columns(cls, day, open, high, low, close, volume, digits: int) -> "OHLCVFrame":
+        """Build from raw upstream columns, rounding prices to ``digits``.
+
+        Missing values (None/NaN) become 0, and bars without a close (halted
+        or invalid days) are dropped.
+        """
+        n = len(day)
+        close = _column(close, n)
+        keep = close != 0
+        prices = [np.round(_column(c, n)[keep], digits) for c in (open, high, low)]
+        return cls(
+            np.asarray(day)[keep], *prices, np.round(close[keep], digits),
+            _column(volume, n)[keep].astype(np.int64),
+        )
+
+    @classmethod
+    def from_dataframe(cls, df, digits: int) -> "OHLCVFrame":
+        """From an OHLCV DataFrame with a DatetimeIndex (FinanceDataReader layout)."""
+        day = np.asarray(df.index, dtype="datetime64[D]").astype(np.int32)
+        return cls.from_columns(
+            day, *(df[c].to_numpy(dtype=np.float64) for c in ("Open", "High", "Low", "Close", "Volume")),
+            digits=digits,
+        )
+
+    @classmethod
+    def from_chart(cls, chart: dict, digits: int) -> "OHLCVFrame":
+        """From a Yahoo v8 chart result (epoch-second timestamps, UTC days)."""
+        timestamps = np.asarray(chart.get("timestamp") or [], dtype=np.int64)
+        quote = chart.get("indicators", {}).get("quote", [{}])[0]
+        return cls.from_columns(
+            timestamps // 86400,
+            *(quote.get(c) or [] for c in ("open", "high", "low", "close", "volume")),
+            digits=digits,
+        )
+
+    def slice(self, start: int = 0, stop: int | None = None) -> "OHLCVFrame":
+        return OHLCVFrame(*(getattr(self, c)[start:stop] for c in self.__slots__))
+
+    def since(self, day: int) -> "OHLCVFrame":
+        """Bars dated on or after epoch ``day``."""
+        return self.slice(int(np.searchsorted(self.day, day)))
+
+    def dates(self) -> list[str]:
+        return np.datetime_as_string(self.day.astype("datetime64[D]")).tolist()
+
+    def to_items(self) -> list[OHLCVItem]:
+        columns = zip(
+            self.dates(), self.open.tolist(), self.high.tolist(),
+            self.low.tolist(), self.close.tolist(), self.volume.tolist(),
+        )
+        return [
+            OHLCVItem.model_construct(date=d, open=o, high=h, low=l, close=c, volume=v)
+            for d, o, h, l, c, v in columns
+        ]
+
+    def to_columns(self) -> dict[str, list]:
+        return {c: getattr(self, c).tolist() for c in self.__slots__}
+
+
+def _column(values, n: int) -> np.ndarray:
+    """``values`` as float64 of length ``n``: None/NaN -> 0, short columns padded with 0."""
+    col = np.zeros(n, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)[:n]
+    col[:len(values)] = values
+    return np.nan_to_num(col, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def epoch_day(date: str) -> int:
+    """'YYYY-MM-DD' -> days since 1970-01-01."""
+    return int(np.datetime64(date, "D").astype(np.int64))
+
+
+def day_to_date(day: int) -> str:
+    """Days since 1970-01-01 -> 'YYYY-MM-DD'."""
+    return str(np.datetime64(int(day), "D"))
+
+
+class StockSeries:
+    """Cached form of a stock response: info, price summary and columnar bars."""
+
+    __slots__ = ("info", "frame", "currentPrice", "change", "changePercent")
+
+    def __init__(self, info: StockInfo, frame: OHLCVFrame, current_price: float, change: float,
+                 change_percent: float):
+        self.info = info
+        self.frame = frame
+        self.currentPrice = current_price
+        self.change = change
+        self.changePercent = change_percent
+
+    @classmethod
+    def from_frame(cls, info: StockInfo, frame: OHLCVFrame, price_digits: int) -> "StockSeries":
+        """Derive current price and day change from the last two closes."""
+        closes = frame.close
+        current = float(closes[-1]) if len(closes) else 0.0
+        prev = float(closes[-2]) if len(closes) >= 2 else current
+        change = round(current - prev, price_digits)
+        change_pct = round((change / prev * 100) if prev else 0, 2)
+        return cls(info, frame, current, change, change_pct)
+
+    def _summary(self) -> dict:
+        return {
+            "info": self.info.model_dump(mode="json"),
+            "currentPrice": self.currentPrice,
+            "change": self.change,
+            "changePercent": self.changePercent,
+        }
+
+    def to_response(self) -> StockDataResponse:
+        return StockDataResponse.model_construct(
+            info=self.info,
+            ohlcv=self.frame.to_items(),
+            currentPrice=self.currentPrice,
+            change=self.change,
+            changePercent=self.changePercent,
+        )
+
+    def to_dict(self) -> dict:
+        """StockDataResponse-shaped JSON content, built without per-row models."""
+        f = self.frame
+        rows = zip(f.dates(), f.open.tolist(), f.high.tolist(), f.low.tolist(), f.close.tolist(), f.volume.tolist())
+        return {
+            "info": self.info.model_dump(mode="json"),
+            "ohlcv": [
+                {"date": d, "open": o, "high": h, "low": l, "close": c, "volume": v}
+                for d, o, h, l, c, v in rows
+            ],
+            "currentPrice": self.currentPrice,
+            "change": self.change,
+            "changePercent": self.changePercent,
+        }
+
+    def to_columnar(self) -> dict:
+        """JSON body with one array per column; ``day`` holds epoch days."""
+        return {**self._summary(), "columns": self.frame.to_columns()}
+
+    def to_packed(self) -> bytes:
+        frame = self.frame
+        meta = json.dumps(self._summary(), separators=(",", ":")).encode()
+        parts = [
+            PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, len(frame), len(meta)),
+            meta,
+            frame.day.astype("<i4").tobytes(),
+            *(getattr(frame, c).astype("<f8").tobytes() for c in PRICE_COLUMNS),
+            frame.volume.astype("<i8").tobytes(),
+        ]
+        return b"".join(parts)
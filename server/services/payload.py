@@ -0,0 +1,124 @@
+"""Pre-serialized responses with ETags, conditional GET and compression.
+
+A cached value is rendered to orjson bytes once, hashed for an ETag and
+compressed on demand (gzip, plus brotli when the ``brotli`` package is
+installed). The payload is cached alongside its source value, so repeated
+hits cost a header comparison or a buffer write rather than re-validating
+and re-encoding the response model.
+"""
+import gzip
+import hashlib
+from typing import Any, Callable
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+from services.cache import cache
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+PAYLOAD_TTL = 3600          # upper bound; a payload is only reused while its source is the cached value
+MIN_COMPRESS_BYTES = 1024   # smaller bodies aren't worth a Content-Encoding
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+class Payload:
+    __slots__ = ("source", "body", "etag", "media_type", "_encoded")
+
+    def __init__(self, source: Any, body: bytes, media_type: str = "application/json"):
+        self.source = source
+        self.body = body
+        self.media_type = media_type
+        self.etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        self._encoded: dict[str, bytes] = {}
+
+    @classmethod
+    def json(cls, source: Any, content: Any) -> "Payload":
+        return cls(source, orjson.dumps(content))
+
+    def encoded(self, encoding: str) -> bytes:
+        """Body compressed with ``encoding`` ('gzip' or 'br'), computed once."""
+        body = self._encoded.get(encoding)
+        if body is None:
+            if encoding == "br":
+                body = brotli.compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                body = gzip.compress(self.body, compresslevel=GZIP_LEVEL, mtime=0)
+            self._encoded[encoding] = body
+        return body
+
+
+def cached_payload(key: str, value: Any, render: Callable[[], Payload], variant: str = "json") -> Payload:
+    """The payload for ``value`` (the current entry at cache ``key``), rendering it on first use."""
+    payload_key = f"payload:{key}:{variant}"
+    hit = cache.get(payload_key)
+    if hit is not None and hit.source is value:
+        return hit
+    payload = render()
+    cache.set(payload_key, payload, PAYLOAD_TTL)
+    return payload
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def _accepted_codings(accept: str) -> dict[str, float]:
+    """Accept-Encoding as {coding: q}; malformed q-values count as refusals."""
+    codings = {}
+    for part in accept.lower().split(","):
+        coding, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            codings[coding] = q
+    return codings
+
+
+def _pick_encoding(accept: str, size: int) -> str | None:
+    """The client's highest-q coding we support (br on ties); never one it sent with q=0."""
+    if size < MIN_COMPRESS_BYTES or not accept:
+        return None
+    codings = _accepted_codings(accept)
+    wildcard = codings.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in ("br", "gzip") if brotli is not None else ("gzip",):
+        q = codings.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+async def respond(request: Request, payload: Payload, key: str) -> Response:
+    """Serve ``payload`` with ETag/Cache-Control derived from cache ``key``'s remaining TTL.
+
+    Answers 304 when If-None-Match carries the current ETag.
+    """
+    max_age = max(int(await cache.aexpires_in(key) or 0), 0)
+    headers = {
+        "ETag": payload.etag,
+        "Cache-Control": f"public, max-age={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, payload.etag):
+        return Response(status_code=304, headers=headers)
+
+    encoding = _pick_encoding(request.headers.get("accept-encoding", ""), len(payload.body))
+    if encoding is None:
+        return Response(payload.body, media_type=payload.media_type, headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(payload.encoded(encoding), media_type=payload.media_type, headers=headers)
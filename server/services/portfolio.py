@@ -0,0 +1,245 @@
+"""Portfolio and watchlist valuation in USD and KRW.
+
+Quotes come from whatever series are already cached for each distinct
+ticker (see ``cached_quote``); only tickers with nothing cached cost a short
+5d load. Positions are valued as arrays in one pass: value, cost, P&L and
+day change in the local currency, then converted with the cached USD/KRW
+rate. Cost and day change are converted at the current rate, so FX moves
+show up in neither P&L nor day change.
+"""
+import asyncio
+from typing import AsyncIterator
+
+import numpy as np
+
+from services.bok_exchange import get_usd_krw
+from services.cache import cache
+from services.ohlcv import StockSeries, day_to_date
+from services.stocks import MARKETS, cached_quote, get_quote, normalize_ticker
+from models.stock import ExchangeRateResponse, PortfolioPosition
+
+QUOTE_CONCURRENCY = 8
+MAX_POSITIONS = 5000
+DIGITS = {"USD": 2, "KRW": 0}
+
+Quote = StockSeries | Exception
+
+
+async def usd_krw_rate() -> ExchangeRateResponse:
+    """Cached USD/KRW, falling back to the stale rate when a refresh fails."""
+    try:
+        return await get_usd_krw()
+    except Exception:
+        hit = await cache.aget_stale("exchange:usd_krw")
+        if hit is None:
+            raise ValueError("USD/KRW rate unavailable")
+        return hit[0]
+
+
+def _symbol(position: PortfolioPosition) -> tuple[str, str]:
+    if position.market not in MARKETS:
+        raise ValueError(f"Unknown market: {position.market}")
+    return position.market, normalize_ticker(position.market, position.ticker)
+
+
+def _cached_quotes(symbols: list[tuple[str, str]]) -> dict[tuple[str, str], StockSeries]:
+    found = {}
+    for symbol in symbols:
+        series = cached_quote(*symbol)
+        if series is not None:
+            found[symbol] = series
+    return found
+
+
+async def resolve_quotes(symbols: list[tuple[str, str]]) -> AsyncIterator[dict[tuple[str, str], Quote]]:
+    """Yield quotes for distinct ``symbols``: every cached one at once, then misses as they load."""
+    distinct = list(dict.fromkeys(symbols))
+    # Up to len(QUOTE_PERIODS) lookups per symbol; one worker thread for the lot
+    cached = await cache.offload(_cached_quotes, distinct)
+    misses = [s for s in distinct if s not in cached]
+    if cached:
+        yield cached
+
+    sem = asyncio.Semaphore(QUOTE_CONCURRENCY)
+
+    async def load(symbol):
+        async with sem:
+            try:
+                return symbol, await get_quote(*symbol)
+            except Exception as e:
+                return symbol, e
+
+    tasks = [asyncio.create_task(load(s)) for s in misses]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            symbol, quote = await next_done
+            yield {symbol: quote}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class Valuation:
+    """Vectorized valuation of a set of positions whose quotes are known."""
+
+    def __init__(self, indices: list[int], positions: list[PortfolioPosition], quotes: list[StockSeries],
+                 usd_krw: float):
+        self.indices = indices
+        self.positions = positions
+        self.quotes = quotes
+        self.currencies = [q.info.currency for q in quotes]
+        shares = np.array([p.shares for p in positions], dtype=np.float64)
+        avg = np.array([p.avgPrice for p in positions], dtype=np.float64)
+        self.price = np.array([q.currentPrice for q in quotes], dtype=np.float64)
+        change = np.array([q.change for q in quotes], dtype=np.float64)
+        is_krw = np.array([c == "KRW" for c in self.currencies])
+        self.to_usd = np.where(is_krw, 1 / usd_krw, 1.0)
+        self.to_krw = np.where(is_krw, 1.0, usd_krw)
+
+        self.value = shares * self.price
+        self.cost = shares * avg
+        self.pnl = self.value - self.cost
+        self.day_change = shares * change
+        self.usd_krw = usd_krw
+
+    @classmethod
+    def concat(cls, parts: list["Valuation"], usd_krw: float) -> "Valuation":
+        return cls(
+            [i for p in parts for i in p.indices],
+            [x for p in parts for x in p.positions],
+            [q for p in parts for q in p.quotes],
+            usd_krw,
+        )
+
+    def rows(self) -> list[dict]:
+        """Per-position results; ``weight`` is filled in once the whole portfolio is valued."""
+        value_usd, value_krw = self.value * self.to_usd, self.value * self.to_krw
+        pnl_usd, pnl_krw = self.pnl * self.to_usd, self.pnl * self.to_krw
+        day_usd, day_krw = self.day_change * self.to_usd, self.day_change * self.to_krw
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pnl_pct = np.where(self.cost > 0, self.pnl / self.cost * 100, np.nan)
+
+        rows = []
+        for i, (position, quote, currency) in enumerate(zip(self.positions, self.quotes, self.currencies)):
+            digits = DIGITS.get(currency, 2)
+            rows.append({
+                "index": self.indices[i],
+                "id": position.id,
+                "market": position.market,
+                "ticker": quote.info.ticker,
+                "name": quote.info.name,
+                "currency": currency,
+                "shares": position.shares,
+                "avgPrice": position.avgPrice,
+                "price": float(self.price[i]),
+                "asOf": day_to_date(int(quote.frame.day[-1])) if len(quote.frame) else "",
+                "value": {"local": round(float(self.value[i]), digits), "usd": round(float(value_usd[i]), 2),
+                          "krw": round(float(value_krw[i]))},
+                "pnl": {"local": round(float(self.pnl[i]), digits), "usd": round(float(pnl_usd[i]), 2),
+                        "krw": round(float(pnl_krw[i]))},
+                "pnlPercent": None if np.isnan(pnl_pct[i]) else round(float(pnl_pct[i]), 2),
+                "dayChange": {"local": round(float(self.day_change[i]), digits), "usd": round(float(day_usd[i]), 2),
+                              "krw": round(float(day_krw[i]))},
+                "dayChangePercent": quote.changePercent,
+                "weight": None,
+            })
+        return rows
+
+    def value_usd(self) -> float:
+        return float((self.value * self.to_usd).sum())
+
+    def totals(self, cash_usd: float, cash_krw: float) -> dict:
+        fx = self.usd_krw
+        value_usd = self.value_usd()
+        cost_usd = float((self.cost * self.to_usd).sum())
+        pnl_usd = value_usd - cost_usd
+        day_usd = float((self.day_change * self.to_usd).sum())
+        prev_usd = value_usd - day_usd
+        equity_usd = value_usd + cash_usd + cash_krw / fx
+        return {
+            "valueUsd": round(value_usd, 2),
+            "valueKrw": round(value_usd * fx),
+            "costUsd": round(cost_usd, 2),
+            "costKrw": round(cost_usd * fx),
+            "pnlUsd": round(pnl_usd, 2),
+            "pnlKrw": round(pnl_usd * fx),
+            "pnlPercent": round(pnl_usd / cost_usd * 100, 2) if cost_usd > 0 else None,
+            "dayChangeUsd": round(day_usd, 2),
+            "dayChangeKrw": round(day_usd * fx),
+            "dayChangePercent": round(day_usd / prev_usd * 100, 2) if prev_usd > 0 else None,
+            "cashUsd": cash_usd,
+            "cashKrw": cash_krw,
+            "equityUsd": round(equity_usd, 2),
+            "equityKrw": round(equity_usd * fx),
+        }
+
+
+def _error(e: Exception) -> str:
+    return str(e) if isinstance(e, ValueError) else type(e).__name__
+
+
+def check_size(positions: list[PortfolioPosition]) -> None:
+    if len(positions) > MAX_POSITIONS:
+        raise ValueError(f"Valuation is limited to {MAX_POSITIONS} positions")
+
+
+async def valuate_stream(positions: list[PortfolioPosition], fx: ExchangeRateResponse, cash_usd: float = 0.0,
+                         cash_krw: float = 0.0) -> AsyncIterator[dict]:
+    """Yield ``positions`` events as quotes resolve (weights unknown yet), then a ``summary``
+    event with totals, every position's weight and per-position errors."""
+    errors: dict[int, str] = {}
+    by_symbol: dict[tuple[str, str], list[int]] = {}
+    for i, position in enumerate(positions):
+        try:
+            by_symbol.setdefault(_symbol(position), []).append(i)
+        except ValueError as e:
+            errors[i] = str(e)
+
+    parts = []
+    async for quotes in resolve_quotes(list(by_symbol)):
+        indices, quoted = [], []
+        for symbol, quote in quotes.items():
+            for i in by_symbol[symbol]:
+                if isinstance(quote, Exception):
+                    errors[i] = _error(quote)
+                else:
+                    indices.append(i)
+                    quoted.append(quote)
+        if indices:
+            part = Valuation(indices, [positions[i] for i in indices], quoted, fx.usdKrw)
+            parts.append(part)
+            yield {"type": "positions", "positions": part.rows()}
+
+    total = Valuation.concat(parts, fx.usdKrw)
+    value_usd = total.value_usd()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = total.value * total.to_usd / value_usd * 100 if value_usd else np.zeros(len(total.value))
+    yield {
+        "type": "summary",
+        "usdKrw": fx.usdKrw,
+        "fxSource": fx.source,
+        "totals": total.totals(cash_usd, cash_krw),
+        "weights": {int(i): round(float(w), 2) for i, w in zip(total.indices, weights)},
+        "errors": errors,
+    }
+
+
+async def valuate(positions: list[PortfolioPosition], fx: ExchangeRateResponse, cash_usd: float = 0.0,
+                  cash_krw: float = 0.0) -> dict:
+    """Whole valuation at once: ValuationResponse-shaped dict with positions in request order."""
+    rows, summary = [], None
+    async for event in valuate_stream(positions, fx, cash_usd, cash_krw):
+        if event["type"] == "positions":
+            rows.extend(event["positions"])
+        else:
+            summary = event
+    for row in rows:
+        row["weight"] = summary["weights"].get(row["index"])
+    rows.sort(key=lambda r: r["index"])
+    return {
+        "usdKrw": summary["usdKrw"],
+        "fxSource": summary["fxSource"],
+        "positions": rows,
+        "totals": summary["totals"],
+        "errors": summary["errors"],
+    }
@@ -0,0 +1,245 @@
+"""Background cache warming for a hot set of keys.
+
+A scheduler tick looks at every registered job (the market overview, USD/KRW
+and each hot-set ticker) and refreshes the ones whose cache entry is missing
+or within PREFETCH_LEAD seconds of expiry, so users keep hitting fresh data.
+
+- While a job's markets are closed and its data already includes the last
+  session's close, the entry is extended in place instead of polled.
+- Refreshes only spend rate-limit tokens that are available right now and
+  at most PREFETCH_BUDGET per tick, so prefetching never queues ahead of
+  user requests.
+- The hot set is persisted to HOT_SET_PATH and warmed again on startup.
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, time as dtime, timedelta, timezone
+from typing import Awaitable, Callable
+from zoneinfo import ZoneInfo
+
+from config import (
+    HOT_SET_PATH, PREFETCH_BUDGET, PREFETCH_ENABLED, PREFETCH_INTERVAL, PREFETCH_LEAD,
+)
+from services.bok_exchange import get_usd_krw
+from services.cache import cache
+from services.stocks import MARKETS, QUOTE_PERIODS, get_series, normalize_ticker, stock_cache_key
+from utils.rate_limiter import TokenBucket, krx_limiter, yahoo_limiter
+
+# Regular sessions (exchange holidays are not modelled; a holiday just polls a closed market)
+SESSIONS = {
+    "us": (ZoneInfo("America/New_York"), dtime(9, 30), dtime(16, 0)),
+    "kr": (ZoneInfo("Asia/Seoul"), dtime(9, 0), dtime(15, 30)),
+}
+CLOSE_SETTLE = timedelta(minutes=20)   # providers publish the final close a little late
+CLOSED_EXTEND = 1800                   # seconds a closed market's entry is kept fresh per extension
+MAX_RETRY_DELAY = 600
+HOT_SET_MAX = 200
+PREFETCH_CONCURRENCY = 4
+
+
+def is_open(market: str, now: datetime | None = None) -> bool:
+    tz, open_, close = SESSIONS[market]
+    local = (now or datetime.now(timezone.utc)).astimezone(tz)
+    return local.weekday() < 5 and open_ <= local.time() < close
+
+
+def last_close(market: str, now: datetime | None = None) -> datetime:
+    """The most recent regular-session close at or before ``now``."""
+    tz, _, close = SESSIONS[market]
+    local = (now or datetime.now(timezone.utc)).astimezone(tz)
+    day = local.date()
+    while True:
+        closed_at = datetime.combine(day, close, tz)
+        if day.weekday() < 5 and closed_at <= local:
+            return closed_at
+        day -= timedelta(days=1)
+
+
+class Job:
+    __slots__ = ("name", "key", "refresh", "markets", "limiter", "last_refresh", "failures", "retry_at",
+                 "last_error")
+
+    def __init__(self, name: str, key: str, refresh: Callable[[], Awaitable], markets: tuple[str, ...],
+                 limiter: TokenBucket | None = None):
+        self.name = name
+        self.key = key
+        self.refresh = refresh
+        self.markets = markets
+        self.limiter = limiter
+        self.last_refresh: datetime | None = None
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error: str | None = None
+
+    def settled(self, now: datetime) -> bool:
+        """All markets closed and the last refresh already saw their latest close."""
+        if any(is_open(m, now) for m in self.markets):
+            return False
+        if self.last_refresh is None:
+            return False
+        return all(self.last_refresh >= last_close(m, now) + CLOSE_SETTLE for m in self.markets)
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "expiresIn": cache.expires_in(self.key),
+            "lastRefresh": self.last_refresh.isoformat() if self.last_refresh else None,
+            "failures": self.failures,
+            "lastError": self.last_error,
+        }
+
+
+def _stock_job(market: str, ticker: str, period: str) -> Job:
+    return Job(
+        f"{market}:{ticker}:{period}",
+        stock_cache_key(market, ticker, period),
+        lambda: get_series(market, ticker, period, refresh=True),
+        (market,),
+        yahoo_limiter if market == "us" else krx_limiter,
+    )
+
+
+class Prefetcher:
+    def __init__(self, path: str = HOT_SET_PATH):
+        self.path = path
+        self._jobs: dict[str, Job] = {}
+        self._hot: dict[str, tuple[str, str, str]] = {}
+        self._task: asyncio.Task | None = None
+
+    # --- registration ---
+
+    def add_job(self, job: Job) -> None:
+        self._jobs[job.name] = job
+
+    def hot_set(self) -> list[tuple[str, str, str]]:
+        return list(self._hot.values())
+
+    def add(self, market: str, ticker: str, period: str = "6mo") -> str:
+        return self.add_many([(market, ticker, period)])[0]
+
+    def add_many(self, items: list[tuple[str, str, str]]) -> list[str]:
+        """Register (market, ticker, period) items; all of them or, on a ValueError, none."""
+        new = {}
+        for market, ticker, period in items:
+            if market not in MARKETS:
+                raise ValueError(f"Unknown market: {market}")
+            if period not in QUOTE_PERIODS:
+                raise ValueError(f"Unknown period: {period} (expected one of {', '.join(QUOTE_PERIODS)})")
+            ticker = normalize_ticker(market, ticker)
+            name = f"{market}:{ticker}:{period}"
+            if name not in self._hot:
+                new[name] = (market, ticker, period)
+        if len(self._hot) + len(new) > HOT_SET_MAX:
+            raise ValueError(f"Hot set is limited to {HOT_SET_MAX} tickers")
+        for name, item in new.items():
+            self._hot[name] = item
+            self._jobs[name] = _stock_job(*item)
+        return [f"{m}:{normalize_ticker(m, t)}:{p}" for m, t, p in items]
+
+    def remove(self, market: str, ticker: str, period: str = "6mo") -> bool:
+        name = f"{market}:{normalize_ticker(market, ticker)}:{period}"
+        self._jobs.pop(name, None)
+        return self._hot.pop(name, None) is not None
+
+    def load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                items = json.load(f)
+        except (OSError, ValueError):
+            return
+        for market, ticker, period in items:
+            try:
+                self.add(market, ticker, period)
+            except ValueError:
+                pass
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.hot_set(), f)
+        os.replace(tmp, self.path)
+
+    # --- scheduling ---
+
+    def _due(self, now: datetime) -> list[Job]:
+        """Jobs to refresh now, most expired first; reads the cache, so runs via ``cache.offload``."""
+        due = []
+        clock = time.monotonic()
+        for job in list(self._jobs.values()):
+            if job.retry_at > clock:
+                continue
+            remaining = cache.expires_in(job.key)
+            if remaining is not None and remaining > PREFETCH_LEAD:
+                continue
+            if remaining is not None and job.settled(now) and cache.extend(job.key, CLOSED_EXTEND):
+                continue
+            due.append((remaining if remaining is not None else float("-inf"), job))
+        due.sort(key=lambda d: d[0])
+        return [job for _, job in due[:PREFETCH_BUDGET]]
+
+    async def _run_job(self, job: Job, sem: asyncio.Semaphore) -> None:
+        async with sem:
+            # Only spend tokens that are free right now; user traffic has priority
+            if job.limiter is not None and job.limiter.wait_time() > 0:
+                return
+            try:
+                await job.refresh()
+            except Exception as e:
+                job.failures += 1
+                job.last_error = str(e) if isinstance(e, ValueError) else type(e).__name__
+                job.retry_at = time.monotonic() + min(MAX_RETRY_DELAY, PREFETCH_INTERVAL * 2 ** job.failures)
+                return
+            job.last_refresh = datetime.now(timezone.utc)
+            job.failures = 0
+            job.last_error = None
+
+    async def tick(self) -> int:
+        """Refresh due jobs once; returns how many were attempted."""
+        jobs = await cache.offload(self._due, datetime.now(timezone.utc))
+        sem = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+        await asyncio.gather(*(self._run_job(job, sem) for job in jobs))
+        return len(jobs)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except Exception:
+                pass
+            await asyncio.sleep(PREFETCH_INTERVAL)
+
+    def start(self) -> None:
+        """Load the persisted hot set and start ticking (the first tick warms everything)."""
+        if not PREFETCH_ENABLED or self._task is not None:
+            return
+        self.load()
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> dict:
+        """Scheduler state; reads every job's expiry, so async callers run it via ``cache.offload``."""
+        now = datetime.now(timezone.utc)
+        return {
+            "enabled": PREFETCH_ENABLED,
+            "running": self._task is not None and not self._task.done(),
+            "marketsOpen": {m: is_open(m, now) for m in SESSIONS},
+            "jobs": [job.status() for job in list(self._jobs.values())],
+        }
+
+
+# Singleton
+prefetcher = Prefetcher()
+prefetcher.add_job(Job(
+    "usd_krw", "exchange:usd_krw", lambda: get_usd_krw(refresh=True), ("kr", "us"), yahoo_limiter,
+))
@@ -0,0 +1,162 @@
+"""Shared quote polling with fan-out to streaming subscribers.
+
+Every distinct subscribed symbol is refreshed once per STREAM_INTERVAL
+through the regular stock path (``get_series(..., "5d", refresh=True)``:
+a short-range chart request for bars since the last stored day, written to
+the bar store and the existing ``{market}_stock:{ticker}:5d`` cache key).
+Only fields that changed are pushed, so upstream load and message volume
+scale with distinct symbols rather than connected clients.
+
+Subscribers coalesce undelivered updates per symbol, so a slow client gets
+the latest state instead of an unbounded backlog.
+"""
+import asyncio
+from datetime import datetime, timezone
+
+from services.ohlcv import day_to_date
+from services.prefetch import is_open
+from services.stocks import MARKETS, get_series, normalize_ticker
+
+STREAM_INTERVAL = 5.0         # seconds between polls of each subscribed symbol
+STREAM_CONCURRENCY = 8
+MAX_SYMBOLS_PER_CLIENT = 50
+QUOTE_FIELDS = ("price", "change", "changePercent", "bar")
+
+
+def parse_symbol(symbol: str) -> str:
+    """'us:aapl' -> 'us:AAPL'; raises ValueError on an unknown market."""
+    market, sep, ticker = symbol.strip().partition(":")
+    if not sep or market not in MARKETS or not ticker:
+        raise ValueError(f"Invalid symbol: {symbol!r} (expected 'us:TICKER' or 'kr:CODE')")
+    return f"{market}:{normalize_ticker(market, ticker)}"
+
+
+async def _quote(symbol: str, refresh: bool) -> dict:
+    market, ticker = symbol.split(":", 1)
+    series = await get_series(market, ticker, "5d", refresh=refresh)
+    bar = None
+    if len(series.frame):
+        last = {k: v[0] for k, v in series.frame.slice(-1).to_columns().items()}
+        bar = {"date": day_to_date(last.pop("day")), **last}
+    return {
+        "price": series.currentPrice,
+        "change": series.change,
+        "changePercent": series.changePercent,
+        "bar": bar,
+    }
+
+
+class Subscriber:
+    def __init__(self):
+        self.symbols: set[str] = set()
+        self._pending: dict[str, dict] = {}
+        self._ready = asyncio.Event()
+
+    def push(self, symbol: str, message: dict) -> None:
+        pending = self._pending.get(symbol)
+        if pending is None:
+            self._pending[symbol] = dict(message)
+        else:
+            pending.update(message)
+        self._ready.set()
+
+    async def next(self) -> list[dict]:
+        """Wait for updates and return them, one message per symbol."""
+        await self._ready.wait()
+        self._ready.clear()
+        messages = list(self._pending.values())
+        self._pending.clear()
+        return messages
+
+
+class QuoteHub:
+    def __init__(self, interval: float = STREAM_INTERVAL):
+        self.interval = interval
+        self._subscribers: dict[str, set[Subscriber]] = {}
+        self._last: dict[str, dict] = {}
+        self._task: asyncio.Task | None = None
+
+    def symbols(self) -> list[str]:
+        return list(self._subscribers)
+
+    async def subscribe(self, sub: Subscriber, symbols: list[str]) -> None:
+        """Add ``symbols`` for ``sub`` and queue a full snapshot of each."""
+        symbols = [parse_symbol(s) for s in symbols]
+        if len(sub.symbols | set(symbols)) > MAX_SYMBOLS_PER_CLIENT:
+            raise ValueError(f"At most {MAX_SYMBOLS_PER_CLIENT} symbols per stream")
+        for symbol in symbols:
+            sub.symbols.add(symbol)
+            self._subscribers.setdefault(symbol, set()).add(sub)
+        await asyncio.gather(*(self._snapshot(sub, s) for s in symbols))
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _snapshot(self, sub: Subscriber, symbol: str) -> None:
+        quote = self._last.get(symbol)
+        if quote is None:
+            try:
+                quote = await _quote(symbol, refresh=False)
+            except Exception as e:
+                sub.push(symbol, {"symbol": symbol, "error": str(e) if isinstance(e, ValueError) else type(e).__name__})
+                return
+            # Everyone may have unsubscribed while it loaded; don't keep quotes nobody polls
+            if symbol in self._subscribers:
+                self._last[symbol] = quote
+        sub.push(symbol, {"symbol": symbol, "snapshot": True, **quote, "ts": _now()})
+
+    def unsubscribe(self, sub: Subscriber, symbols: list[str] | None = None) -> None:
+        """Drop ``symbols`` (all of them by default) for ``sub``."""
+        for symbol in list(sub.symbols) if symbols is None else [parse_symbol(s) for s in symbols]:
+            sub.symbols.discard(symbol)
+            subs = self._subscribers.get(symbol)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[symbol]
+                    self._last.pop(symbol, None)
+
+    async def _poll(self, symbol: str, sem: asyncio.Semaphore) -> None:
+        async with sem:
+            try:
+                quote = await _quote(symbol, refresh=True)
+            except Exception:
+                return  # keep the last state; the next round retries
+        last = self._last.get(symbol) or {}
+        delta = {k: quote[k] for k in QUOTE_FIELDS if quote[k] != last.get(k)}
+        if symbol not in self._subscribers or not delta:
+            return
+        self._last[symbol] = quote
+        message = {"symbol": symbol, **delta, "ts": _now()}
+        for sub in self._subscribers.get(symbol, ()):
+            sub.push(symbol, message)
+
+    async def poll_once(self) -> None:
+        """One shared round: each subscribed symbol whose market is open is fetched once."""
+        now = datetime.now(timezone.utc)
+        symbols = [s for s in self._subscribers if is_open(s.split(":", 1)[0], now)]
+        sem = asyncio.Semaphore(STREAM_CONCURRENCY)
+        await asyncio.gather(*(self._poll(s, sem) for s in symbols))
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._subscribers:
+            started = loop.time()
+            await self.poll_once()
+            await asyncio.sleep(max(0.0, self.interval - (loop.time() - started)))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+# Singleton
+quote_hub = QuoteHub()
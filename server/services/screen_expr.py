@@ -0,0 +1,162 @@
+"""Filter and sort expressions for the screener.
+
+Expressions are Python syntax restricted to arithmetic, comparisons,
+``and``/``or``/``not``, numeric constants, a few functions and field names,
+e.g. ``rsi14 < 30 and close > sma200`` or ``close / sma50 - 1``. A field
+subscript reads an earlier bar: ``sma50[1]`` is yesterday's SMA50, so
+``sma50 > sma200 and sma50[1] <= sma200[1]`` is a golden cross.
+
+Every operation is applied to whole columns (one value per ticker), so an
+expression costs a handful of numpy calls however large the universe.
+Comparisons involving a missing value (NaN) are false.
+"""
+import ast
+import functools
+from typing import Callable
+
+import numpy as np
+
+MAX_EXPRESSION_LENGTH = 500
+MAX_NODES = 200
+
+Lookup = Callable[[str, int], np.ndarray]
+Compiled = Callable[[Lookup], np.ndarray]
+
+_BINARY = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+    ast.Mod: np.mod,
+    ast.Pow: np.power,
+}
+_COMPARE = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+FUNCTIONS = {
+    "abs": (1, 1, lambda args: np.abs(args[0])),
+    "log": (1, 1, lambda args: np.log(args[0])),
+    "sqrt": (1, 1, lambda args: np.sqrt(args[0])),
+    "min": (2, 8, lambda args: functools.reduce(np.minimum, args)),
+    "max": (2, 8, lambda args: functools.reduce(np.maximum, args)),
+}
+
+
+class Expression:
+    """A validated expression: ``evaluate(lookup)`` returns one value per ticker.
+
+    ``lookup(field, lag)`` supplies a field's column ``lag`` bars back.
+    """
+
+    def __init__(self, text: str, fn: Compiled, fields: list[str], is_condition: bool):
+        self.text = text
+        self.fn = fn
+        self.fields = fields
+        self.is_condition = is_condition
+
+    def evaluate(self, lookup: Lookup) -> np.ndarray:
+        with np.errstate(all="ignore"):
+            return self.fn(lookup)
+
+
+def _compile(node: ast.AST, fields: dict[str, int], used: list[str]) -> tuple[Compiled, bool]:
+    """(closure, whether it yields booleans) for one AST node."""
+    if isinstance(node, ast.BoolOp):
+        parts = [_condition(v, fields, used) for v in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        return lambda env: functools.reduce(combine, (p(env) for p in parts)), True
+
+    if isinstance(node, ast.UnaryOp):
+        if isinstance(node.op, ast.Not):
+            operand = _condition(node.operand, fields, used)
+            return lambda env: np.logical_not(operand(env)), True
+        operand = _number(node.operand, fields, used)
+        if isinstance(node.op, ast.USub):
+            return lambda env: np.negative(operand(env)), False
+        if isinstance(node.op, ast.UAdd):
+            return operand, False
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        op = _BINARY[type(node.op)]
+        left, right = _number(node.left, fields, used), _number(node.right, fields, used)
+        return lambda env: op(left(env), right(env)), False
+
+    if isinstance(node, ast.Compare):
+        if not all(type(op) in _COMPARE for op in node.ops):
+            raise ValueError("Unsupported comparison")
+        operands = [_number(n, fields, used) for n in (node.left, *node.comparators)]
+        ops = [_COMPARE[type(op)] for op in node.ops]
+
+        def compare(env):
+            values = [o(env) for o in operands]
+            return functools.reduce(np.logical_and, (op(values[i], values[i + 1]) for i, op in enumerate(ops)))
+        return compare, True
+
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = float(node.value)
+        return lambda env: value, False
+
+    if isinstance(node, ast.Name):
+        return _field(node.id, 0, fields, used), False
+
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+        lag = node.slice
+        if not (isinstance(lag, ast.Constant) and type(lag.value) is int):
+            raise ValueError(f"{node.value.id}[...] takes a whole number of bars back")
+        return _field(node.value.id, lag.value, fields, used), False
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        name = node.func.id
+        if name not in FUNCTIONS:
+            raise ValueError(f"Unknown function: {name} (expected one of {', '.join(FUNCTIONS)})")
+        low, high, fn = FUNCTIONS[name]
+        if not low <= len(node.args) <= high:
+            raise ValueError(f"{name}() takes {low if low == high else f'{low} to {high}'} arguments")
+        args = [_number(a, fields, used) for a in node.args]
+        return lambda env: fn([a(env) for a in args]), False
+
+    raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+
+
+def _field(name: str, lag: int, fields: dict[str, int], used: list[str]) -> Compiled:
+    if name not in fields:
+        raise ValueError(f"Unknown field: {name}")
+    if not 0 <= lag < fields[name]:
+        raise ValueError(f"{name} keeps {fields[name]} bar(s) of history; [{lag}] is out of range")
+    if name not in used:
+        used.append(name)
+    return lambda env: env(name, lag)
+
+
+def _number(node: ast.AST, fields: dict[str, int], used: list[str]) -> Compiled:
+    fn, is_condition = _compile(node, fields, used)
+    if is_condition:
+        raise ValueError("A condition cannot be used as a number")
+    return fn
+
+
+def _condition(node: ast.AST, fields: dict[str, int], used: list[str]) -> Compiled:
+    fn, is_condition = _compile(node, fields, used)
+    if not is_condition:
+        raise ValueError("and/or/not need conditions, e.g. rsi14 < 30")
+    return fn
+
+
+def parse(text: str, fields: dict[str, int]) -> Expression:
+    """Validate ``text`` against ``fields`` ({name: bars of history kept}); raises ValueError."""
+    if len(text) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expressions are limited to {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression: {e.msg}")
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise ValueError("Expression is too complex")
+    used: list[str] = []
+    fn, is_condition = _compile(tree.body, fields, used)
+    return Expression(text, fn, used, is_condition)
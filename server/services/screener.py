@@ -0,0 +1,476 @@
+"""Cross-sectional screener over a (ticker x day) matrix of daily closes and volumes.
+
+Each market keeps one matrix for its universe:
+- 'kr': the KRX listing (the SCREENER_KR_MAX largest by market cap when set);
+- 'us': the symbols in SCREENER_US_UNIVERSE, one per line (e.g. the S&P 500),
+  or the hot set's US tickers when that file is missing.
+
+Indicators are computed for every ticker at once with the 2-D forms in
+services.indicators and kept for the last LOOKBACK bars, so a query is a few
+column operations (see services.screen_expr).
+
+The matrix is built in the background on first use and then kept current
+incrementally. Every cycle folds in bars already cached for user requests.
+Tickers whose last bar predates the latest settled session are reloaded
+through the bar store: one delta request each, or none when the store
+already has the bar. Every worker keeps its own matrix; the bar store they
+share means only the first one pays for the initial load.
+"""
+import asyncio
+import time
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from config import SCREENER_KR_MAX, SCREENER_US_UNIVERSE
+from services.agent_context import RETURN_WINDOWS, TRADING_DAYS
+from services.bar_store import bar_store, today
+from services.indicators import indicator_series, sma_series
+from services.kr_fundamentals import get_kr_fundamentals_table
+from services.kr_listing import get_kr_listing
+from services.ohlcv import OHLCVFrame, day_to_date
+from services.prefetch import CLOSE_SETTLE, last_close, prefetcher
+from services.screen_expr import Expression, parse
+from services.stocks import MARKETS, cached_quote, get_fundamentals, get_series
+from services.us_fundamentals import MAX_QUOTE_SYMBOLS
+from utils.metrics import stage
+from utils.rate_limiter import krx_limiter, yahoo_limiter
+
+HISTORY_PERIOD = "1y"
+HISTORY_DAYS = 366
+LOOKBACK = 5                 # bars of history addressable as field[k]
+UPDATE_INTERVAL = 60         # seconds between update cycles
+RELOAD_RETRY = 3600          # seconds before a ticker is reloaded again after an attempt
+FUNDAMENTALS_REFRESH = 3600
+LOAD_CONCURRENCY = 4
+FUNDAMENTALS_CONCURRENCY = MAX_QUOTE_SYMBOLS   # one full quote batch in flight at a time
+PUBLISH_EVERY = 200          # recompute fields after this many reloads during a pass
+MAX_UNIVERSE = 5000
+MAX_RESULTS = 500
+
+# Bars a ticker needs before each indicator is reported
+WARMUP = {
+    "sma20": 20, "sma50": 50, "sma200": 200, "ema12": 1, "ema26": 1, "rsi14": 15,
+    "macd_value": 34, "macd_signal": 34, "macd_histogram": 34,
+    "bb_upper": 20, "bb_middle": 20, "bb_lower": 20,
+}
+PRICE_FIELDS = (
+    "close", "volume", "changePercent", *RETURN_WINDOWS, *WARMUP,
+    "high52w", "low52w", "fromHigh52w", "fromLow52w", "avgVolume20d", "volatility20d",
+)
+FUNDAMENTAL_FIELDS = ("marketCap", "pe", "forwardPe", "pb", "ps", "roe", "dividendYield", "debtToEquity",
+                      "revenueGrowth")
+# Field -> bars of history kept
+FIELDS = {**{f: LOOKBACK for f in PRICE_FIELDS}, **{f: 1 for f in FUNDAMENTAL_FIELDS}}
+
+
+class PriceMatrix:
+    """Closes and volumes, tickers x trading days, NaN where a ticker has no bar.
+
+    The calendar is the union of the days any ticker traded, so exchange
+    holidays never become columns.
+    """
+
+    def __init__(self):
+        self.tickers: list[str] = []
+        self.rows: dict[str, int] = {}
+        self.days = np.empty(0, dtype=np.int64)
+        self.close = np.empty((0, 0))
+        self.volume = np.empty((0, 0))
+        self.last_day = np.empty(0, dtype=np.int64)   # -1 for tickers with no bars yet
+        self.version = 0
+
+    def set_tickers(self, tickers: list[str]) -> None:
+        """Reorder rows to ``tickers``, keeping bars already loaded for the ones that stay."""
+        if tickers == self.tickers:
+            return
+        old = np.array([self.rows.get(t, -1) for t in tickers], dtype=np.intp)
+        keep = old >= 0
+        shape = (len(tickers), len(self.days))
+        close, volume = np.full(shape, np.nan), np.full(shape, np.nan)
+        close[keep], volume[keep] = self.close[old[keep]], self.volume[old[keep]]
+        last_day = np.full(len(tickers), -1, dtype=np.int64)
+        last_day[keep] = self.last_day[old[keep]]
+        self.tickers, self.rows = list(tickers), {t: i for i, t in enumerate(tickers)}
+        self.close, self.volume, self.last_day = close, volume, last_day
+        self.version += 1
+
+    def trim(self, start_day: int) -> None:
+        """Drop calendar days before ``start_day``."""
+        keep = self.days >= start_day
+        if keep.all():
+            return
+        self.days, self.close, self.volume = self.days[keep], self.close[:, keep], self.volume[:, keep]
+        self.version += 1
+
+    def _add_days(self, days: np.ndarray) -> None:
+        new = np.setdiff1d(days, self.days)
+        if not len(new):
+            return
+        merged = np.union1d(self.days, new)
+        at = np.searchsorted(merged, self.days)
+        shape = (len(self.tickers), len(merged))
+        close, volume = np.full(shape, np.nan), np.full(shape, np.nan)
+        close[:, at], volume[:, at] = self.close, self.volume
+        self.days, self.close, self.volume = merged, close, volume
+
+    def apply(self, ticker: str, frame: OHLCVFrame, start_day: int) -> bool:
+        """Merge ``frame``'s bars from ``start_day`` into the ticker's row; True if anything changed."""
+        row = self.rows.get(ticker)
+        if row is None or not len(frame):
+            return False
+        keep = frame.day >= start_day
+        day = frame.day[keep].astype(np.int64)
+        if not len(day):
+            return False
+        close, volume = frame.close[keep], frame.volume[keep].astype(np.float64)
+        self._add_days(day)
+        cols = np.searchsorted(self.days, day)
+        if np.array_equal(self.close[row, cols], close) and np.array_equal(self.volume[row, cols], volume):
+            return False
+        self.close[row, cols], self.volume[row, cols] = close, volume
+        self.last_day[row] = max(int(self.last_day[row]), int(day[-1]))
+        self.version += 1
+        return True
+
+
+def _tail(values: np.ndarray) -> np.ndarray:
+    """Last LOOKBACK columns, latest first, NaN-padded for short calendars."""
+    out = np.full((values.shape[0], LOOKBACK), np.nan)
+    k = min(LOOKBACK, values.shape[1])
+    out[:, :k] = values[:, ::-1][:, :k]
+    return out
+
+
+def _ffill(values: np.ndarray) -> np.ndarray:
+    """Carry each row's last value over gaps; before its first bar use that first value."""
+    idx = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    filled = np.take_along_axis(values, idx, axis=1)
+    first = np.take_along_axis(filled, np.argmax(~np.isnan(values), axis=1)[:, None], axis=1)
+    return np.where(np.isnan(filled), first, filled)
+
+
+def _lag(values: np.ndarray, days: int) -> np.ndarray:
+    out = np.full_like(values, np.nan)
+    if days < values.shape[1]:
+        out[:, days:] = values[:, :-days]
+    return out
+
+
+def price_fields(close_raw: np.ndarray, volume_raw: np.ndarray) -> dict[str, np.ndarray]:
+    """Every PRICE_FIELDS column for the last LOOKBACK bars (tickers x LOOKBACK, latest first).
+
+    A value needing more bars than a ticker has is NaN.
+    """
+    n, d = close_raw.shape
+    if not d:
+        return {f: np.full((n, LOOKBACK), np.nan) for f in PRICE_FIELDS}
+    count = _tail(np.cumsum(~np.isnan(close_raw), axis=1).astype(np.float64))
+    close = _ffill(close_raw)
+    volume = np.nan_to_num(volume_raw)
+    fields = {"close": _tail(close), "volume": _tail(volume)}
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fields["changePercent"] = np.where(count > 1, _tail((close / _lag(close, 1) - 1) * 100), np.nan)
+        for name, days in RETURN_WINDOWS.items():
+            fields[name] = np.where(count > days, _tail((close / _lag(close, days) - 1) * 100), np.nan)
+
+        for name, series in indicator_series(close).items():
+            fields[name] = np.where(count >= WARMUP[name], _tail(series), np.nan)
+
+        high, low, vol20 = (np.full((n, LOOKBACK), np.nan) for _ in range(3))
+        log_returns = np.diff(np.log(close), axis=1)
+        for k in range(min(LOOKBACK, d)):
+            year = close[:, max(0, d - k - TRADING_DAYS):d - k]
+            high[:, k], low[:, k] = year.max(axis=1), year.min(axis=1)
+            window = log_returns[:, max(0, d - k - 21):d - k - 1]
+            if window.shape[1] == 20:
+                vol20[:, k] = window.std(axis=1, ddof=1) * np.sqrt(TRADING_DAYS) * 100
+        fields["high52w"], fields["low52w"] = high, low
+        fields["fromHigh52w"] = (fields["close"] / high - 1) * 100
+        fields["fromLow52w"] = (fields["close"] / low - 1) * 100
+        fields["avgVolume20d"] = _tail(sma_series(volume, 20))
+        fields["volatility20d"] = np.where(count > 20, vol20, np.nan)
+    return fields
+
+
+class Snapshot:
+    """Fields computed from one version of a market's matrix, plus what queries need to label rows."""
+
+    def __init__(self, tickers: list[str], names: list[str | None], last_day: np.ndarray,
+                 fields: dict[str, np.ndarray], version: int, as_of: int | None):
+        self.tickers = tickers
+        self.names = names
+        self.last_day = last_day
+        self.fields = fields
+        self.version = version
+        self.as_of = as_of
+        self.computed_at = datetime.now(timezone.utc)
+
+    def lookup(self, name: str, lag: int) -> np.ndarray:
+        return self.fields[name][:, lag]
+
+
+def _build_snapshot(tickers, names, last_day, close, volume, fundamentals, version, as_of) -> Snapshot:
+    with stage("screener", "compute"):
+        fields = price_fields(close, volume)
+        for field in FUNDAMENTAL_FIELDS:
+            column = np.array([getattr(fundamentals.get(t), field, None) for t in tickers], dtype=np.float64)
+            fields[field] = column[:, None]
+    return Snapshot(tickers, names, last_day, fields, version, as_of)
+
+
+def _settled_day(market: str) -> tuple[int, float]:
+    """(epoch day, timestamp after which its close is final) of the latest settled session."""
+    now = datetime.now(timezone.utc)
+    closed_at = last_close(market, now - CLOSE_SETTLE)
+    return (closed_at.date() - date(1970, 1, 1)).days, (closed_at + CLOSE_SETTLE).timestamp()
+
+
+def _read_us_universe() -> list[str]:
+    try:
+        with open(SCREENER_US_UNIVERSE, encoding="utf-8") as f:
+            lines = [line.split("#", 1)[0].strip().upper() for line in f]
+    except OSError:
+        return []
+    return list(dict.fromkeys(t for t in lines if t))[:MAX_UNIVERSE]
+
+
+async def _universe(market: str) -> tuple[list[str], dict[str, str]]:
+    if market == "kr":
+        symbols = sorted(await get_kr_listing(), key=lambda s: -(s.marketCap or 0))
+        symbols = symbols[:SCREENER_KR_MAX or MAX_UNIVERSE]
+        return [s.code for s in symbols], {s.code: s.name for s in symbols}
+    tickers = await asyncio.to_thread(_read_us_universe)
+    if not tickers:
+        tickers = list(dict.fromkeys(t for m, t, _ in prefetcher.hot_set() if m == "us"))
+    return tickers, {}
+
+
+class MarketScreener:
+    """One market's matrix, its latest snapshot and the background task keeping them current."""
+
+    def __init__(self, market: str):
+        self.market = market
+        self.limiter = yahoo_limiter if market == "us" else krx_limiter
+        self.matrix = PriceMatrix()
+        self.names: dict[str, str] = {}
+        self.fundamentals: dict = {}
+        self.fundamentals_at = 0.0
+        self.attempted: dict[str, float] = {}
+        self.snapshot: Snapshot | None = None
+        self.building = False
+        self.last_error: str | None = None
+        self._task: asyncio.Task | None = None
+
+    # --- background updates ---
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.update()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e) if isinstance(e, ValueError) else type(e).__name__
+            finally:
+                self.building = False
+            await asyncio.sleep(UPDATE_INTERVAL)
+
+    async def update(self) -> None:
+        """One cycle: universe, cached bars, reloads of tickers behind the settled session, fundamentals."""
+        tickers, names = await _universe(self.market)
+        self.names.update(names)
+        self.matrix.set_tickers(tickers)
+        start = today() - HISTORY_DAYS
+        self.matrix.trim(start)
+
+        # Bars already cached for user requests cost no upstream calls, but up to
+        # MAX_UNIVERSE x QUOTE_PERIODS cache lookups; keep them off the event loop
+        await asyncio.to_thread(self._apply_cached, tickers, start)
+
+        settled, settled_at = _settled_day(self.market)
+        now = time.time()
+        behind = [
+            t for t in tickers
+            if self.matrix.last_day[self.matrix.rows[t]] < settled and now - self.attempted.get(t, 0) >= RELOAD_RETRY
+        ]
+        if behind:
+            self.building = True
+            await self._reload(behind, start, settled, settled_at)
+        if now - self.fundamentals_at >= FUNDAMENTALS_REFRESH:
+            await self._load_fundamentals(tickers)
+        await self._publish()
+
+    def _apply_cached(self, tickers: list[str], start: int) -> None:
+        for ticker in tickers:
+            series = cached_quote(self.market, ticker)
+            if series is not None:
+                self.matrix.apply(ticker, series.frame, start)
+
+    async def _load(self, ticker: str, start: int, settled: int, settled_at: float) -> tuple[str, OHLCVFrame | None]:
+        cov = await asyncio.to_thread(bar_store.coverage, self.market, ticker)
+        if cov is not None and cov.covers(start) and (cov.last_day >= settled or cov.fetched_at >= settled_at):
+            if cov.name:
+                self.names.setdefault(ticker, cov.name)
+            return ticker, await asyncio.to_thread(bar_store.load, self.market, ticker, start)
+        # Let queued user requests take the next rate-limit tokens
+        while (wait := self.limiter.wait_time()) > 0:
+            await asyncio.sleep(min(wait, 1.0))
+        try:
+            series = await get_series(self.market, ticker, HISTORY_PERIOD, refresh=True)
+        except Exception:
+            return ticker, None
+        self.names.setdefault(ticker, series.info.name)
+        return ticker, series.frame
+
+    async def _reload(self, tickers: list[str], start: int, settled: int, settled_at: float) -> None:
+        sem = asyncio.Semaphore(LOAD_CONCURRENCY)
+
+        async def load(ticker):
+            async with sem:
+                return await self._load(ticker, start, settled, settled_at)
+
+        tasks = [asyncio.create_task(load(t)) for t in tickers]
+        try:
+            for done, next_done in enumerate(asyncio.as_completed(tasks), 1):
+                ticker, frame = await next_done
+                self.attempted[ticker] = time.time()
+                if frame is not None:
+                    self.matrix.apply(ticker, frame, start)
+                if done % PUBLISH_EVERY == 0:
+                    await self._publish()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _load_fundamentals(self, tickers: list[str]) -> None:
+        """Batched quote fields for US, rows of the bulk table for KR."""
+        if self.market == "kr":
+            table = await get_kr_fundamentals_table()
+            self.fundamentals = {t: row for t in tickers if (row := table.get(t)) is not None}
+            # A listing-only table is enriched in the background; look again next cycle
+            self.fundamentals_at = time.time() if table.complete else 0.0
+            return
+        sem = asyncio.Semaphore(FUNDAMENTALS_CONCURRENCY)
+
+        async def load(ticker):
+            async with sem:
+                return await get_fundamentals(self.market, ticker, detail=False)
+
+        results = await asyncio.gather(*(load(t) for t in tickers), return_exceptions=True)
+        self.fundamentals = {t: r for t, r in zip(tickers, results) if not isinstance(r, BaseException)}
+        self.fundamentals_at = time.time()
+
+    async def _publish(self) -> None:
+        m = self.matrix
+        if self.snapshot is not None and self.snapshot.version == m.version:
+            return
+        as_of = int(m.days[-1]) if len(m.days) else None
+        self.snapshot = await asyncio.to_thread(
+            _build_snapshot, list(m.tickers), [self.names.get(t) for t in m.tickers], m.last_day.copy(),
+            m.close.copy(), m.volume.copy(), dict(self.fundamentals), m.version, as_of,
+        )
+
+    # --- queries ---
+
+    def status(self) -> dict:
+        snap = self.snapshot
+        return {
+            "market": self.market,
+            "universe": len(self.matrix.tickers),
+            "loaded": int((self.matrix.last_day >= 0).sum()),
+            "building": self.building or snap is None,
+            "asOf": day_to_date(snap.as_of) if snap and snap.as_of is not None else None,
+            "updatedAt": snap.computed_at.isoformat(timespec="seconds") if snap else None,
+            "lastError": self.last_error,
+        }
+
+    def query(self, filter_: Expression | None, sort: Expression | None, descending: bool, limit: int,
+              columns: list[str]) -> dict:
+        self.start()
+        snap = self.snapshot
+        response = {**self.status(), "matched": 0, "results": []}
+        if snap is None or not snap.tickers:
+            return response
+
+        with stage("screener", "query"):
+            n = len(snap.tickers)
+            mask = np.broadcast_to(filter_.evaluate(snap.lookup), (n,)) if filter_ else np.ones(n, dtype=bool)
+            idx = np.flatnonzero(mask & (snap.last_day >= 0))
+            score = None
+            if sort is not None:
+                score = np.broadcast_to(np.asarray(sort.evaluate(snap.lookup), dtype=np.float64), (n,))
+                keys = score[idx]
+                # NaN sorts last either way
+                idx = idx[np.argsort(np.where(np.isnan(keys), np.inf, -keys if descending else keys), kind="stable")]
+            response["matched"] = len(idx)
+            idx = idx[:limit]
+
+            referenced = [*(filter_.fields if filter_ else ()), *(sort.fields if sort else ())]
+            names = list(dict.fromkeys(["close", "changePercent", *columns, *referenced]))
+            values = {name: _rounded(snap.fields[name][idx, 0]) for name in names}
+            scores = _rounded(score[idx]) if score is not None else [None] * len(idx)
+            response["results"] = [
+                {
+                    "ticker": snap.tickers[i],
+                    "name": snap.names[i],
+                    "asOf": day_to_date(int(snap.last_day[i])),
+                    "score": scores[j],
+                    "values": {name: values[name][j] for name in names},
+                }
+                for j, i in enumerate(idx.tolist())
+            ]
+        return response
+
+
+def _rounded(values: np.ndarray) -> list[float | None]:
+    rounded = np.round(values.astype(np.float64), 4)
+    return np.where(np.isfinite(rounded), rounded, None).tolist()
+
+
+class Screener:
+    def __init__(self):
+        self.markets = {m: MarketScreener(m) for m in MARKETS}
+
+    def query(self, market: str, filter_: str | None = None, sort: str | None = None, descending: bool = True,
+              limit: int = 50, fields: list[str] | None = None) -> dict:
+        """Rows of ``market`` matching ``filter_``, ordered by ``sort``; starts the market's matrix on first use."""
+        if market not in self.markets:
+            raise ValueError(f"Unknown market: {market}")
+        if not 1 <= limit <= MAX_RESULTS:
+            raise ValueError(f"limit must be between 1 and {MAX_RESULTS}")
+        unknown = [f for f in fields or () if f not in FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field: {unknown[0]}")
+        condition = parse(filter_, FIELDS) if filter_ else None
+        if condition is not None and not condition.is_condition:
+            raise ValueError("filter must be a condition, e.g. rsi14 < 30")
+        key = parse(sort, FIELDS) if sort else None
+        if key is not None and key.is_condition:
+            raise ValueError("sort must be a number, e.g. marketCap or close / sma200")
+        return self.markets[market].query(condition, key, descending, limit, list(fields or ()))
+
+    def status(self) -> list[dict]:
+        return [s.status() for s in self.markets.values()]
+
+    async def stop(self) -> None:
+        for s in self.markets.values():
+            await s.stop()
+
+
+# Singleton
+screener = Screener()
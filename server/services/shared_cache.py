@@ -0,0 +1,572 @@
+"""Node-wide cache shared by every worker process.
+
+``SharedCache`` keeps TTLCache's interface but stores entries in a backend
+that all workers see: an on-disk SQLite database (``CACHE_BACKEND=sqlite``)
+or a Redis server (``CACHE_BACKEND=redis``, needs the optional ``redis``
+package). Values are pickled and zlib-compressed when large, and carry a
+random version. Each worker keeps the decoded value for the current version
+in a small in-process memo, so a hit costs one backend round trip and
+decoding only happens after another worker writes a new version.
+
+Expiry uses wall-clock time so TTLs mean the same thing in every process.
+``lock(key)`` is a node-wide lock, which extends single-flight across
+workers. Backend calls block, so async callers use the ``a``-prefixed
+variants (``aget``, ``aexpires_in``, ...) or ``offload`` for several calls
+at once, which run them in a worker thread; ``lock`` does the same. Bounds
+are enforced by the janitor thread, never on the writing request.
+Namespaces in LOCAL_NAMESPACES hold objects that only make sense in one
+process (pre-rendered payloads tied to a value's identity, mutable
+indicator state), so they stay in a per-process TTLCache.
+"""
+import asyncio
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from contextlib import asynccontextmanager
+from typing import Any, Callable
+
+from config import CACHE_LOCAL_BYTES, CACHE_MAX_BYTES, CACHE_MAX_ENTRIES, CACHE_PATH, REDIS_URL
+from services.cache import DEFAULT_NAMESPACE_LIMIT, JANITOR_INTERVAL, NAMESPACE_LIMITS, TTLCache, _Stats, _namespace
+
+try:
+    import redis
+except ImportError:  # optional
+    redis = None
+
+LOCAL_NAMESPACES = ("payload", "indicator_state")
+COMPRESS_MIN_BYTES = 1024
+LOCK_TTL = 60.0          # a crashed holder's lock is released after this long
+LOCK_POLL = 0.05
+PRUNE_EVERY = 64         # writes between bound checks (run early by the janitor)
+
+
+def encode(value: Any) -> bytes:
+    """Pickle ``value``; bodies over COMPRESS_MIN_BYTES are zlib-compressed."""
+    body = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(body) >= COMPRESS_MIN_BYTES:
+        return b"z" + zlib.compress(body, 1)
+    return b"p" + body
+
+
+def decode(blob: bytes) -> Any:
+    body = blob[1:]
+    return pickle.loads(zlib.decompress(body) if blob[:1] == b"z" else body)
+
+
+def _new_version() -> int:
+    return int.from_bytes(os.urandom(8), "big") >> 1
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    written_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_namespace ON entries (namespace, written_at);
+CREATE INDEX IF NOT EXISTS entries_written ON entries (written_at);
+CREATE TABLE IF NOT EXISTS locks (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SQLiteBackend:
+    """Entries in one SQLite file (WAL) shared by every process on the node.
+
+    Over-limit namespaces and the global bounds evict the least recently
+    written entries.
+    """
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._pid = 0
+
+    def _db(self) -> sqlite3.Connection:
+        # A connection must not cross a fork (gunicorn --preload)
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key: str, known_version: int | None) -> tuple[int, float, float, bytes | None] | None:
+        """(version, expires_at, stale_until, blob); blob is None when ``known_version`` is current."""
+        with self._lock:
+            return self._db().execute(
+                "SELECT version, expires_at, stale_until, CASE WHEN version = ? THEN NULL ELSE value END "
+                "FROM entries WHERE key = ?",
+                (known_version, key),
+            ).fetchone()
+
+    def expiry(self, key: str) -> tuple[float, float] | None:
+        """(expires_at, stale_until) without reading the value."""
+        with self._lock:
+            return self._db().execute(
+                "SELECT expires_at, stale_until FROM entries WHERE key = ?", (key,),
+            ).fetchone()
+
+    def set(self, key: str, blob: bytes, version: int, expires_at: float, stale_until: float) -> None:
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, _namespace(key), version, expires_at, stale_until, time.time(), len(blob), blob),
+            )
+
+    def extend(self, key: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cur = self._db().execute(
+                "UPDATE entries SET stale_until = ? + stale_until - expires_at, expires_at = ? "
+                "WHERE key = ? AND stale_until >= ?",
+                (now + ttl_seconds, now + ttl_seconds, key, now),
+            )
+        return cur.rowcount > 0
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._db().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db().execute("DELETE FROM entries")
+
+    def prune(self, max_entries: int, max_bytes: int, namespace_limits: dict[str, int]) -> dict[str, list[int]]:
+        """Drop dead entries, then enforce the bounds. Returns {namespace: [expired, evicted]}."""
+        now = time.time()
+        removed: dict[str, list[int]] = {}
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for namespace, count in db.execute(
+                    "SELECT namespace, COUNT(*) FROM entries WHERE stale_until < ? GROUP BY namespace", (now,),
+                ).fetchall():
+                    removed.setdefault(namespace, [0, 0])[0] += count
+                db.execute("DELETE FROM entries WHERE stale_until < ?", (now,))
+                drop = []
+                for namespace, count in db.execute(
+                    "SELECT namespace, COUNT(*) FROM entries GROUP BY namespace"
+                ).fetchall():
+                    over = count - namespace_limits.get(namespace, DEFAULT_NAMESPACE_LIMIT)
+                    if over > 0:
+                        drop += db.execute(
+                            "SELECT key, namespace FROM entries WHERE namespace = ? ORDER BY written_at LIMIT ?",
+                            (namespace, over),
+                        ).fetchall()
+                db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in drop])
+                count, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+                if count > max_entries or size > max_bytes:
+                    # Walk from the oldest write until both bounds hold
+                    oldest = []
+                    for key, namespace, entry_size in db.execute(
+                        "SELECT key, namespace, size FROM entries ORDER BY written_at"
+                    ).fetchall():
+                        if count <= max(max_entries, 1) and size <= max_bytes:
+                            break
+                        oldest.append((key, namespace))
+                        count -= 1
+                        size -= entry_size
+                    db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in oldest])
+                    drop += oldest
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        for _, namespace in drop:
+            removed.setdefault(namespace, [0, 0])[1] += 1
+        return removed
+
+    def namespace_stats(self) -> dict[str, tuple[int, int]]:
+        """{namespace: (entries, bytes)}"""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT namespace, COUNT(*), SUM(size) FROM entries GROUP BY namespace"
+            ).fetchall()
+        return {ns: (count, size) for ns, count, size in rows}
+
+    def acquire(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("DELETE FROM locks WHERE key = ? AND expires_at < ?", (key, now))
+                acquired = db.execute(
+                    "INSERT OR IGNORE INTO locks VALUES (?, ?, ?)", (key, owner, now + ttl_seconds),
+                ).rowcount > 0
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return acquired
+
+    def release(self, key: str, owner: str) -> None:
+        with self._lock:
+            self._db().execute("DELETE FROM locks WHERE key = ? AND owner = ?", (key, owner))
+
+
+# Returns [version, expires_at, stale_until] plus the value unless ARGV[1] is the current version
+_REDIS_GET = """
+local h = redis.call('HMGET', KEYS[1], 'v', 'e', 's')
+if not h[1] then return nil end
+if h[1] == ARGV[1] then return h end
+h[4] = redis.call('HGET', KEYS[1], 'd')
+return h
+"""
+_REDIS_EXTEND = """
+local h = redis.call('HMGET', KEYS[1], 'e', 's')
+if not h[1] then return 0 end
+local e = tonumber(ARGV[1])
+local s = e + tonumber(h[2]) - tonumber(h[1])
+redis.call('HSET', KEYS[1], 'e', ARGV[1], 's', tostring(s))
+redis.call('PEXPIREAT', KEYS[1], math.ceil(s * 1000))
+return 1
+"""
+_REDIS_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+
+class RedisBackend:
+    """Entries as Redis hashes under ``prefix``, expired by Redis itself.
+
+    A sorted set per namespace (scored by write time) backs the namespace
+    limits and stats; global memory bounds are left to Redis' ``maxmemory``.
+    """
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "ias:cache:"):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._get = self._client.register_script(_REDIS_GET)
+        self._extend = self._client.register_script(_REDIS_EXTEND)
+        self._release = self._client.register_script(_REDIS_RELEASE)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}e:{key}"
+
+    def _index(self, namespace: str) -> str:
+        return f"{self.prefix}ns:{namespace}"
+
+    def get(self, key: str, known_version: int | None) -> tuple[int, float, float, bytes | None] | None:
+        row = self._get(keys=[self._key(key)], args=[str(known_version)])
+        if row is None:
+            return None
+        blob = row[3] if len(row) > 3 else None
+        return int(row[0]), float(row[1]), float(row[2]), blob
+
+    def expiry(self, key: str) -> tuple[float, float] | None:
+        expires_at, stale_until = self._client.hmget(self._key(key), "e", "s")
+        if expires_at is None:
+            return None
+        return float(expires_at), float(stale_until)
+
+    def set(self, key: str, blob: bytes, version: int, expires_at: float, stale_until: float) -> None:
+        namespace = _namespace(key)
+        pipe = self._client.pipeline()
+        pipe.hset(self._key(key), mapping={
+            "v": str(version), "e": repr(expires_at), "s": repr(stale_until), "z": len(blob), "d": blob,
+        })
+        pipe.pexpireat(self._key(key), int(stale_until * 1000) + 1)
+        pipe.zadd(self._index(namespace), {key: time.time()})
+        pipe.sadd(f"{self.prefix}namespaces", namespace)
+        pipe.execute()
+
+    def extend(self, key: str, ttl_seconds: float) -> bool:
+        return bool(self._extend(keys=[self._key(key)], args=[repr(time.time() + ttl_seconds)]))
+
+    def delete(self, key: str) -> None:
+        pipe = self._client.pipeline()
+        pipe.delete(self._key(key))
+        pipe.zrem(self._index(_namespace(key)), key)
+        pipe.execute()
+
+    def _namespaces(self) -> list[str]:
+        return sorted(ns.decode() for ns in self._client.smembers(f"{self.prefix}namespaces"))
+
+    def clear(self) -> None:
+        keys = list(self._client.scan_iter(match=f"{self.prefix}*", count=1000))
+        for start in range(0, len(keys), 1000):
+            self._client.delete(*keys[start:start + 1000])
+
+    def prune(self, max_entries: int, max_bytes: int, namespace_limits: dict[str, int]) -> dict[str, list[int]]:
+        removed = {}
+        for namespace in self._namespaces():
+            index = self._index(namespace)
+            members = [m.decode() for m in self._client.zrange(index, 0, -1)]
+            pipe = self._client.pipeline()
+            for key in members:
+                pipe.exists(self._key(key))
+            alive = [k for k, ok in zip(members, pipe.execute()) if ok]
+            expired = len(members) - len(alive)
+            if expired:
+                self._client.zrem(index, *set(members).difference(alive))
+            oldest = alive[:max(len(alive) - namespace_limits.get(namespace, DEFAULT_NAMESPACE_LIMIT), 0)]
+            if oldest:
+                pipe = self._client.pipeline()
+                pipe.delete(*(self._key(k) for k in oldest))
+                pipe.zrem(index, *oldest)
+                pipe.execute()
+            removed[namespace] = [expired, len(oldest)]
+        return removed
+
+    def namespace_stats(self) -> dict[str, tuple[int, int]]:
+        stats = {}
+        for namespace in self._namespaces():
+            members = [m.decode() for m in self._client.zrange(self._index(namespace), 0, -1)]
+            pipe = self._client.pipeline()
+            for key in members:
+                pipe.hget(self._key(key), "z")
+            sizes = [int(z) for z in pipe.execute() if z is not None]
+            stats[namespace] = (len(sizes), sum(sizes))
+        return stats
+
+    def acquire(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        return bool(self._client.set(f"{self.prefix}lock:{key}", owner, nx=True, px=int(ttl_seconds * 1000)))
+
+    def release(self, key: str, owner: str) -> None:
+        self._release(keys=[f"{self.prefix}lock:{key}"], args=[owner])
+
+
+class SharedCache:
+    """TTLCache-compatible front end over a node-wide backend."""
+
+    def __init__(
+        self,
+        backend,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        namespace_limits: dict[str, int] | None = None,
+        local_bytes: int = CACHE_LOCAL_BYTES,
+    ):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.namespace_limits = dict(NAMESPACE_LIMITS if namespace_limits is None else namespace_limits)
+        # Process-local namespaces, plus decoded values keyed "memo:<key>" -> (version, value)
+        self.local = TTLCache(max_entries, local_bytes, {**self.namespace_limits, "memo": max_entries})
+        self._stats: dict[str, _Stats] = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._janitor: threading.Thread | None = None
+        self._prune_due = threading.Event()
+
+    def _ns_stats(self, namespace: str) -> _Stats:
+        stats = self._stats.get(namespace)
+        if stats is None:
+            stats = self._stats[namespace] = _Stats()
+        return stats
+
+    def _lookup(self, key: str, allow_stale: bool) -> tuple[Any, bool] | None:
+        namespace = _namespace(key)
+        memo_key = f"memo:{key}"
+        memo = self.local.get(memo_key)
+        row = self.backend.get(key, memo[0] if memo else None)
+        now = time.time()
+        with self._lock:
+            stats = self._ns_stats(namespace)
+            if row is None or now > row[2]:
+                stats.misses += 1
+                return None
+            version, expires_at, stale_until, blob = row
+            fresh = now <= expires_at
+            if not fresh and not allow_stale:
+                stats.misses += 1
+                return None
+            if fresh:
+                stats.hits += 1
+            else:
+                stats.stale += 1
+        if blob is None:
+            value = memo[1]
+        else:
+            value = decode(blob)
+            self.local.set(memo_key, (version, value), max(stale_until - now, 1))
+        return value, fresh
+
+    def get(self, key: str) -> Any | None:
+        if _namespace(key) in LOCAL_NAMESPACES:
+            return self.local.get(key)
+        hit = self._lookup(key, allow_stale=False)
+        return hit[0] if hit else None
+
+    def get_stale(self, key: str) -> tuple[Any, bool] | None:
+        """Return (value, is_fresh), including entries inside their stale window."""
+        if _namespace(key) in LOCAL_NAMESPACES:
+            return self.local.get_stale(key)
+        return self._lookup(key, allow_stale=True)
+
+    async def aget(self, key: str) -> Any | None:
+        if _namespace(key) in LOCAL_NAMESPACES:
+            return self.local.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aget_stale(self, key: str) -> tuple[Any, bool] | None:
+        if _namespace(key) in LOCAL_NAMESPACES:
+            return self.local.get_stale(key)
+        return await asyncio.to_thread(self.get_stale, key)
+
+    async def offload(self, fn: Callable[..., Any], *args) -> Any:
+        """Run ``fn`` (which uses the cache synchronously) in a worker thread."""
+        return await asyncio.to_thread(fn, *args)
+
+    async def aexpires_in(self, key: str) -> float | None:
+        if _namespace(key) in LOCAL_NAMESPACES:
+            return self.local.expires_in(key)
+        return await asyncio.to_thread(self.expires_in, key)
+
+    async def aextend(self, key: str, ttl_seconds: int) -> bool:
+        if _namespace(key) in LOCAL_NAMESPACES:
+            return self.local.extend(key, ttl_seconds)
+        return await asyncio.to_thread(self.extend, key, ttl_seconds)
+
+    async def adelete(self, key: str) -> None:
+        if _namespace(key) in LOCAL_NAMESPACES:
+            self.local.delete(key)
+            return
+        await asyncio.to_thread(self.delete, key)
+
+    def expires_in(self, key: str) -> float | None:
+        """Seconds until ``key`` goes stale (negative inside its stale window), or None if absent."""
+        if _namespace(key) in LOCAL_NAMESPACES:
+            return self.local.expires_in(key)
+        row = self.backend.expiry(key)
+        now = time.time()
+        if row is None or now > row[1]:
+            return None
+        return row[0] - now
+
+    def extend(self, key: str, ttl_seconds: int) -> bool:
+        """Keep an entry fresh for another ``ttl_seconds`` without refetching it."""
+        if _namespace(key) in LOCAL_NAMESPACES:
+            return self.local.extend(key, ttl_seconds)
+        return self.backend.extend(key, ttl_seconds)
+
+    def set(self, key: str, value: Any, ttl_seconds: int, stale_ttl: int = 0) -> None:
+        if _namespace(key) in LOCAL_NAMESPACES:
+            self.local.set(key, value, ttl_seconds, stale_ttl)
+            return
+        version = _new_version()
+        expires_at = time.time() + ttl_seconds
+        self.backend.set(key, encode(value), version, expires_at, expires_at + stale_ttl)
+        self.local.set(f"memo:{key}", (version, value), ttl_seconds + stale_ttl)
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY == 0
+            if self._janitor is None:
+                self._start_janitor()
+        if prune:
+            self._prune_due.set()
+
+    async def aset(self, key: str, value: Any, ttl_seconds: int, stale_ttl: int = 0) -> None:
+        if _namespace(key) in LOCAL_NAMESPACES:
+            self.local.set(key, value, ttl_seconds, stale_ttl)
+            return
+        await asyncio.to_thread(self.set, key, value, ttl_seconds, stale_ttl)
+
+    def delete(self, key: str) -> None:
+        if _namespace(key) not in LOCAL_NAMESPACES:
+            self.backend.delete(key)
+            key = f"memo:{key}"
+        self.local.delete(key)
+
+    def clear(self) -> None:
+        self.backend.clear()
+        self.local.clear()
+
+    def cleanup(self) -> int:
+        """Remove expired entries and enforce the bounds. Returns count expired."""
+        removed = self.backend.prune(self.max_entries, self.max_bytes, self.namespace_limits)
+        with self._lock:
+            for namespace, (expired, evicted) in removed.items():
+                stats = self._ns_stats(namespace)
+                stats.expirations += expired
+                stats.evictions += evicted
+        return sum(expired for expired, _ in removed.values()) + self.local.cleanup()
+
+    def _start_janitor(self) -> None:
+        def sweep():
+            while True:
+                # Every JANITOR_INTERVAL, or sooner once PRUNE_EVERY writes have landed
+                self._prune_due.wait(JANITOR_INTERVAL)
+                self._prune_due.clear()
+                try:
+                    self.cleanup()
+                except Exception:
+                    pass
+
+        self._janitor = threading.Thread(target=sweep, name="cache-janitor", daemon=True)
+        self._janitor.start()
+
+    @asynccontextmanager
+    async def lock(self, key: str, timeout: float = LOCK_TTL):
+        """Node-wide lock on ``key``; yields True if another holder had to be waited for.
+
+        Gives up waiting after ``timeout`` and proceeds unlocked.
+        """
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        contended = False
+        # BEGIN IMMEDIATE may wait out another writer; keep that off the event loop
+        acquired = await asyncio.to_thread(self.backend.acquire, key, owner, LOCK_TTL)
+        while not acquired and time.monotonic() < deadline:
+            contended = True
+            await asyncio.sleep(LOCK_POLL)
+            acquired = await asyncio.to_thread(self.backend.acquire, key, owner, LOCK_TTL)
+        try:
+            yield contended
+        finally:
+            if acquired:
+                await asyncio.to_thread(self.backend.release, key, owner)
+
+    def stats(self) -> dict:
+        sizes = self.backend.namespace_stats()
+        local = self.local.stats()["namespaces"]
+        with self._lock:
+            counters = {ns: s for ns, s in self._stats.items()}
+            namespaces = {}
+            for ns in sorted(set(counters) | set(sizes)):
+                s = counters.get(ns) or _Stats()
+                entries, size = sizes.get(ns, (0, 0))
+                namespaces[ns] = {
+                    "entries": entries,
+                    "bytes": size,
+                    "limit": self.namespace_limits.get(ns, DEFAULT_NAMESPACE_LIMIT),
+                    "hits": s.hits,
+                    "stale": s.stale,
+                    "misses": s.misses,
+                    "evictions": s.evictions,
+                    "expirations": s.expirations,
+                }
+        namespaces.update({ns: s for ns, s in local.items() if ns in LOCAL_NAMESPACES})
+        totals = {
+            field: sum(ns[field] for ns in namespaces.values())
+            for field in ("hits", "stale", "misses", "evictions", "expirations")
+        }
+        return {
+            "entries": sum(ns["entries"] for ns in namespaces.values()),
+            "bytes": sum(ns["bytes"] for ns in namespaces.values()),
+            "maxEntries": self.max_entries,
+            "maxBytes": self.max_bytes,
+            **totals,
+            "namespaces": dict(sorted(namespaces.items())),
+        }
@@ -0,0 +1,97 @@
+"""Single-flight request coalescing on top of the TTL cache.
+
+Concurrent misses for the same cache key share one upstream fetch. Entries
+cached with a stale window are served immediately after expiry while a
+single background refresh replaces them. With a shared cache backend the
+fetch also holds the cache's node-wide lock, so other workers wait for it
+and reuse its result.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from services.cache import cache
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers await its result.
+
+    The call runs as its own task, so a caller that disconnects does not cancel
+    the fetch for everyone else waiting on it.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Future] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def _run(self, key: str, future: asyncio.Future, fn: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            future.set_result(await fn())
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def _claim(self, key: str, fn: Callable[[], Awaitable[Any]]) -> tuple[asyncio.Future, bool]:
+        loop = asyncio.get_running_loop()
+        future = self._calls.get(key)
+        if future is not None and future.get_loop() is loop:
+            return future, False
+        future = self._calls[key] = loop.create_future()
+        task = loop.create_task(self._run(key, future, fn))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return future, True
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future, _ = self._claim(key, fn)
+        return await asyncio.shield(future)
+
+    def do_background(self, key: str, fn: Callable[[], Awaitable[Any]]) -> None:
+        """Start ``fn`` unless a call for ``key`` is already in flight."""
+        future, started = self._claim(key, fn)
+        if started:
+            # Nobody awaits a background refresh; retrieve its error so asyncio doesn't log it
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+
+flights = SingleFlight()
+
+
+async def cached_fetch(
+    key: str,
+    ttl: int | Callable[[Any], int],
+    fetch: Callable[[], Awaitable[Any]],
+    stale_ttl: int = 0,
+    refresh: bool = False,
+) -> Any:
+    """Return the cached value for ``key``, fetching it at most once at a time.
+
+    ``ttl`` may be a function of the fetched value. A value inside its stale
+    window is returned as-is while one background refresh runs; failed
+    background refreshes leave the stale value in place. ``refresh`` skips
+    the cache and waits for a new value (used to refresh ahead of expiry).
+    """
+    async def load():
+        async with cache.lock(key) as waited:
+            # Another worker held the key; use what it just stored
+            if waited:
+                value = await cache.aget(key)
+                if value is not None:
+                    return value
+            value = await fetch()
+            await cache.aset(key, value, ttl(value) if callable(ttl) else ttl, stale_ttl)
+            return value
+
+    if refresh:
+        return await flights.do(key, load)
+    hit = await cache.aget_stale(key)
+    if hit is not None:
+        value, fresh = hit
+        if not fresh:
+            flights.do_background(key, load)
+        return value
+    return await flights.do(key, load)
@@ -0,0 +1,76 @@
+"""Market-agnostic access to stock data ('us' via Yahoo, 'kr' via FinanceDataReader)."""
+from services.cache import cache
+from services.us_fundamentals import get_us_fundamentals
+from services.us_stocks import get_us_series, series_ttl
+from services.kr_stocks import OHLCV_TTL as KR_OHLCV_TTL, get_kr_fundamentals, get_kr_series
+from services.ohlcv import StockSeries
+from models.stock import FundamentalsResponse, StockDataResponse
+
+MARKETS = ("us", "kr")
+QUOTE_PERIODS = ("5d", "1mo", "3mo", "6mo", "1y", "2y", "5y")
+
+
+def normalize_ticker(market: str, ticker: str) -> str:
+    return ticker.upper() if market == "us" else ticker
+
+
+def stock_cache_key(market: str, ticker: str, period: str) -> str:
+    """Cache key used by get_us_stock / get_kr_stock for this request."""
+    return f"{market}_stock:{normalize_ticker(market, ticker)}:{period}"
+
+
+async def is_cached(market: str, ticker: str, period: str) -> bool:
+    """True if the bars can be served without waiting on upstream (fresh or stale)."""
+    # Expiry only: no need to load the series to know it is there
+    return await cache.aexpires_in(stock_cache_key(market, ticker, period)) is not None
+
+
+async def get_series(market: str, ticker: str, period: str = "6mo", refresh: bool = False) -> StockSeries:
+    """Cached bars; ``refresh`` reloads them, asking upstream for bars since the last stored day."""
+    if market not in MARKETS:
+        raise ValueError(f"Unknown market: {market}")
+    if market == "us":
+        return await get_us_series(normalize_ticker(market, ticker), period, refresh)
+    return await get_kr_series(ticker, period, refresh)
+
+
+def cached_quote(market: str, ticker: str) -> StockSeries | None:
+    """The most recently fetched cached series for a ticker, of any period, without touching upstream.
+
+    Periods have different TTLs, so time left is not comparable across them;
+    fetch age (the period's TTL minus time left) is. Every period's series
+    carries the same latest price and day change.
+    """
+    ages = []
+    for period in QUOTE_PERIODS:
+        key = stock_cache_key(market, ticker, period)
+        remaining = cache.expires_in(key)
+        if remaining is not None:
+            ttl = KR_OHLCV_TTL if market == "kr" else series_ttl(period)
+            ages.append((ttl - remaining, key))
+    for _, key in sorted(ages):
+        hit = cache.get_stale(key)
+        if hit is not None:
+            return hit[0]
+    return None
+
+
+async def get_quote(market: str, ticker: str) -> StockSeries:
+    """Latest price from any cached series, else a short 5d load."""
+    if market not in MARKETS:
+        raise ValueError(f"Unknown market: {market}")
+    cached = await cache.offload(cached_quote, market, normalize_ticker(market, ticker))
+    return cached or await get_series(market, ticker, "5d")
+
+
+async def get_stock(market: str, ticker: str, period: str = "6mo") -> StockDataResponse:
+    return (await get_series(market, ticker, period)).to_response()
+
+
+async def get_fundamentals(market: str, ticker: str, detail: bool = True) -> FundamentalsResponse:
+    """``detail`` is US-only: without it only the batched quote fields are loaded."""
+    if market not in MARKETS:
+        raise ValueError(f"Unknown market: {market}")
+    if market == "us":
+        return await get_us_fundamentals(normalize_ticker(market, ticker), detail)
+    return await get_kr_fundamentals(ticker)
@@ -0,0 +1,194 @@
+"""US fundamentals: batched v7 quotes for the common fields, quoteSummary on demand.
+
+PE, forward PE, PB, market cap and dividend yield come from Yahoo's
+multi-symbol quote endpoint. Tickers requested within a few milliseconds of
+each other are fetched together, up to MAX_QUOTE_SYMBOLS per call, so a
+100-name watchlist costs two upstream requests. The remaining fields need
+the per-ticker quoteSummary modules and are only loaded for ``detail``
+requests.
+
+Each leg is cached per ticker on its own. A failed leg is not retried until
+its backoff has passed, doubling from BACKOFF_BASE up to BACKOFF_MAX, and
+a stale value is served in the meantime if there is one.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from config import YAHOO_BASE_URL
+from services.cache import cache
+from services.http_client import get_json
+from services.singleflight import flights
+from models.stock import FundamentalsResponse
+from utils.rate_limiter import yahoo_limiter
+
+FUNDAMENTALS_TTL = 3600          # 1 hour
+FUNDAMENTALS_STALE_TTL = 86400   # serve yesterday's ratios while upstream is failing
+BACKOFF_BASE = 60
+BACKOFF_MAX = 3600
+QUOTE_BATCH_WINDOW = 0.01        # seconds to wait for more tickers before fetching
+MAX_QUOTE_SYMBOLS = 50
+
+SUMMARY_MODULES = "defaultKeyStatistics,financialData,summaryDetail,price"
+QUOTE_FIELDS = {
+    "pe": "trailingPE",
+    "forwardPe": "forwardPE",
+    "pb": "priceToBook",
+    "marketCap": "marketCap",
+    "dividendYield": "trailingAnnualDividendYield",
+}
+
+
+class QuoteBatcher:
+    """Coalesce single-ticker lookups into multi-symbol fetches.
+
+    ``fetch`` takes a list of symbols and returns {symbol: result}; symbols it
+    omits resolve to None. A symbol already pending or in flight shares that
+    lookup.
+    """
+
+    def __init__(self, fetch: Callable[[list[str]], Awaitable[dict]], window: float = QUOTE_BATCH_WINDOW,
+                 max_size: int = MAX_QUOTE_SYMBOLS):
+        self._fetch = fetch
+        self.window = window
+        self.max_size = max_size
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending: dict[str, asyncio.Future] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def get(self, symbol: str):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._pending, self._inflight, self._timer = loop, {}, {}, None
+        future = self._pending.get(symbol) or self._inflight.get(symbol)
+        if future is None:
+            future = self._pending[symbol] = loop.create_future()
+            if len(self._pending) >= self.max_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        self._inflight.update(batch)
+        task = self._loop.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict[str, asyncio.Future]) -> None:
+        try:
+            results = await self._fetch(list(batch))
+        except Exception as e:
+            results, error = {}, e
+        else:
+            error = None
+        for symbol, future in batch.items():
+            if self._inflight.get(symbol) is future:
+                del self._inflight[symbol]
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+                # Nobody may be left waiting; retrieve the error so asyncio doesn't log it
+                future.exception()
+            else:
+                future.set_result(results.get(symbol))
+
+
+async def _fetch_quotes(symbols: list[str]) -> dict[str, dict]:
+    """Common fundamentals for up to MAX_QUOTE_SYMBOLS symbols in one v7 quote call."""
+    url = f"{YAHOO_BASE_URL}/v7/finance/quote"
+    params = {"symbols": ",".join(symbols), "fields": ",".join(QUOTE_FIELDS.values())}
+    data = await get_json(url, params=params, limiter=yahoo_limiter, provider="yahoo_quote")
+    quotes = {}
+    for item in data.get("quoteResponse", {}).get("result") or []:
+        if item.get("symbol"):
+            quotes[item["symbol"]] = {field: item.get(name) for field, name in QUOTE_FIELDS.items()}
+    return quotes
+
+
+async def _fetch_quote_summary(ticker: str) -> dict:
+    """Fetch quote summary (fundamentals, info) from Yahoo Finance."""
+    url = f"{YAHOO_BASE_URL}/v10/finance/quoteSummary/{ticker}"
+    data = await get_json(url, params={"modules": SUMMARY_MODULES}, limiter=yahoo_limiter,
+                          provider="yahoo_quote_summary")
+    result = data.get("quoteSummary", {}).get("result")
+    return result[0] if result else {}
+
+
+def _summary_fields(summary: dict) -> dict:
+    stats = summary.get("defaultKeyStatistics", {})
+    fin = summary.get("financialData", {})
+    detail = summary.get("summaryDetail", {})
+    price_info = summary.get("price", {})
+
+    def _raw(d: dict, key: str):
+        v = d.get(key, {})
+        return v.get("raw") if isinstance(v, dict) else v
+
+    return {
+        "pe": _raw(detail, "trailingPE"),
+        "forwardPe": _raw(stats, "forwardPE") or _raw(detail, "forwardPE"),
+        "pb": _raw(stats, "priceToBook"),
+        "ps": _raw(detail, "priceToSalesTrailing12Months"),
+        "roe": _raw(fin, "returnOnEquity"),
+        "revenueGrowth": _raw(fin, "revenueGrowth"),
+        "earningsGrowth": _raw(fin, "earningsGrowth"),
+        "dividendYield": _raw(detail, "dividendYield"),
+        "debtToEquity": _raw(fin, "debtToEquity"),
+        "freeCashFlow": _raw(fin, "freeCashflow"),
+        "marketCap": _raw(price_info, "marketCap"),
+    }
+
+
+async def _fetch_summary_fields(ticker: str) -> dict:
+    return _summary_fields(await _fetch_quote_summary(ticker))
+
+
+quote_batcher = QuoteBatcher(_fetch_quotes)
+
+
+async def _cached_leg(leg: str, ticker: str, fetch: Callable[[], Awaitable[dict | None]]) -> dict | None:
+    """One leg's fields for ``ticker``: fresh cache, else upstream unless backing off, else stale cache."""
+    key = f"us_fundamentals_{leg}:{ticker}"
+    hit = await cache.aget_stale(key)
+    if hit is not None and hit[1]:
+        return hit[0]
+    stale = hit[0] if hit is not None else None
+
+    backoff_key = f"us_fundamentals_backoff:{leg}:{ticker}"
+    failures, retry_at = await cache.aget(backoff_key) or (0, 0.0)
+    if time.time() < retry_at:
+        return stale
+    try:
+        fields = await flights.do(key, fetch)
+    except Exception:
+        fields = None
+    if not fields or all(v is None for v in fields.values()):
+        delay = min(BACKOFF_BASE * 2 ** failures, BACKOFF_MAX)
+        await cache.aset(backoff_key, (failures + 1, time.time() + delay), 2 * BACKOFF_MAX)
+        return stale
+    if failures:
+        await cache.adelete(backoff_key)
+    await cache.aset(key, fields, FUNDAMENTALS_TTL, FUNDAMENTALS_STALE_TTL)
+    return fields
+
+
+async def get_us_fundamentals(ticker: str, detail: bool = True) -> FundamentalsResponse:
+    """Fundamentals for ``ticker``; without ``detail`` only the batched quote fields are loaded."""
+    legs = [_cached_leg("quote", ticker, lambda: quote_batcher.get(ticker))]
+    if detail:
+        legs.append(_cached_leg("summary", ticker, lambda: _fetch_summary_fields(ticker)))
+    quote, *rest = await asyncio.gather(*legs)
+    fields = dict(rest[0] or {}) if rest else {}
+    # Quote values are the fresher of the two where both legs carry a field
+    fields.update({k: v for k, v in (quote or {}).items() if v is not None})
+    return FundamentalsResponse(ticker=ticker.upper(), **fields)
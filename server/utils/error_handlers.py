@@ -1,5 +1,6 @@
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
+from utils.rate_limiter import RateLimitExceeded
 
 
 def register_error_handlers(app: FastAPI):
@@ -10,6 +11,14 @@ def register_error_handlers(app: FastAPI):
             content={"error": str(exc)},
         )
 
+    @app.exception_handler(RateLimitExceeded)
+    async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
+        return JSONResponse(
+            status_code=503,
+            content={"error": str(exc)},
+            headers={"Retry-After": str(max(1, round(exc.wait)))},
+        )
+
     @app.exception_handler(Exception)
     async def generic_error_handler(request: Request, exc: Exception):
         return JSONResponse(
@@ -0,0 +1,42 @@
+"""Deferred imports for heavy provider libraries.
+
+FinanceDataReader drags in pandas, plotly and requests (most of the app's
+import time), yet only KR routes need it. Providers call ``load`` on first
+use instead of importing at module level; ``preload`` pays the cost up
+front for long-lived workers (``python main.py --preload`` or PRELOAD=1).
+"""
+import importlib
+import threading
+import time
+from types import ModuleType
+
+# Modules deferred until first use, in the order ``preload`` imports them
+HEAVY_MODULES = ("FinanceDataReader",)
+
+_lock = threading.Lock()
+_costs: dict[str, float] = {}
+
+
+def load(name: str) -> ModuleType:
+    """Import ``name`` (once), recording how long the first import took.
+
+    Call from a worker thread on the request path: a cold import blocks.
+    """
+    if name in _costs:
+        return importlib.import_module(name)
+    with _lock:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        _costs.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def preload(names: tuple[str, ...] = HEAVY_MODULES) -> dict[str, float]:
+    for name in names:
+        load(name)
+    return import_costs()
+
+
+def import_costs() -> dict[str, float]:
+    """Seconds spent on each deferred import so far."""
+    return dict(_costs)
@@ -0,0 +1,216 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Counters and histograms are plain dicts keyed by label values behind one
+lock, so recording costs a dict lookup and a bisect. Values owned by other
+components (cache, rate limiters) are read at scrape time by collectors.
+
+Per-stage profiling is opt-in (``PROFILE_STAGES=1`` or ``set_profiling``);
+when it is off ``stage()`` returns a shared no-op context manager.
+"""
+import bisect
+import contextlib
+import math
+import threading
+import time
+from typing import Callable, Iterable
+
+from config import PROFILE_STAGES
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_INF_BUCKET = 'le="+Inf"'
+
+_lock = threading.Lock()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with _lock:
+            snapshot = sorted(self._values.items())
+        for labels, value in snapshot:
+            yield f"{self.name}{_labels(self.labels, labels)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labels) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextlib.contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with _lock:
+            snapshot = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_bucket{_labels(self.labels, labels, _INF_BUCKET)} {series[-1]}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {_number(series[-2])}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {series[-1]}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: list[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Callable[[], Iterable[str]]):
+        """Register ``fn`` to yield exposition lines at scrape time."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Histogram(
+    "http_request_duration_seconds", "API request latency by route.", ("method", "route", "status"),
+))
+upstream_requests = registry.register(Histogram(
+    "upstream_request_duration_seconds", "Upstream call latency by provider.", ("provider",),
+))
+upstream_errors = registry.register(Counter(
+    "upstream_errors_total", "Failed upstream calls by provider and reason.", ("provider", "reason"),
+))
+bar_refreshes = registry.register(Counter(
+    "bar_store_refreshes_total", "Bar store delta refreshes by market and outcome.", ("market", "outcome"),
+))
+stage_durations = registry.register(Histogram(
+    "stage_duration_seconds", "Per-stage timings (only while profiling is enabled).", ("operation", "stage"),
+))
+
+
+@contextlib.contextmanager
+def track_upstream(provider: str):
+    """Time an upstream call and count it as an error if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        upstream_errors.inc(provider, type(e).__name__)
+        raise
+    finally:
+        upstream_requests.observe(time.perf_counter() - start, provider)
+
+
+# --- Opt-in stage profiling ---
+
+_profiling = PROFILE_STAGES
+_noop = contextlib.nullcontext()
+
+
+def set_profiling(enabled: bool) -> None:
+    global _profiling
+    _profiling = enabled
+
+
+def profiling_enabled() -> bool:
+    return _profiling
+
+
+def stage(operation: str, name: str):
+    """Context manager timing one stage of ``operation`` when profiling is on."""
+    if not _profiling:
+        return _noop
+    return stage_durations.time(operation, name)
+
+
+# --- Middleware ---
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template.
+
+    Timing runs until the response body is fully sent, so streamed
+    responses are measured end to end.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            http_requests.observe(
+                time.perf_counter() - start,
+                scope["method"], getattr(route, "path", "unmatched"), status[0],
+            )
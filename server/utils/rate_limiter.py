@@ -1,33 +1,151 @@
+"""Token-bucket throttling for upstream providers.
+
+Each bucket refills at ``rate`` tokens per second up to ``burst``. Admission
+is O(1): a caller reserves the next token (the balance may go negative) and
+sleeps until it is due, so waiters are served in arrival order without
+polling. Buckets are safe to share between threads and event loops.
+
+Upstream 429s feed back through ``penalize``: admissions pause for the
+Retry-After (or an exponential backoff), the saved-up burst is dropped and
+the rate is halved, then recovers additively on each success. No tokens
+accrue during a pause, so queued callers resume one token interval apart
+from its end rather than all at once.
+"""
+import asyncio
+import threading
 import time
-from collections import defaultdict
 
+from config import KRX_BURST, KRX_RATE_LIMIT, YAHOO_BURST, YAHOO_RATE_LIMIT
+
+MIN_BACKOFF = 1.0       # seconds, first pause after a 429
+MAX_BACKOFF = 60.0
+MIN_RATE_FACTOR = 0.1   # never throttle below 10% of the configured rate
+RECOVERY_STEP = 0.05    # fraction of the configured rate regained per success
+
+
+class RateLimitExceeded(Exception):
+    """A token would not be available within the caller's deadline."""
+
+    def __init__(self, name: str, wait: float):
+        super().__init__(f"Upstream rate limit for {name}: next slot in {wait:.1f}s")
+        self.name = name
+        self.wait = wait
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int, name: str = "default"):
+        self.name = name
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._backoff = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0      # admissions that had to wait
+        self.rejected = 0       # admissions refused at their deadline
+        self.penalties = 0      # 429s reported
 
-class RateLimiter:
-    """Simple per-key rate limiter."""
+    def _refill(self, now: float) -> None:
+        # Time spent paused earns nothing
+        elapsed = now - max(self._updated, self._paused_until)
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = max(self._updated, now)
 
-    def __init__(self, max_calls: int, period_seconds: float):
-        self.max_calls = max_calls
-        self.period = period_seconds
-        self._calls: dict[str, list[float]] = defaultdict(list)
+    def _wait_for(self, now: float, tokens: float) -> float:
+        """Seconds until any pause ends plus the time to earn back a negative ``tokens`` balance after it."""
+        pause = max(self._paused_until - now, 0.0)
+        return pause + (-tokens / self.rate if tokens < 0 else 0.0)
 
-    def allow(self, key: str = "default") -> bool:
-        now = time.time()
-        calls = self._calls[key]
-        # Remove expired
-        self._calls[key] = [t for t in calls if now - t < self.period]
-        if len(self._calls[key]) >= self.max_calls:
+    def _reserve(self, timeout: float | None) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self._wait_for(now, self._tokens - 1)
+            if timeout is not None and wait > timeout:
+                self.rejected += 1
+                raise RateLimitExceeded(self.name, wait)
+            self._tokens -= 1
+            if wait > 0:
+                self.throttled += 1
+            return wait
+
+    def _refund(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def wait_time(self) -> float:
+        """Seconds until a token would be available; consumes nothing."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return self._wait_for(now, self._tokens - 1)
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is available right now."""
+        try:
+            self._reserve(0.0)
+        except RateLimitExceeded:
             return False
-        self._calls[key].append(now)
         return True
 
-    def wait_time(self, key: str = "default") -> float:
-        if self.allow(key):
-            return 0.0
-        oldest = min(self._calls[key])
-        return max(0.0, self.period - (time.time() - oldest))
+    def acquire(self, timeout: float | None = None) -> None:
+        """Block the calling thread until a token is granted (or raise past ``timeout``)."""
+        wait = self._reserve(timeout)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, timeout: float | None = None) -> None:
+        """Awaitable ``acquire``; a cancelled waiter gives its reservation back."""
+        wait = self._reserve(timeout)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self._refund()
+                raise
 
+    def penalize(self, retry_after: float | None = None) -> None:
+        """Upstream said 429: pause admissions and halve the rate."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.penalties += 1
+            self._backoff = min(MAX_BACKOFF, max(MIN_BACKOFF, self._backoff * 2))
+            pause = retry_after if retry_after is not None else self._backoff
+            self._paused_until = max(self._paused_until, now + pause)
+            # The burst is what got us throttled; resume with a single token
+            self._tokens = min(self._tokens, 1.0)
+            self.rate = max(self.base_rate * MIN_RATE_FACTOR, self.rate / 2)
 
-# 60 calls per minute for yfinance
-yfinance_limiter = RateLimiter(max_calls=60, period_seconds=60)
+    def reward(self) -> None:
+        """Upstream accepted a request: recover the rate and decay the backoff."""
+        with self._lock:
+            if self.rate >= self.base_rate and not self._backoff:
+                return
+            self._refill(time.monotonic())
+            self.rate = min(self.base_rate, self.rate + self.base_rate * RECOVERY_STEP)
+            self._backoff = self._backoff / 2 if self._backoff > MIN_BACKOFF else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rate": round(self.rate, 3),
+                "baseRate": self.base_rate,
+                "tokens": round(self._tokens, 2),
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+                "penalties": self.penalties,
+            }
+
+
+# Yahoo starts answering 429 (and eventually blocking the IP) around bursts of a few hundred
+yahoo_limiter = TokenBucket(rate=YAHOO_RATE_LIMIT, burst=YAHOO_BURST, name="yahoo")
 # 5 calls per minute for BOK API
-bok_limiter = RateLimiter(max_calls=5, period_seconds=60)
+bok_limiter = TokenBucket(rate=5 / 60, burst=5, name="bok")
+# FinanceDataReader scrapes KRX/Naver; keep it polite
+krx_limiter = TokenBucket(rate=KRX_RATE_LIMIT, burst=KRX_BURST, name="krx")
+
+LIMITERS = {b.name: b for b in (yahoo_limiter, bok_limiter, krx_limiter)}